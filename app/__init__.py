@@ -17,6 +17,10 @@ def create_app(config_name='development'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
+    # Файлы из multipart пишутся сразу в каталог загрузок (app/file_storage.py)
+    from app.file_storage import UploadRequest
+    app.request_class = UploadRequest
+    
     # Инициализация расширений
     db.init_app(app)
     login_manager.init_app(app)
@@ -44,6 +48,31 @@ def create_app(config_name='development'):
     from app.admin_routes import bp as admin_bp
     app.register_blueprint(admin_bp)
     
+    # Команды фонового планировщика: flask scheduler run / status
+    from app.scheduler import scheduler_cli
+    app.cli.add_command(scheduler_cli)
+    
+    # Команды кэша календаря: flask calendar reclassify
+    from app.calendar_sync import calendar_cli
+    app.cli.add_command(calendar_cli)
+    
+    # Перешифрование персональных данных после смены ключа (flask encryption rotate / status)
+    # и заполнение слепого индекса ФИО (flask encryption reindex-names)
+    from app.key_rotation import encryption_cli
+    from app.blind_index import reindex_names_command
+    encryption_cli.add_command(reindex_names_command)
+    app.cli.add_command(encryption_cli)
+    
+    # Счётчики пользователей: события маппера ведут их, flask stats reconcile выравнивает
+    from app.user_stats import stats_cli
+    app.cli.add_command(stats_cli)
+    
+    # Хранилище загруженных файлов по содержимому: flask files gc
+    from app.blob_store import files_cli
+    from app.chunked_upload import sweep_uploads_command
+    files_cli.add_command(sweep_uploads_command)
+    app.cli.add_command(files_cli)
+    
     @login_manager.user_loader
     def load_user(user_id):
         return User.query.get(int(user_id))
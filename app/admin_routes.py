@@ -1,9 +1,10 @@
 """Маршруты для администратора"""
 from functools import wraps
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
+from sqlalchemy import select, func
 from app import db
-from app.models import User, QueueEntry, Task, File
+from app.models import User, UserStats
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -27,27 +28,114 @@ def index():
     return redirect(url_for('admin.users'))
 
 
+# Фильтры и сортировки списка пользователей (выполняются в SQL)
+USER_FILTERS = {
+    'all': None,
+    'pending': User.is_active.is_(False),
+    'active': User.is_active.is_(True),
+    'admin': User.is_admin.is_(True),
+}
+USER_SORTS = ('created', 'username', 'queue', 'tasks', 'files')
+
+
+def user_counts_query():
+    """Пользователи со счётчиками: открытые записи очереди, незавершённые задачи, файлы
+
+    Счётчики - готовые числа из user_stats (app/user_stats.py), присоединённые
+    LEFT JOIN, поэтому страница строится одним запросом без COUNT.
+    """
+    columns = {
+        'queue': func.coalesce(UserStats.open_queue_count, 0),
+        'tasks': func.coalesce(UserStats.open_tasks_count, 0),
+        'files': func.coalesce(UserStats.files_count, 0),
+    }
+    query = (
+        select(User, *(column.label(f'{name}_count') for name, column in columns.items()))
+        .outerjoin(UserStats, UserStats.user_id == User.id)
+    )
+    return query, columns
+
+
 @bp.route('/users')
 @admin_required
 def users():
     """Список всех пользователей"""
-    users_list = User.query.order_by(User.created_at.desc()).all()
-    
-    # Подсчет статистики для каждого пользователя
-    users_data = []
-    for user in users_list:
-        queue_count = QueueEntry.query.filter_by(user_id=user.id, has_answered=False).count()
-        tasks_count = Task.query.filter_by(user_id=user.id, completed=False).count()
-        files_count = File.query.filter_by(user_id=user.id).count()
-        
-        users_data.append({
-            'user': user,
-            'queue_count': queue_count,
-            'tasks_count': tasks_count,
-            'files_count': files_count
-        })
-    
-    return render_template('admin/users.html', title='Управление пользователями', users_data=users_data)
+    from app.pii_cache import decrypt_full_names
+    status = request.args.get('status', 'all')
+    if status not in USER_FILTERS:
+        status = 'all'
+    sort = request.args.get('sort', 'created')
+    if sort not in USER_SORTS:
+        sort = 'created'
+    order = 'asc' if request.args.get('order') == 'asc' else 'desc'
+    per_page = min(max(request.args.get('per_page', current_app.config.get('ADMIN_USERS_PER_PAGE', 50), type=int), 1), 200)
+    
+    query, columns = user_counts_query()
+    sort_column = {'created': User.created_at, 'username': User.username}.get(sort, columns.get(sort))
+    sort_column = sort_column.asc() if order == 'asc' else sort_column.desc()
+    query = query.order_by(sort_column, User.id.asc() if order == 'asc' else User.id.desc())
+    
+    count_query = select(func.count(User.id))
+    condition = USER_FILTERS[status]
+    if condition is not None:
+        query = query.where(condition)
+        count_query = count_query.where(condition)
+    total = db.session.scalar(count_query)
+    pages = max((total + per_page - 1) // per_page, 1)
+    page = min(max(request.args.get('page', 1, type=int), 1), pages)
+    
+    rows = db.session.execute(query.limit(per_page).offset((page - 1) * per_page)).all()
+    names = decrypt_full_names((row.User.id, row.User.full_name_encrypted) for row in rows)
+    users_data = [
+        {
+            'user': row.User,
+            'full_name': name,
+            'queue_count': row.queue_count,
+            'tasks_count': row.tasks_count,
+            'files_count': row.files_count
+        }
+        for row, name in zip(rows, names)
+    ]
+    pagination = {
+        'page': page,
+        'pages': pages,
+        'per_page': per_page,
+        'total': total,
+        'status': status,
+        'sort': sort,
+        'order': order
+    }
+    
+    return render_template('admin/users.html', title='Управление пользователями',
+                           users_data=users_data, pagination=pagination)
+
+
+@bp.route('/users/search')
+@admin_required
+def search_users():
+    """Поиск пользователей по ФИО через слепой индекс (JSON): префиксы слов или exact=1"""
+    from app.blind_index import search_user_ids
+    from app.pii_cache import decrypt_full_names
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Параметр q обязателен'}), 400
+    exact = request.args.get('exact', '').lower() in ('1', 'true', 'yes')
+    limit = min(request.args.get('limit', 50, type=int) or 50, 200)
+    
+    user_ids = search_user_ids(query, exact=exact, limit=limit)
+    found = User.query.filter(User.id.in_(user_ids)).order_by(User.id).all() if user_ids else []
+    # Расшифровываются только найденные пользователи
+    names = decrypt_full_names((user.id, user.full_name_encrypted) for user in found)
+    return jsonify({'users': [
+        {
+            'id': user.id,
+            'username': user.username,
+            'full_name': name,
+            'is_active': user.is_active,
+            'is_admin': user.is_admin
+        }
+        for user, name in zip(found, names)
+    ]})
 
 
 @bp.route('/users/<int:user_id>/delete', methods=['POST'])
@@ -136,3 +224,19 @@ def reset_password(user_id):
     flash(f'Пароль для пользователя {user.username} сброшен. Новый временный пароль: {temp_password}', 'info')
     return redirect(url_for('admin.users'))
 
+
+
+@bp.route('/scheduler')
+@admin_required
+def scheduler_status():
+    """Статус фонового планировщика (последние запуски задач) в JSON"""
+    from app.scheduler import get_scheduler_status
+    return jsonify(get_scheduler_status(current_app))
+
+
+@bp.route('/pii_cache')
+@admin_required
+def pii_cache_status():
+    """Счётчики кэша расшифрованных ФИО в JSON (по текущему процессу)"""
+    from app.pii_cache import get_pii_cache_stats
+    return jsonify(get_pii_cache_stats(current_app))
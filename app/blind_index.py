@@ -0,0 +1,150 @@
+"""Слепой индекс ФИО: поиск пользователей без расшифровки всей таблицы
+
+ФИО хранится зашифрованным, поэтому искать по нему в SQL нельзя. Рядом с
+шифротекстом хранятся ключевые HMAC от нормализованного ФИО целиком и от
+префиксов каждого слова (user_name_terms). Поиск хэширует запрос тем же ключом
+и находит пользователей по индексу; расшифровываются только найденные.
+
+Ключ - BLIND_INDEX_KEY (по умолчанию выводится из SECRET_KEY и отличается от
+ключа шифрования). После смены ключа индекс перестраивается:
+flask encryption reindex-names --rebuild.
+"""
+import os
+import re
+import hmac
+import hashlib
+import unicodedata
+import click
+from flask import current_app, has_app_context
+from sqlalchemy import select, delete, insert, func
+from app.models import db, User, UserNameTerm
+
+WORD_RE = re.compile(r'[^\W\d_]+')
+
+
+def normalize_name(value):
+    """Нормализация ФИО: регистр, ё -> е, только буквенные слова через пробел"""
+    value = unicodedata.normalize('NFKC', value or '').lower().replace('ё', 'е')
+    return ' '.join(WORD_RE.findall(value))
+
+
+def _config():
+    return current_app.config if has_app_context() else {}
+
+
+def get_index_key(config=None):
+    """Ключ HMAC слепого индекса"""
+    config = _config() if config is None else config
+    key = config.get('BLIND_INDEX_KEY')
+    if key:
+        return key.encode('utf-8') if isinstance(key, str) else key
+    secret_key = config.get('SECRET_KEY') or os.getenv('SECRET_KEY', 'default-secret-key-change-me')
+    # Отдельный ключ из SECRET_KEY: хэши индекса не связаны с ключом шифрования
+    return hmac.new(secret_key.encode('utf-8'), b'blind-index', hashlib.sha256).digest()
+
+
+def _hash(key, term):
+    return hmac.new(key, term.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+
+def name_terms(full_name, config=None):
+    """Хэши индекса для ФИО: всё ФИО ('f:') и префиксы слов ('p:') от BLIND_INDEX_MIN_PREFIX букв"""
+    config = _config() if config is None else config
+    normalized = normalize_name(full_name)
+    if not normalized:
+        return []
+    min_prefix = config.get('BLIND_INDEX_MIN_PREFIX', 2)
+    terms = {'f:' + normalized}
+    for word in normalized.split():
+        for length in range(min(min_prefix, len(word)), len(word) + 1):
+            terms.add('p:' + word[:length])
+    key = get_index_key(config)
+    return sorted(_hash(key, term) for term in terms)
+
+
+def query_terms(query, exact=False, config=None):
+    """Хэши для поиска: ФИО целиком или префиксы всех слов запроса"""
+    config = _config() if config is None else config
+    normalized = normalize_name(query)
+    if not normalized:
+        return []
+    if exact:
+        terms = {'f:' + normalized}
+    else:
+        terms = {'p:' + word for word in normalized.split()}
+    key = get_index_key(config)
+    return sorted(_hash(key, term) for term in terms)
+
+
+def search_user_ids(query, exact=False, limit=50):
+    """id пользователей, у которых есть все хэши запроса (поиск по индексу term, user_id)"""
+    terms = query_terms(query, exact)
+    if not terms:
+        return []
+    return db.session.scalars(
+        select(UserNameTerm.user_id)
+        .where(UserNameTerm.term.in_(terms))
+        .group_by(UserNameTerm.user_id)
+        .having(func.count(UserNameTerm.term) == len(terms))
+        .order_by(UserNameTerm.user_id)
+        .limit(limit)
+    ).all()
+
+
+def _decrypt_failed(name, ciphertext):
+    """Расшифровка вернула сам токен Fernet: ни один ключ не подошёл
+
+    Незашифрованное ФИО (шифрование не было настроено) тоже возвращается как
+    есть, но это открытый текст, и его можно индексировать.
+    """
+    return bool(ciphertext) and name == ciphertext and ciphertext.startswith('gAAAAA')
+
+
+def reindex_names(chunk_size=500, rebuild=False):
+    """Заполнение индекса для пользователей без него (rebuild - для всех)
+
+    ФИО, которые не удалось расшифровать, пропускаются: хэши от шифротекста
+    ничего бы не находили, а без хэшей пользователь попадёт в следующий запуск.
+    Возвращает {'indexed': ..., 'failed': ...}.
+    """
+    from app.pii_cache import decrypt_full_names
+    indexed = failed = 0
+    last_id = 0
+    while True:
+        users = db.session.execute(
+            select(User.id, User.full_name_encrypted).where(User.id > last_id).order_by(User.id).limit(chunk_size)
+        ).all()
+        if not users:
+            break
+        last_id = users[-1].id
+        ids = [user.id for user in users]
+        if rebuild:
+            db.session.execute(delete(UserNameTerm).where(UserNameTerm.user_id.in_(ids)))
+        else:
+            existing = set(db.session.scalars(
+                select(UserNameTerm.user_id).where(UserNameTerm.user_id.in_(ids)).distinct()
+            ))
+            users = [user for user in users if user.id not in existing]
+        names = decrypt_full_names((user.id, user.full_name_encrypted) for user in users)
+        rows = []
+        for user, name in zip(users, names):
+            if _decrypt_failed(name, user.full_name_encrypted):
+                failed += 1
+                continue
+            rows.extend({'user_id': user.id, 'term': term} for term in name_terms(name))
+            indexed += 1
+        if rows:
+            db.session.execute(insert(UserNameTerm), rows)
+        db.session.commit()
+    return {'indexed': indexed, 'failed': failed}
+
+
+@click.command('reindex-names')
+@click.option('--chunk-size', default=500, show_default=True, help='Пользователей в одной транзакции')
+@click.option('--rebuild', is_flag=True, help='Перестроить индекс для всех (после смены BLIND_INDEX_KEY)')
+def reindex_names_command(chunk_size, rebuild):
+    """Заполнение слепого индекса ФИО для поиска в админ-панели"""
+    result = reindex_names(chunk_size=chunk_size, rebuild=rebuild)
+    click.echo(f"Indexed {result['indexed']} users, failed: {result['failed']}")
+    if result['failed']:
+        click.echo("Some names could not be decrypted: add the previous key to ENCRYPTION_OLD_KEYS and run again")
@@ -0,0 +1,225 @@
+"""Хранилище загруженных файлов по содержимому (content-addressed)
+
+Содержимое файла лежит один раз под именем своего SHA-256:
+uploads/blobs/ab/cd/abcd...; строки files ссылаются на него (blob_sha256).
+Один и тот же PDF, загруженный с сайта и из бота, занимает место на диске
+один раз: повторная загрузка только удаляет свой временный файл.
+
+Число ссылок (file_blobs.ref_count) меняют события маппера File в транзакции
+записи атомарным UPDATE, как счётчики в app/user_stats.py. Содержимое без
+ссылок удаляет сборщик (flask files gc и задача планировщика) - не раньше
+BLOB_GC_GRACE_SECONDS после последнего использования, чтобы не удалить блоб,
+на который как раз создаётся ссылка.
+"""
+import os
+import time
+import hashlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, select, update, delete, inspect
+from sqlalchemy.exc import IntegrityError, OperationalError
+from app.models import db, File, FileBlob
+from app.file_storage import TEMP_PREFIX, get_upload_folder, hashing_stream
+
+files_cli = AppGroup('files', help='Хранилище загруженных файлов')
+
+BLOBS_DIR = 'blobs'
+
+StoredBlob = namedtuple('StoredBlob', 'sha256 size relative_path deduplicated')
+
+
+class BlobStore:
+    """Блобы в каталоге root, разложенные по первым двум парам символов хэша"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def relative_path(self, sha256):
+        """Путь блоба относительно каталога загрузок (хранится в files.filename)"""
+        return '/'.join((BLOBS_DIR, sha256[:2], sha256[2:4], sha256))
+
+    def path_for(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def store_upload(self, file_storage):
+        """Сохранение файла из запроса (без commit); повтор содержимого на диск не пишется"""
+        return self._store(hashing_stream(file_storage, self.root))
+
+    def import_file(self, path):
+        """Перенос готового файла (скачанного ботом, собранного по частям) в хранилище
+
+        Файл должен лежать на той же файловой системе: он хэшируется чтением
+        и переименовывается в блоб без копирования.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(64 * 1024), b''):
+                digest.update(chunk)
+                size += len(chunk)
+            os.fsync(source.fileno())
+        return self._place(digest.hexdigest(), size, lambda target: os.replace(path, target), lambda: os.unlink(path))
+
+    def _store(self, stream):
+        return self._place(stream.sha256, stream.size, stream.commit, stream.close)
+
+    def _place(self, sha256, size, commit, discard):
+        inserted = ensure_blob(sha256, size)
+        path = self.path_for(sha256)
+        # Новая строка - файл кладётся заново, даже если старый ещё на диске:
+        # его могли удалить сборщиком вместе с прежней строкой
+        deduplicated = not inserted and os.path.exists(path)
+        if deduplicated:
+            # Содержимое уже есть: новый файл просто удаляется
+            discard()
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            commit(path)
+        return StoredBlob(sha256, size, self.relative_path(sha256), deduplicated)
+
+    def collect_garbage(self, grace):
+        """Удаление блобов без ссылок, не использовавшихся дольше grace (timedelta)
+
+        Возвращает {'blobs': удалено строк, 'files': удалено файлов, 'bytes': освобождено}.
+        """
+        cutoff = datetime.utcnow() - grace
+        result = {'blobs': 0, 'files': 0, 'bytes': 0}
+        candidates = db.session.scalars(
+            select(FileBlob.sha256).where(FileBlob.ref_count <= 0, FileBlob.last_used_at < cutoff)
+        ).all()
+        for sha256 in candidates:
+            # Условие повторяется в DELETE: ссылка могла появиться после выборки
+            deleted = db.session.execute(
+                delete(FileBlob).where(
+                    FileBlob.sha256 == sha256, FileBlob.ref_count <= 0, FileBlob.last_used_at < cutoff
+                )
+            ).rowcount
+            db.session.commit()
+            if deleted:
+                result['blobs'] += 1
+                self._unlink_unreferenced(sha256, result)
+
+        # Файлы без строки и брошенные временные файлы (процесс упал до commit)
+        known = set(db.session.scalars(select(FileBlob.sha256)))
+        db.session.rollback()
+        stale = time.time() - grace.total_seconds()
+        for name, path in self._walk():
+            if os.path.getmtime(path) >= stale:
+                continue
+            if name.startswith(TEMP_PREFIX):
+                result['files'] += 1
+                result['bytes'] += os.path.getsize(path)
+                os.unlink(path)
+            elif len(name) == 64 and name not in known:
+                self._unlink_unreferenced(name, result)
+        return result
+
+    def _unlink_unreferenced(self, sha256, result):
+        # Файл удаляется под собственной строкой-заявкой сборщика. Загрузка,
+        # которая как раз создаёт строку того же блоба (ещё без commit), не
+        # даст вставить заявку: вставка ждёт её транзакцию и получает
+        # IntegrityError - файл нужен. Загрузка, начавшаяся после заявки,
+        # ждёт commit сборщика и кладёт своё содержимое заново.
+        db.session.rollback()
+        claimed = datetime(1970, 1, 1)
+        try:
+            db.session.add(FileBlob(sha256=sha256, size=0, ref_count=0, created_at=claimed, last_used_at=claimed))
+            db.session.flush()
+        except (IntegrityError, OperationalError):
+            # OperationalError - блокировка SQLite не дождалась чужой записи: файл удалит следующий запуск
+            db.session.rollback()
+            return
+        path = self.path_for(sha256)
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+        except FileNotFoundError:
+            size = None
+        db.session.execute(delete(FileBlob).where(FileBlob.sha256 == sha256, FileBlob.ref_count <= 0))
+        db.session.commit()
+        if size is not None:
+            result['files'] += 1
+            result['bytes'] += size
+
+    def _walk(self):
+        if not os.path.isdir(self.root):
+            return
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                yield name, os.path.join(directory, name)
+
+
+def get_blob_store(app=None):
+    """Хранилище блобов приложения (каталог blobs внутри каталога загрузок)"""
+    if app is None:
+        app = current_app
+    root = os.path.join(get_upload_folder(app), BLOBS_DIR)
+    os.makedirs(root, exist_ok=True)
+    return BlobStore(root)
+
+
+def ensure_blob(sha256, size):
+    """Строка блоба в текущей транзакции; отметка использования защищает его от сборщика
+
+    Возвращает True, если строка создана этим вызовом.
+    """
+    now = datetime.utcnow()
+    touched = db.session.execute(
+        update(FileBlob).where(FileBlob.sha256 == sha256).values(last_used_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if touched:
+        return False
+    try:
+        with db.session.begin_nested():
+            db.session.add(FileBlob(sha256=sha256, size=size, ref_count=0, created_at=now, last_used_at=now))
+    except IntegrityError:
+        # Ту же строку только что создала параллельная загрузка
+        return False
+    return True
+
+
+def _change_refs(connection, sha256, delta):
+    if sha256 is None:
+        return
+    connection.execute(
+        update(FileBlob.__table__)
+        .where(FileBlob.__table__.c.sha256 == sha256)
+        .values(ref_count=FileBlob.__table__.c.ref_count + delta, last_used_at=datetime.utcnow())
+    )
+
+
+@event.listens_for(File, 'after_insert')
+def _file_inserted(mapper, connection, target):
+    _change_refs(connection, target.blob_sha256, 1)
+
+
+@event.listens_for(File, 'after_delete')
+def _file_deleted(mapper, connection, target):
+    history = inspect(target).attrs.blob_sha256.history
+    _change_refs(connection, history.deleted[0] if history.deleted else target.blob_sha256, -1)
+
+
+@event.listens_for(File, 'after_update')
+def _file_updated(mapper, connection, target):
+    history = inspect(target).attrs.blob_sha256.history
+    if history.has_changes():
+        _change_refs(connection, history.deleted[0] if history.deleted else None, -1)
+        _change_refs(connection, target.blob_sha256, 1)
+
+
+def collect_blob_garbage(app=None):
+    """Сборка мусора хранилища с отсрочкой BLOB_GC_GRACE_SECONDS"""
+    app = app or current_app
+    grace = timedelta(seconds=app.config.get('BLOB_GC_GRACE_SECONDS', 3600))
+    return get_blob_store(app).collect_garbage(grace)
+
+
+@files_cli.command('gc')
+def gc_command():
+    """Удаление содержимого файлов, на которое больше нет ссылок"""
+    result = collect_blob_garbage()
+    click.echo(f"Removed {result['blobs']} blobs, {result['files']} files, {result['bytes']} bytes")
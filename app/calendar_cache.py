@@ -0,0 +1,81 @@
+"""Кэш готовых JSON-ответов API календаря в памяти процесса
+
+Ответ /calendar/events/cached зависит только от запрошенного диапазона и от
+версии кэша календаря (поколение меняется в транзакции синхронизации, которая
+изменила события). Поэтому закодированное тело хранится в ограниченном LRU
+по ключу (диапазон, поколение) вместе со strong ETag, а повторный запрос
+стоит одного запроса к calendar_sync_state.
+"""
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from sqlalchemy import select
+from app.models import db, CalendarSyncState
+
+CachedResponse = namedtuple('CachedResponse', 'body etag')
+
+
+class ResponseCache:
+    """Потокобезопасный LRU готовых ответов; при смене поколения очищается целиком"""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_generation(self, generation):
+        if generation != self.generation:
+            # Синхронизация (в любом процессе) изменила события: старые ответы не нужны
+            self._entries.clear()
+            self.generation = generation
+
+    def get(self, key, generation):
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, generation, body):
+        """Сохранение тела ответа; возвращает CachedResponse с ETag"""
+        entry = CachedResponse(body, hashlib.sha256(body).hexdigest()[:32])
+        with self._lock:
+            self._check_generation(generation)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation = None
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def calendar_generation():
+    """Версия кэша календаря: поколения всех источников"""
+    rows = db.session.execute(
+        select(CalendarSyncState.source, CalendarSyncState.generation).order_by(CalendarSyncState.source)
+    ).all()
+    return tuple((row.source, row.generation or 0) for row in rows)
+
+
+def get_response_cache(app):
+    """ResponseCache приложения (один на процесс)"""
+    cache = app.extensions.get('calendar_response_cache')
+    if cache is None:
+        cache = app.extensions.setdefault(
+            'calendar_response_cache', ResponseCache(app.config.get('CALENDAR_RESPONSE_CACHE_SIZE', 128))
+        )
+    return cache
@@ -0,0 +1,143 @@
+"""Single-flight обновление кэша календаря (stale-while-revalidate)
+
+В процессе одновременно выполняется не больше одного обновления: остальные
+вызывающие получают ту же "операцию в полёте" и ждут её с ограничением по времени
+или сразу отдают текущие (возможно, устаревшие) данные. Между процессами
+обновления разделяет именованная блокировка (advisory lock или файл для SQLite).
+"""
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from app.models import db, CalendarSyncState
+
+LOCK_NAME = 'calendar_refresh'
+
+
+class Flight:
+    """Одно выполняющееся обновление: результат или ошибка и событие завершения"""
+
+    def __init__(self, force=False):
+        self.force = force
+        self.started_at = datetime.utcnow()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Ожидание завершения не дольше timeout секунд; True, если обновление завершилось"""
+        return self.done.wait(timeout)
+
+
+class SingleFlight:
+    """Запуск функции в фоновом потоке так, чтобы одновременно шёл только один вызов"""
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._flight = None
+
+    @property
+    def in_flight(self):
+        flight = self._flight
+        return flight is not None and not flight.done.is_set()
+
+    def start(self, func, force=False):
+        """Запуск func(flight) или присоединение к уже выполняющемуся вызову
+
+        Принудительное обновление не присоединяется к обычному: после него
+        запускается ещё один вызов.
+        """
+        with self._mutex:
+            current = self._flight
+            running = current is not None and not current.done.is_set()
+            if running and (current.force or not force):
+                return current
+            flight = Flight(force=force)
+            self._flight = flight
+        previous = current if running else None
+        threading.Thread(
+            target=self._run, args=(func, flight, previous), daemon=True, name='CalendarRefresh'
+        ).start()
+        return flight
+
+    @staticmethod
+    def _run(func, flight, previous):
+        try:
+            if previous is not None:
+                previous.wait()
+            flight.result = func(flight)
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.finished_at = datetime.utcnow()
+            flight.done.set()
+
+
+class CalendarRefresher:
+    """Обновление кэша календаря: single-flight в процессе и блокировка между процессами"""
+
+    def __init__(self, app):
+        self.app = app
+        self.flights = SingleFlight()
+
+    def trigger(self, force=False):
+        """Запуск обновления в фоне (или присоединение к текущему); возвращает Flight"""
+        return self.flights.start(self._refresh, force=force)
+
+    def refresh(self, force=False, timeout=None):
+        """Обновление с ожиданием результата; ошибка обновления пробрасывается"""
+        flight = self.trigger(force=force)
+        if not flight.wait(timeout):
+            raise TimeoutError('Calendar refresh is still running')
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _refresh(self, flight):
+        from app.scheduler import make_process_lock, acquire_with_timeout
+        from app.calendar_routes import sync_calendar_cache
+
+        with self.app.app_context():
+            lock = make_process_lock(self.app, LOCK_NAME)
+            waited = False
+            if not lock.acquire():
+                # Обновление уже идёт в другом процессе: ждём его и не повторяем загрузку
+                waited = True
+                checked_before = last_checked_at()
+                db.session.commit()
+                timeout = self.app.config.get('CALENDAR_REFRESH_LOCK_TIMEOUT', 120)
+                if not acquire_with_timeout(lock, timeout):
+                    raise TimeoutError('Calendar refresh lock is held by another process')
+            try:
+                if waited and not flight.force and last_checked_at() != checked_before:
+                    return None
+                return sync_calendar_cache(force=flight.force)
+            finally:
+                lock.release()
+
+
+def last_checked_at(source=None):
+    """Время последней проверки feed любым процессом (None, если проверок не было)
+
+    Без source - самая свежая проверка среди всех источников: источник в backoff
+    не должен делать кэш "устаревшим" для каждого чтения.
+    """
+    stmt = select(func.max(CalendarSyncState.last_checked_at))
+    if source is not None:
+        stmt = stmt.where(CalendarSyncState.source == source)
+    return db.session.execute(stmt).scalar()
+
+
+def is_stale(max_age, source=None):
+    """Кэш устарел: feed не проверялся дольше max_age секунд (или ни разу)"""
+    checked_at = last_checked_at(source)
+    return checked_at is None or checked_at < datetime.utcnow() - timedelta(seconds=max_age)
+
+
+def get_refresher(app):
+    """CalendarRefresher приложения (один на процесс)"""
+    refresher = app.extensions.get('calendar_refresh')
+    if refresher is None:
+        # setdefault атомарен: при гонке потоков останется один экземпляр
+        refresher = app.extensions.setdefault('calendar_refresh', CalendarRefresher(app))
+    return refresher
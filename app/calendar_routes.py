@@ -1,8 +1,12 @@
-from datetime import datetime, timedelta, timezone
+import io
+from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify, render_template, current_app
 from flask_login import login_required, current_user
+from sqlalchemy import and_
 from app import db
 from app.models import CalendarEvent
+from app.calendar_refresh import get_refresher, is_stale
+from app.schedule_index import get_schedule_index
 
 # Часовой пояс для календаря (Europe/Minsk = UTC+3)
 LOCAL_TIMEZONE_OFFSET = timedelta(hours=3)  # UTC+3 для Минска
@@ -13,8 +17,8 @@ bp = Blueprint('calendar', __name__)
 def fetch_events_from_google():
     """Получение событий из Google Calendar без OAuth (публичный доступ)"""
     try:
-        calendar_id = current_app.config.get('GOOGLE_CALENDAR_ID')
-        if not calendar_id:
+        from app.calendar_sources import get_calendar_sources
+        if not get_calendar_sources(current_app.config):
             return []
         
         # Получение событий из кэша БД
@@ -22,18 +26,20 @@ def fetch_events_from_google():
         now = datetime.utcnow() + LOCAL_TIMEZONE_OFFSET
         future = now + timedelta(days=30)
         
-        cached_events = CalendarEvent.query.filter(
-            CalendarEvent.start_time >= now,
-            CalendarEvent.start_time <= future
-        ).order_by(CalendarEvent.start_time).all()
+        def load_events():
+            # Индекс расписания в памяти процесса, без запроса к БД
+            return list(get_schedule_index(current_app._get_current_object()).between(now, future))
         
-        # Если в кэше нет событий, пытаемся обновить
-        if not cached_events:
-            update_calendar_cache()
-            cached_events = CalendarEvent.query.filter(
-                CalendarEvent.start_time >= now,
-                CalendarEvent.start_time <= future
-            ).order_by(CalendarEvent.start_time).all()
+        cached_events = load_events()
+        
+        # Кэш обновляет фоновый планировщик (app/scheduler.py). Если он давно не обновлялся,
+        # запускаем одно обновление в фоне (stale-while-revalidate) и сразу отдаём текущие
+        # данные; при пустом кэше ждём это обновление, но не дольше CALENDAR_REFRESH_WAIT_SECONDS
+        config = current_app.config
+        if config.get('CALENDAR_REFRESH_ON_READ', True) and is_stale(config.get('CALENDAR_STALE_SECONDS', 7200)):
+            flight = get_refresher(current_app._get_current_object()).trigger()
+            if not cached_events and flight.wait(config.get('CALENDAR_REFRESH_WAIT_SECONDS', 5)):
+                cached_events = load_events()
         
         return cached_events
         
@@ -42,267 +48,60 @@ def fetch_events_from_google():
         return []
 
 
-def update_calendar_cache():
-    """Обновление кэша календаря из Google Calendar (публичный доступ)"""
+def parse_ical_events(lines, window_start, window_end, charset=None):
+    """Потоковый разбор iCal feed в список записей событий, попадающих в окно кэширования
+    
+    lines - итератор байтовых строк (ответ HTTP, открытый файл) или bytes целиком.
+    charset - кодировка из Content-Type ответа (если известна).
+    Границы окна и времена событий - naive datetime в локальном времени (UTC+3).
+    """
+    from app.ical_stream import iter_vevents
+    from app.text_decoding import FeedDecoder
+    
+    head = b''
+    if isinstance(lines, bytes):
+        head = lines[:3]
+        lines = io.BytesIO(lines)
+    
+    # Кодировка определяется один раз на документ, а не перебором для каждого поля
+    decoder = FeedDecoder(charset, head)
+    # Повторяющиеся серии и изменённые вхождения возвращаются независимо от окна,
+    # их развёртывает calendar_sync.expand_recurring
+    return list(iter_vevents(lines, window_start, window_end, LOCAL_TIMEZONE_OFFSET, decode=decoder))
+
+
+def sync_calendar_cache(force=False):
+    """Обновление кэша календаря из Google Calendar (публичный доступ)
+    
+    Все источники (GOOGLE_CALENDAR_ID и CALENDAR_SOURCES) загружаются параллельно,
+    каждый записывается своей транзакцией (app/calendar_sources.py).
+    При force=False используются условные запросы (ETag/Last-Modified) и хэш тела:
+    при ответе 304 разбор пропускается, при совпадении хэша - запись в БД.
+    При force=True кэш пересобирается целиком через staging-таблицу и заменяется
+    одной транзакцией: до commit читатели видят прежнюю версию расписания.
+    Возвращает суммарный SyncResult. Если не удалось синхронизировать ни один
+    источник, ошибка пробрасывается: по ней планировщик считает backoff.
+    """
+    from app.calendar_sources import get_calendar_sources, sync_sources
+    from app.calendar_sync import SyncResult
+    
+    sources = get_calendar_sources(current_app.config)
+    if not sources:
+        return None
+    
+    sync = sync_sources(current_app._get_current_object(), sources, force=force)
+    if sync.errors and not sync.results:
+        raise next(iter(sync.errors.values()))
+    return SyncResult.combine(sync.results.values())
+
+
+def update_calendar_cache(force=False):
+    """Обновление кэша календаря без проброса ошибок (ошибка выводится в лог)"""
     try:
-        calendar_id = current_app.config.get('GOOGLE_CALENDAR_ID')
-        if not calendar_id:
-            return
-        
-        # Используем публичный iCal feed для получения событий
-        import urllib.request
-        import urllib.parse
-        import icalendar
-        
-        # Публичный iCal URL для календаря
-        # URL-encode calendar ID для использования в URL
-        encoded_calendar_id = urllib.parse.quote(calendar_id, safe='')
-        ical_url = f"https://calendar.google.com/calendar/ical/{encoded_calendar_id}/public/basic.ics"
-        
-        try:
-            # Создаем запрос с заголовками
-            req = urllib.request.Request(ical_url)
-            req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-            
-            with urllib.request.urlopen(req, timeout=15) as response:
-                cal_data = response.read()
-                # Убеждаемся, что данные правильно декодированы перед парсингом
-                # iCal формат обычно использует UTF-8, но может быть и другой кодировкой
-                try:
-                    # Пробуем декодировать как UTF-8 для проверки
-                    cal_data_str = cal_data.decode('utf-8')
-                    # Если успешно, кодируем обратно в bytes для библиотеки
-                    cal_data = cal_data_str.encode('utf-8')
-                except UnicodeDecodeError:
-                    # Если UTF-8 не работает, оставляем как есть
-                    pass
-                
-                cal = icalendar.Calendar.from_ical(cal_data)
-                
-                # Используем UTC для получения событий из iCal
-                # Потом конвертируем в локальное время (UTC+3)
-                now_utc = datetime.utcnow()
-                future_utc = now_utc + timedelta(days=60)  # Кэшируем на 60 дней
-                # Локальное время для сравнения с событиями в БД (которые хранятся в локальном времени)
-                now_local = now_utc + LOCAL_TIMEZONE_OFFSET
-                future_local = future_utc + LOCAL_TIMEZONE_OFFSET
-                
-                def safe_decode(value, default='', params=None):
-                    """Безопасное декодирование значения из iCal компонента с поддержкой UTF-8"""
-                    if value is None:
-                        return default
-                    
-                    # Проверяем параметр CHARSET из iCal, если есть
-                    charset = 'utf-8'  # По умолчанию UTF-8
-                    if params and 'CHARSET' in params:
-                        charset = params['CHARSET'].lower()
-                    
-                    # Пробуем разные методы получения значения
-                    # 1. Если это bytes, декодируем напрямую
-                    if isinstance(value, bytes):
-                        try:
-                            return value.decode(charset)
-                        except (UnicodeDecodeError, LookupError):
-                            try:
-                                return value.decode('utf-8')
-                            except UnicodeDecodeError:
-                                try:
-                                    return value.decode('latin-1')
-                                except:
-                                    return value.decode('utf-8', errors='replace')
-                    
-                    # 2. Если это vText объект, используем to_ical()
-                    if hasattr(value, 'to_ical'):
-                        try:
-                            ical_bytes = value.to_ical()
-                            if isinstance(ical_bytes, bytes):
-                                # Пробуем декодировать с указанным charset или UTF-8
-                                try:
-                                    decoded = ical_bytes.decode(charset)
-                                    return decoded
-                                except (UnicodeDecodeError, LookupError):
-                                    # Если указанный charset не работает, пробуем UTF-8
-                                    try:
-                                        decoded = ical_bytes.decode('utf-8')
-                                        return decoded
-                                    except UnicodeDecodeError:
-                                        # Если UTF-8 не работает, пробуем latin-1 (часто используется в старых iCal)
-                                        try:
-                                            decoded = ical_bytes.decode('latin-1')
-                                            return decoded
-                                        except:
-                                            # В крайнем случае используем replace для замены нечитаемых символов
-                                            decoded = ical_bytes.decode('utf-8', errors='replace')
-                                            return decoded
-                            else:
-                                # Это уже строка
-                                return str(ical_bytes)
-                        except (AttributeError, TypeError):
-                            pass
-                    
-                    # 3. Если это уже строка, но может содержать неправильную кодировку
-                    # Пробуем перекодировать через latin-1 -> utf-8 (частая проблема)
-                    if isinstance(value, str):
-                        # Проверяем, не является ли это неправильно декодированной UTF-8 строкой
-                        # Это происходит, когда UTF-8 байты были декодированы как latin-1 или cp1252
-                        try:
-                            # Если строка содержит символы, которые выглядят как неправильно декодированные
-                            # (например, последовательности типа "????" или странные символы)
-                            if any(ord(c) > 127 for c in value):
-                                # Пробуем исправить через latin-1 -> utf-8
-                                # Это работает, если UTF-8 был декодирован как latin-1
-                                try:
-                                    fixed = value.encode('latin-1').decode('utf-8')
-                                    # Проверяем, что исправление дало результат (нет замененных символов)
-                                    if '\ufffd' not in fixed and '?' not in fixed[:10]:
-                                        return fixed
-                                except (UnicodeEncodeError, UnicodeDecodeError):
-                                    pass
-                                
-                                # Пробуем исправить через cp1252 -> utf-8 (Windows кодировка)
-                                try:
-                                    fixed = value.encode('cp1252').decode('utf-8')
-                                    if '\ufffd' not in fixed and '?' not in fixed[:10]:
-                                        return fixed
-                                except (UnicodeEncodeError, UnicodeDecodeError):
-                                    pass
-                                
-                                # Пробуем исправить через cp1251 -> utf-8 (кириллица в Windows)
-                                try:
-                                    fixed = value.encode('cp1251').decode('utf-8')
-                                    if '\ufffd' not in fixed and '?' not in fixed[:10]:
-                                        return fixed
-                                except (UnicodeEncodeError, UnicodeDecodeError):
-                                    pass
-                        except:
-                            pass
-                        return value
-                    
-                    # 5. В крайнем случае используем str()
-                    try:
-                        return str(value)
-                    except:
-                        return default
-                
-                for component in cal.walk():
-                    if component.name == "VEVENT":
-                        # Получаем параметры для правильного декодирования
-                        # В icalendar параметры доступны через component.params, но структура может быть разной
-                        uid_value = component.get('UID')
-                        uid_params = {}
-                        if hasattr(component, 'params') and 'UID' in component.params:
-                            uid_params_list = component.params['UID']
-                            if isinstance(uid_params_list, list) and len(uid_params_list) > 0:
-                                uid_params = uid_params_list[0] if isinstance(uid_params_list[0], dict) else {}
-                        
-                        event_id = safe_decode(uid_value, '', uid_params)
-                        if not event_id:
-                            continue
-                        
-                        # Получаем значения с параметрами для правильного декодирования
-                        summary_value = component.get('SUMMARY', 'Без названия')
-                        summary_params = {}
-                        if hasattr(component, 'params') and 'SUMMARY' in component.params:
-                            summary_params_list = component.params['SUMMARY']
-                            if isinstance(summary_params_list, list) and len(summary_params_list) > 0:
-                                summary_params = summary_params_list[0] if isinstance(summary_params_list[0], dict) else {}
-                        summary = safe_decode(summary_value, 'Без названия', summary_params)
-                        
-                        description_value = component.get('DESCRIPTION', '')
-                        description_params = {}
-                        if hasattr(component, 'params') and 'DESCRIPTION' in component.params:
-                            description_params_list = component.params['DESCRIPTION']
-                            if isinstance(description_params_list, list) and len(description_params_list) > 0:
-                                description_params = description_params_list[0] if isinstance(description_params_list[0], dict) else {}
-                        description = safe_decode(description_value, '', description_params)
-                        
-                        location_value = component.get('LOCATION', '')
-                        location_params = {}
-                        if hasattr(component, 'params') and 'LOCATION' in component.params:
-                            location_params_list = component.params['LOCATION']
-                            if isinstance(location_params_list, list) and len(location_params_list) > 0:
-                                location_params = location_params_list[0] if isinstance(location_params_list[0], dict) else {}
-                        location = safe_decode(location_value, '', location_params)
-                        
-                        dtstart = component.get('DTSTART')
-                        dtend = component.get('DTEND')
-                        
-                        if not dtstart or not dtend:
-                            continue
-                        
-                        # Преобразование даты
-                        # iCal может возвращать datetime или date объекты
-                        # Даты в iCal обычно в UTC (формат DTSTART:20251105T103500Z)
-                        if isinstance(dtstart.dt, datetime):
-                            start_time = dtstart.dt
-                            # Если нет timezone, считаем что это UTC (как в iCal формате)
-                            if start_time.tzinfo is None:
-                                start_time = start_time.replace(tzinfo=timezone.utc)
-                        else:
-                            # Это date объект, добавляем время начала дня в UTC
-                            start_time = datetime.combine(dtstart.dt, datetime.min.time(), tzinfo=timezone.utc)
-                        
-                        if isinstance(dtend.dt, datetime):
-                            end_time = dtend.dt
-                            if end_time.tzinfo is None:
-                                end_time = end_time.replace(tzinfo=timezone.utc)
-                        else:
-                            end_time = datetime.combine(dtend.dt, datetime.min.time(), tzinfo=timezone.utc)
-                        
-                        # Конвертируем UTC в локальное время (Europe/Minsk, UTC+3)
-                        # и сохраняем как naive datetime в БД
-                        if start_time.tzinfo:
-                            # Конвертируем из UTC в локальное время (UTC+3)
-                            start_time_utc = start_time
-                            start_time_local = start_time_utc + LOCAL_TIMEZONE_OFFSET
-                            start_time = start_time_local.replace(tzinfo=None)
-                        if end_time.tzinfo:
-                            end_time_utc = end_time
-                            end_time_local = end_time_utc + LOCAL_TIMEZONE_OFFSET
-                            end_time = end_time_local.replace(tzinfo=None)
-                        
-                        # Пропускаем старые события (сравниваем в локальном времени)
-                        if end_time < now_local:
-                            continue
-                        
-                        # Пропускаем события далеко в будущем
-                        if start_time > future_local:
-                            continue
-                        
-                        # Сохранение или обновление в БД
-                        existing = CalendarEvent.query.filter_by(event_id=event_id).first()
-                        if existing:
-                            existing.title = summary
-                            existing.start_time = start_time
-                            existing.end_time = end_time
-                            existing.description = description
-                            existing.location = location
-                            existing.updated_at = datetime.utcnow()
-                        else:
-                            cal_event = CalendarEvent(
-                                event_id=event_id,
-                                title=summary,
-                                start_time=start_time,
-                                end_time=end_time,
-                                description=description,
-                                location=location
-                            )
-                            db.session.add(cal_event)
-                
-                db.session.commit()
-                event_count = CalendarEvent.query.filter(
-                    CalendarEvent.start_time >= now_local - timedelta(days=1),
-                    CalendarEvent.start_time <= future_local
-                ).count()
-                print(f"Calendar cache updated successfully. Calendar ID: {calendar_id}, Events cached: {event_count}")
-                
-        except Exception as e:
-            print(f"Error updating calendar from iCal feed: {e}")
-            # Если iCal не работает, используем альтернативный метод через API
-            # (требует API ключ, но можно оставить пустым для публичных календарей)
-            
+        return sync_calendar_cache(force=force)
     except Exception as e:
-        print(f"Error in update_calendar_cache: {e}")
+        print(f"Error updating calendar from iCal feed: {e}")
+        return None
 
 
 @bp.route('/events')
@@ -340,10 +139,7 @@ def events_list():
         now = datetime.utcnow() + LOCAL_TIMEZONE_OFFSET
         future = now + timedelta(days=7)
         
-        events = CalendarEvent.query.filter(
-            CalendarEvent.start_time >= now,
-            CalendarEvent.start_time <= future
-        ).order_by(CalendarEvent.start_time).all()
+        events = get_schedule_index(current_app._get_current_object()).between(now, future)
         
         # Форматирование для JSON
         events_list = []
@@ -372,65 +168,106 @@ def events_list():
         return jsonify({'error': str(error)}), 500
 
 
+def max_event_duration(app=None):
+    """Наибольшая длительность события в кэше (CALENDAR_MAX_EVENT_HOURS)"""
+    return timedelta(hours=(app or current_app).config.get('CALENDAR_MAX_EVENT_HOURS', 168))
+
+
+def overlaps_range(start, end):
+    """Условие пересечения события с диапазоном (start_time < end AND end_time > start)
+
+    События не длиннее max_event_duration(), поэтому у start_time есть и нижняя
+    граница: выборка - ограниченный просмотр индекса (start_time, end_time),
+    а не всех событий до end.
+    """
+    return and_(
+        CalendarEvent.start_time > start - max_event_duration(),
+        CalendarEvent.start_time < end,
+        CalendarEvent.end_time > start
+    )
+
+
+def _cached_events_range():
+    """Нормализованный диапазон запроса /events/cached (naive datetime)"""
+    # Получаем параметры диапазона дат из запроса (если есть)
+    start_str = request.args.get('start')
+    end_str = request.args.get('end')
+    
+    if start_str and end_str:
+        # FullCalendar передает даты в формате ISO
+        try:
+            start_date = datetime.fromisoformat(start_str.replace('Z', '+00:00'))
+            end_date = datetime.fromisoformat(end_str.replace('Z', '+00:00'))
+            # Конвертируем в UTC naive для сравнения с БД
+            if start_date.tzinfo:
+                start_date = start_date.replace(tzinfo=None)
+            if end_date.tzinfo:
+                end_date = end_date.replace(tzinfo=None)
+            return start_date, end_date
+        except (ValueError, AttributeError):
+            # Если не удалось распарсить, используем дефолтный диапазон
+            pass
+    
+    # Дефолтный диапазон: от текущей минуты до 60 дней вперед
+    # (с точностью до минуты, чтобы ответ можно было переиспользовать)
+    start_date = datetime.utcnow().replace(second=0, microsecond=0)
+    return start_date, start_date + timedelta(days=60)
+
+
+def _encode_cached_events(start_date, end_date):
+    """JSON-тело ответа /events/cached для диапазона"""
+    # Получаем события в запрошенном диапазоне
+    events = CalendarEvent.query.filter(
+        overlaps_range(start_date, end_date)
+    ).order_by(CalendarEvent.start_time).all()
+    
+    events_list = []
+    for event in events:
+        # События в БД хранятся в локальном времени (UTC+3) без timezone:
+        # добавляем его для правильного отображения в браузере
+        events_list.append({
+            'id': event.id,  # ID из БД для загрузки файлов
+            'event_id': event.event_id,  # ID из Google Calendar
+            'source': event.source,  # Календарь группы или подгруппы
+            'title': event.title,
+            'start': event.start_time.isoformat() + '+03:00',
+            'end': event.end_time.isoformat() + '+03:00',
+            'description': event.description or '',
+            'location': event.location or ''
+        })
+    
+    return current_app.json.dumps(events_list).encode('utf-8')
+
+
 @bp.route('/events/cached')
 @login_required
 def events_cached():
-    """Получение событий из кэша БД"""
+    """Получение событий из кэша БД
+    
+    Готовые ответы хранятся в LRU процесса по ключу (диапазон, поколение кэша
+    календаря) со strong ETag; при совпадении If-None-Match возвращается 304.
+    """
+    from app.calendar_cache import get_response_cache, calendar_generation
+    
     try:
-        # Получаем параметры диапазона дат из запроса (если есть)
-        start_str = request.args.get('start')
-        end_str = request.args.get('end')
-        
-        if start_str and end_str:
-            # FullCalendar передает даты в формате ISO
-            try:
-                start_date = datetime.fromisoformat(start_str.replace('Z', '+00:00'))
-                end_date = datetime.fromisoformat(end_str.replace('Z', '+00:00'))
-                # Конвертируем в UTC naive для сравнения с БД
-                if start_date.tzinfo:
-                    start_date = start_date.replace(tzinfo=None)
-                if end_date.tzinfo:
-                    end_date = end_date.replace(tzinfo=None)
-            except (ValueError, AttributeError):
-                # Если не удалось распарсить, используем дефолтный диапазон
-                start_date = datetime.utcnow()
-                end_date = start_date + timedelta(days=60)
-        else:
-            # Дефолтный диапазон: от текущего момента до 60 дней вперед
-            start_date = datetime.utcnow()
-            end_date = start_date + timedelta(days=60)
+        start_date, end_date = _cached_events_range()
+        key = (start_date.isoformat(), end_date.isoformat())
+        generation = calendar_generation()
+        cache = get_response_cache(current_app._get_current_object())
         
-        # Получаем события в запрошенном диапазоне
-        # События, которые пересекаются с диапазоном (start_time < end_date AND end_time > start_date)
-        events = CalendarEvent.query.filter(
-            CalendarEvent.start_time < end_date,
-            CalendarEvent.end_time > start_date
-        ).order_by(CalendarEvent.start_time).all()
-        
-        events_list = []
-        for event in events:
-            # События в БД хранятся в локальном времени (UTC+3)
-            # Добавляем timezone для правильного отображения в браузере
-            start_iso = event.start_time.isoformat()
-            end_iso = event.end_time.isoformat()
-            
-            # Если время не содержит timezone, добавляем локальный (UTC+3)
-            if '+' not in start_iso and 'Z' not in start_iso:
-                start_iso = start_iso + '+03:00'
-            if '+' not in end_iso and 'Z' not in end_iso:
-                end_iso = end_iso + '+03:00'
-            
-            events_list.append({
-                'id': event.id,  # ID из БД для загрузки файлов
-                'event_id': event.event_id,  # ID из Google Calendar
-                'title': event.title,
-                'start': start_iso,
-                'end': end_iso,
-                'description': event.description or '',
-                'location': event.location or ''
-            })
+        entry = cache.get(key, generation)
+        if entry is None:
+            entry = cache.put(key, generation, _encode_cached_events(start_date, end_date))
         
-        return jsonify(events_list)
+        if request.if_none_match.contains(entry.etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.response_class(entry.body, mimetype='application/json')
+        response.set_etag(entry.etag)
+        # Браузер хранит ответ, но перепроверяет его при каждом запросе
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
     except Exception as e:
         current_app.logger.error(f'Error in events_cached: {e}', exc_info=True)
         # Возвращаем пустой массив вместо ошибки, чтобы календарь мог отобразиться
@@ -448,15 +285,20 @@ def refresh_cache():
         # Получаем параметр force_refresh из запроса
         force_refresh = request.json.get('force_refresh', False) if request.is_json else False
         
-        if force_refresh:
-            # Удаляем все существующие события перед обновлением
-            # Это исправит проблемы с кодировкой в уже сохраненных данных
-            deleted_count = CalendarEvent.query.delete()
-            db.session.commit()
-            current_app.logger.info(f'Deleted {deleted_count} calendar events before refresh')
-        
-        update_calendar_cache()
-        return jsonify({'success': True, 'message': 'Календарь успешно обновлен'})
+        # Обновление идёт через тот же single-flight, что и фоновое: параллельные
+        # запросы и планировщик не загружают feed повторно. force_refresh пересобирает
+        # кэш целиком (это исправляет проблемы с кодировкой в уже сохранённых данных),
+        # но события не пропадают: старая версия заменяется одной транзакцией
+        result = get_refresher(current_app._get_current_object()).refresh(
+            force=force_refresh, timeout=current_app.config.get('CALENDAR_REFRESH_LOCK_TIMEOUT', 120)
+        )
+        if force_refresh and result is not None:
+            current_app.logger.info(f'Calendar cache rebuilt: {result}')
+        return jsonify({
+            'success': True,
+            'message': 'Календарь успешно обновлен',
+            'result': result.as_dict() if result is not None else None
+        })
     except Exception as e:
         current_app.logger.error(f'Error refreshing calendar cache: {e}', exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,268 @@
+"""Параллельная синхронизация нескольких календарей (группы и подгруппы)
+
+У каждого источника своё состояние (ETag, хэш тела, окно), счётчик ошибок
+и backoff. Feed загружаются и разбираются в ограниченном пуле потоков без
+обращения к БД, а запись идёт в основном потоке по мере готовности каждого
+источника, отдельной транзакцией: ошибка одного источника не мешает остальным,
+а общее время близко ко времени самого медленного feed.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+from app.models import db
+from app.calendar_sync import DEFAULT_SOURCE
+
+URL_PREFIXES = ('http://', 'https://', 'file://')
+
+
+@dataclass(frozen=True)
+class CalendarSource:
+    """Источник событий: имя (метка событий в БД) и URL iCal feed"""
+    name: str
+    url: str
+
+
+@dataclass
+class FeedFetch:
+    """Результат загрузки и разбора feed в рабочем потоке"""
+    source: CalendarSource
+    started: float
+    not_modified: bool = False
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    records: list = field(default_factory=list)
+    error: Optional[Exception] = None
+
+
+def parse_sources(value):
+    """Разбор CALENDAR_SOURCES: словарь {имя: id} или строка "имя=id_или_url,..." """
+    if isinstance(value, dict):
+        items = value.items()
+    else:
+        items = []
+        for item in (value or '').split(','):
+            name, sep, target = item.partition('=')
+            if sep and name.strip() and target.strip():
+                items.append((name.strip(), target.strip()))
+            elif item.strip():
+                print(f"Invalid calendar source {item.strip()!r}, expected name=calendar_id")
+    return list(items)
+
+
+def get_calendar_sources(config):
+    """Все источники календаря из конфигурации (GOOGLE_CALENDAR_ID - источник default)"""
+    from app.ical_fetch import get_ical_url
+
+    sources = []
+    calendar_id = config.get('GOOGLE_CALENDAR_ID')
+    if calendar_id:
+        sources.append(CalendarSource(DEFAULT_SOURCE, config.get('CALENDAR_ICAL_URL') or get_ical_url(calendar_id)))
+    for name, target in parse_sources(config.get('CALENDAR_SOURCES')):
+        url = target if target.startswith(URL_PREFIXES) else get_ical_url(target)
+        sources.append(CalendarSource(name, url))
+    return sources
+
+
+def fetch_source(source, etag, last_modified, window_start, window_end, timeout):
+    """Загрузка и разбор feed (выполняется в пуле потоков, к БД не обращается)"""
+    from app.ical_fetch import open_feed
+    from app.calendar_routes import parse_ical_events
+
+    fetch = FeedFetch(source, started=time.perf_counter())
+    try:
+        with open_feed(source.url, etag=etag, last_modified=last_modified, timeout=timeout) as feed:
+            fetch.etag = feed.etag
+            fetch.last_modified = feed.last_modified
+            if feed.not_modified:
+                fetch.not_modified = True
+                return fetch
+            # Разбор идёт построчно по мере загрузки ответа
+            fetch.records = parse_ical_events(feed, window_start, window_end, charset=feed.charset)
+        fetch.content_hash = feed.content_hash
+    except Exception as e:
+        fetch.error = e
+    return fetch
+
+
+def backoff_delay(failures, budget, retry_base, max_backoff):
+    """Пауза перед следующей попыткой (секунды); 0, пока бюджет ошибок не исчерпан"""
+    if failures < budget:
+        return 0
+    return min(retry_base * 2 ** (failures - budget), max_backoff)
+
+
+class SourceSync:
+    """Синхронизация набора источников: параллельная загрузка и запись по источникам"""
+
+    def __init__(self, app, sources, force=False):
+        self.app = app
+        self.sources = sources
+        self.force = force
+        self.results = {}
+        self.errors = {}
+        self.skipped = []
+
+    def run(self):
+        """Синхронизация всех источников, готовых к загрузке; возвращает self"""
+        from app.calendar_routes import LOCAL_TIMEZONE_OFFSET
+        from app.calendar_sync import get_sync_state
+
+        config = self.app.config
+        self.now_utc = datetime.utcnow()
+        # Окно кэширования - 60 дней; события в БД хранятся в локальном времени (UTC+3)
+        self.window_start = self.now_utc + LOCAL_TIMEZONE_OFFSET
+        self.window_end = self.now_utc + timedelta(days=60) + LOCAL_TIMEZONE_OFFSET
+        slack = timedelta(hours=config.get('CALENDAR_WINDOW_SLACK_HOURS', 24))
+
+        requests = {}
+        for source in self.sources:
+            state = get_sync_state(source.name, source.url)
+            if not self.force and state.retry_at is not None and state.retry_at > self.now_utc:
+                # Источник исчерпал бюджет ошибок и ждёт окончания backoff
+                self.skipped.append(source.name)
+                continue
+            # Окно кэширования сдвигается со временем: если feed давно не менялся,
+            # делаем безусловную загрузку, чтобы добавить в кэш новые дни
+            conditional = not self.force and state.synced_until is not None \
+                and state.synced_until + slack >= self.window_end
+            requests[source] = (conditional, state.etag, state.last_modified)
+        # Новые состояния сохраняются до загрузки, чтобы не держать транзакцию во время сети
+        db.session.commit()
+        if not requests:
+            return self
+
+        timeout = config.get('CALENDAR_FETCH_TIMEOUT', 15)
+        workers = max(1, min(config.get('CALENDAR_SYNC_MAX_WORKERS', 4), len(requests)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='CalendarFetch') as pool:
+            futures = {
+                pool.submit(
+                    fetch_source, source,
+                    etag if conditional else None,
+                    last_modified if conditional else None,
+                    self.window_start, self.window_end, timeout
+                ): source
+                for source, (conditional, etag, last_modified) in requests.items()
+            }
+            # Каждый источник записывается, как только готов, не дожидаясь остальных
+            for future in as_completed(futures):
+                source = futures[future]
+                fetch = future.result()
+                try:
+                    self.results[source.name] = self.apply(fetch, conditional=requests[source][0])
+                except Exception as e:
+                    db.session.rollback()
+                    self.record_failure(source, e)
+                    self.errors[source.name] = e
+
+        if any(result.changed for result in self.results.values()):
+            # Индекс расписания этого процесса строится сразу, остальные процессы
+            # перестроят свой по новому поколению
+            from app.schedule_index import rebuild_schedule_index
+            rebuild_schedule_index(self.app)
+        return self
+
+    def apply(self, fetch, conditional):
+        """Запись результата загрузки одного источника в БД (своя транзакция)"""
+        from app.calendar_routes import LOCAL_TIMEZONE_OFFSET
+        from app.calendar_sync import (
+            sync_calendar_events, expand_recurring, load_staging, swap_staging, get_sync_state, SyncResult
+        )
+
+        if fetch.error is not None:
+            raise fetch.error
+        source = fetch.source
+        state = get_sync_state(source.name, source.url)
+        state.last_checked_at = self.now_utc
+        state.etag = fetch.etag
+        state.last_modified = fetch.last_modified
+        state.consecutive_failures = 0
+        state.last_error = None
+        state.retry_at = None
+
+        if fetch.not_modified:
+            db.session.commit()
+            print(f"Calendar feed not modified. Source: {source.name}")
+            return SyncResult()
+
+        if conditional and fetch.content_hash == state.content_hash:
+            # Тело совпало с прошлой синхронизацией: запись в БД не нужна
+            db.session.commit()
+            print(f"Calendar feed not changed. Source: {source.name}")
+            return SyncResult()
+
+        # Повторяющиеся серии разворачиваются во вхождения; для неизменённых серий -
+        # только новая часть окна
+        rows, kept_series = expand_recurring(
+            fetch.records, self.window_start, self.window_end, LOCAL_TIMEZONE_OFFSET,
+            full=self.force, source=source.name
+        )
+        self.check_durations(source, rows)
+        if self.force:
+            # Полная пересборка: новая версия собирается в staging-таблице и заменяет
+            # события источника set-based запросами; прежние строки до commit остаются видимыми
+            load_staging(rows, source.name)
+            swap_started = time.perf_counter()
+            result = swap_staging(source.name)
+        else:
+            # Одна выборка существующих событий, diff в памяти и пакетная запись
+            result = sync_calendar_events(
+                rows, self.window_start, self.window_end, commit=False,
+                kept_series=kept_series, source=source.name
+            )
+        # Состояние feed сохраняется в той же транзакции; новое поколение
+        # сбрасывает готовые ответы API календаря во всех процессах
+        if result.changed:
+            state.generation = (state.generation or 0) + 1
+        state.content_hash = fetch.content_hash
+        state.synced_until = self.window_end
+        state.last_synced_at = self.now_utc
+        db.session.commit()
+        if self.force:
+            finished = time.perf_counter()
+            result.rebuild_ms = int((swap_started - fetch.started) * 1000)
+            result.swap_ms = int((finished - swap_started) * 1000)
+
+        print(f"Calendar cache updated successfully. Source: {source.name}, {result}")
+        return result
+
+    def check_durations(self, source, rows):
+        """Предупреждение о событиях длиннее CALENDAR_MAX_EVENT_HOURS (их не найдёт выборка по диапазону)"""
+        from app.calendar_routes import max_event_duration
+
+        limit = max_event_duration(self.app)
+        too_long = [row for row in rows if row['end_time'] - row['start_time'] > limit]
+        if too_long:
+            print(f"Calendar source {source.name}: {len(too_long)} events longer than "
+                  f"CALENDAR_MAX_EVENT_HOURS, e.g. {too_long[0]['title']!r}")
+
+    def record_failure(self, source, error):
+        """Учёт ошибки источника: счётчик подряд и backoff после исчерпания бюджета"""
+        from app.calendar_sync import get_sync_state
+
+        config = self.app.config
+        try:
+            state = get_sync_state(source.name, source.url)
+            state.consecutive_failures = (state.consecutive_failures or 0) + 1
+            state.last_error = str(error)[:1000]
+            delay = backoff_delay(
+                state.consecutive_failures,
+                config.get('CALENDAR_SOURCE_ERROR_BUDGET', 3),
+                config.get('SCHEDULER_RETRY_BASE_SECONDS', 60),
+                config.get('SCHEDULER_MAX_BACKOFF_SECONDS', 3600)
+            )
+            state.retry_at = self.now_utc + timedelta(seconds=delay) if delay else None
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error saving calendar source state {source.name}: {e}")
+            return
+        print(f"Error syncing calendar source {source.name} "
+              f"({state.consecutive_failures} in a row): {error}")
+
+
+def sync_sources(app, sources, force=False):
+    """Синхронизация источников; возвращает SourceSync с results, errors и skipped"""
+    return SourceSync(app, sources, force=force).run()
@@ -0,0 +1,378 @@
+"""Синхронизация кэша календаря: diff в памяти и пакетная запись в БД
+
+Каждый источник (календарь группы или подгруппы) синхронизируется отдельно:
+все функции работают только со строками своего источника.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select, insert, update, delete, or_, and_, exists, literal, func
+from app.models import db, CalendarEvent, CalendarEventStaging, CalendarSeries, CalendarSyncState, File, QueueEntry
+from app.recurrence import expand_series, series_hash, occurrence_event_id
+from app.subjects import CLASS_COLUMNS, get_subject_rules, reclassify_events
+
+# Колонки, которые приходят из iCal и сравниваются при синхронизации
+SYNC_COLUMNS = ('title', 'start_time', 'end_time', 'description', 'location')
+# Ключ вхождения повторяющейся серии однозначно задаётся event_id, поэтому не сравнивается
+SERIES_COLUMNS = ('series_uid', 'occurrence_start')
+# Классификация (предмет, тип занятия, дата) вычисляется из SYNC_COLUMNS и тоже сравнивается:
+# после смены правил синхронизация исправляет строки окна
+COMPARED_COLUMNS = SYNC_COLUMNS + CLASS_COLUMNS
+ROW_COLUMNS = ('source', 'event_id') + SERIES_COLUMNS + COMPARED_COLUMNS
+
+DEFAULT_SOURCE = 'default'
+
+calendar_cli = AppGroup('calendar', help='Кэш календаря')
+
+
+@dataclass
+class SyncResult:
+    """Итог синхронизации: сколько строк вставлено, обновлено, не изменилось и удалено"""
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    # Только для полной пересборки: время загрузки и разбора feed до замены
+    # и время самой замены (транзакции, на которую читатели могут ждать блокировку)
+    rebuild_ms: Optional[int] = None
+    swap_ms: Optional[int] = None
+
+    @classmethod
+    def combine(cls, results):
+        """Суммарный итог синхронизации нескольких источников"""
+        total = cls()
+        for result in results:
+            total.inserted += result.inserted
+            total.updated += result.updated
+            total.unchanged += result.unchanged
+            total.deleted += result.deleted
+            if result.rebuild_ms is not None:
+                total.rebuild_ms = max(total.rebuild_ms or 0, result.rebuild_ms)
+                total.swap_ms = max(total.swap_ms or 0, result.swap_ms)
+        return total
+
+    @property
+    def changed(self):
+        return bool(self.inserted or self.updated or self.deleted)
+
+    def as_dict(self):
+        result = {
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'deleted': self.deleted
+        }
+        if self.rebuild_ms is not None:
+            result['rebuild_ms'] = self.rebuild_ms
+            result['swap_ms'] = self.swap_ms
+        return result
+
+    def __str__(self):
+        text = (f"inserted: {self.inserted}, updated: {self.updated}, "
+                f"unchanged: {self.unchanged}, deleted: {self.deleted}")
+        if self.rebuild_ms is not None:
+            text += f", rebuild: {self.rebuild_ms} ms, swap: {self.swap_ms} ms"
+        return text
+
+
+def _in_window(window_start, window_end):
+    """Условие пересечения события с окном кэширования"""
+    return and_(
+        CalendarEvent.end_time >= window_start,
+        CalendarEvent.start_time <= window_end
+    )
+
+
+def compute_diff(records, existing, window_start, window_end, kept_series=frozenset()):
+    """Вычисление diff между записями из feed и строками из БД
+
+    existing - словарь {event_id: row}, где row содержит id, series_uid и COMPARED_COLUMNS.
+    Вхождения серий из kept_series не удаляются: серия не менялась, а records
+    содержат только новую часть её вхождений.
+    Возвращает (inserts, updates, unchanged, delete_ids).
+    """
+    incoming = {}
+    for record in records:
+        # В БД пишутся только колонки кэша; при дублировании UID побеждает последнее вхождение
+        incoming[record['event_id']] = {column: record.get(column) for column in ROW_COLUMNS}
+
+    inserts = []
+    updates = []
+    unchanged = 0
+    for event_id, record in incoming.items():
+        row = existing.get(event_id)
+        if row is None:
+            inserts.append(record)
+        elif any(getattr(row, column) != record[column] for column in COMPARED_COLUMNS):
+            updates.append(dict(record, id=row.id))
+        else:
+            unchanged += 1
+
+    # Удаляем только события из окна, которые исчезли из feed.
+    # Пустой feed скорее означает сбой источника, чем пустое расписание
+    delete_ids = []
+    if incoming:
+        delete_ids = [
+            row.id for event_id, row in existing.items()
+            if event_id not in incoming
+            and row.series_uid not in kept_series
+            and row.end_time >= window_start and row.start_time <= window_end
+        ]
+
+    return inserts, updates, unchanged, delete_ids
+
+
+def _load_existing(event_ids, window_start, window_end, source=DEFAULT_SOURCE):
+    """Загрузка существующих строк окна и строк с пришедшими event_id одним запросом"""
+    columns = [CalendarEvent.id, CalendarEvent.event_id, CalendarEvent.series_uid] + \
+        [getattr(CalendarEvent, c) for c in COMPARED_COLUMNS]
+    condition = _in_window(window_start, window_end)
+    if event_ids:
+        # Событие могло переехать в окно извне, поэтому ищем и по event_id
+        condition = or_(condition, CalendarEvent.event_id.in_(event_ids))
+    rows = db.session.execute(
+        select(*columns).where(CalendarEvent.source == source, condition)
+    ).all()
+    return {row.event_id: row for row in rows}
+
+
+def _upsert(rows):
+    """Пакетная запись новых и изменённых строк с учётом диалекта БД"""
+    dialect = db.session.get_bind().dialect.name
+    table = CalendarEvent.__table__
+    set_columns = COMPARED_COLUMNS + ('updated_at',)
+
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        stmt = pg_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.source, table.c.event_id],
+            set_={column: stmt.excluded[column] for column in set_columns}
+        )
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table)
+        stmt = stmt.on_duplicate_key_update(
+            {column: stmt.inserted[column] for column in set_columns}
+        )
+    else:
+        return False
+
+    values = [{key: value for key, value in row.items() if key != 'id'} for row in rows]
+    db.session.execute(stmt, values)
+    return True
+
+
+def apply_diff(inserts, updates, delete_ids):
+    """Применение diff пакетными запросами (без commit)"""
+    now = datetime.utcnow()
+    inserts = [dict(record, updated_at=now) for record in inserts]
+    updates = [dict(record, updated_at=now) for record in updates]
+
+    if inserts or updates:
+        # PostgreSQL/MySQL: один INSERT ... ON CONFLICT / ON DUPLICATE KEY,
+        # остальные диалекты (SQLite): executemany INSERT и UPDATE по первичному ключу
+        if not _upsert(inserts + updates):
+            if inserts:
+                db.session.execute(insert(CalendarEvent), inserts)
+            if updates:
+                db.session.execute(update(CalendarEvent), updates)
+
+    deleted = 0
+    if delete_ids:
+        # События с прикреплёнными файлами или записями в очереди не удаляем
+        stmt = delete(CalendarEvent).where(
+            CalendarEvent.id.in_(delete_ids),
+            ~exists().where(File.calendar_event_id == CalendarEvent.id),
+            ~exists().where(QueueEntry.calendar_event_id == CalendarEvent.id)
+        ).execution_options(synchronize_session=False)
+        deleted = db.session.execute(stmt).rowcount
+    return deleted
+
+
+def sync_calendar_events(records, window_start, window_end, commit=True, kept_series=frozenset(),
+                         source=DEFAULT_SOURCE):
+    """Синхронизация событий окна источника с кэшем в БД
+
+    records - список словарей с event_id и SYNC_COLUMNS (время в локальном naive формате),
+    у вхождений повторяющихся серий также series_uid и occurrence_start.
+    """
+    rules = get_subject_rules()
+    records = [rules.classify_record(dict(record, source=source)) for record in records]
+    event_ids = list({record['event_id'] for record in records})
+    existing = _load_existing(event_ids, window_start, window_end, source)
+    inserts, updates, unchanged, delete_ids = compute_diff(
+        records, existing, window_start, window_end, kept_series
+    )
+    deleted = apply_diff(inserts, updates, delete_ids)
+
+    if commit:
+        db.session.commit()
+
+    return SyncResult(
+        inserted=len(inserts),
+        updated=len(updates),
+        unchanged=unchanged,
+        deleted=deleted
+    )
+
+
+def load_staging(records, source=DEFAULT_SOURCE):
+    """Загрузка новой версии расписания источника в staging-таблицу (без commit)"""
+    rules = get_subject_rules()
+    incoming = {}
+    for record in records:
+        record = rules.classify_record(dict(record, source=source))
+        incoming[record['event_id']] = {column: record.get(column) for column in ROW_COLUMNS}
+    db.session.execute(delete(CalendarEventStaging).where(CalendarEventStaging.source == source))
+    if incoming:
+        db.session.execute(insert(CalendarEventStaging), list(incoming.values()))
+    return len(incoming)
+
+
+def swap_staging(source=DEFAULT_SOURCE):
+    """Замена событий источника содержимым staging-таблицы (без commit)
+
+    Замена выполняется несколькими set-based запросами в текущей транзакции:
+    читатели до commit видят прежнюю версию целиком. Строки с тем же event_id
+    обновляются на месте (первичный ключ и привязка файлов сохраняются),
+    события с файлами или записями в очереди не удаляются. Пустая staging-таблица
+    (пустой feed) не очищает кэш.
+    """
+    events = CalendarEvent.__table__
+    staging = CalendarEventStaging.__table__
+    now = datetime.utcnow()
+    staged = db.session.execute(
+        select(func.count()).select_from(staging).where(staging.c.source == source)
+    ).scalar()
+    if not staged:
+        return SyncResult()
+
+    same_event = and_(staging.c.source == events.c.source, staging.c.event_id == events.c.event_id)
+    deleted = db.session.execute(
+        delete(events).where(
+            events.c.source == source,
+            ~exists().where(same_event),
+            ~exists().where(File.calendar_event_id == events.c.id),
+            ~exists().where(QueueEntry.calendar_event_id == events.c.id)
+        )
+    ).rowcount
+
+    columns = SERIES_COLUMNS + COMPARED_COLUMNS
+    # UPDATE ... FROM: переписываются только строки, которые отличаются от новой версии
+    updated = db.session.execute(
+        update(events)
+        .where(
+            staging.c.source == source,
+            same_event,
+            or_(*[events.c[column].is_distinct_from(staging.c[column]) for column in columns])
+        )
+        .values(dict({column: staging.c[column] for column in columns}, updated_at=now))
+    ).rowcount
+
+    inserted = db.session.execute(
+        insert(events).from_select(
+            ROW_COLUMNS + ('updated_at',),
+            select(*[staging.c[column] for column in ROW_COLUMNS], literal(now))
+            .where(staging.c.source == source, ~exists().where(same_event))
+        )
+    ).rowcount
+
+    db.session.execute(delete(staging).where(staging.c.source == source))
+    return SyncResult(
+        inserted=inserted,
+        updated=updated,
+        unchanged=staged - inserted - updated,
+        deleted=deleted
+    )
+
+
+def expand_recurring(records, window_start, window_end, local_offset, full=False, source=DEFAULT_SOURCE):
+    """Развёртывание повторяющихся серий из feed в отдельные вхождения (без commit)
+    
+    Для серии, которая не менялась с прошлой синхронизации (совпал хэш), разворачивается
+    только новая часть окна после CalendarSeries.expanded_until; при full=True и для
+    изменённых серий - всё окно. Возвращает (rows, kept_series): строки для
+    sync_calendar_events и UID серий, уже развёрнутые вхождения которых актуальны.
+    """
+    rows = []
+    masters = {}
+    overrides = defaultdict(list)
+    for record in records:
+        if 'rrule' in record:
+            masters[record['event_id']] = record
+        elif 'recurrence_id' in record:
+            overrides[record['event_id']].append(record)
+        else:
+            rows.append(record)
+
+    states = {series.uid: series for series in CalendarSeries.query.filter_by(source=source).all()}
+    kept_series = set()
+    for uid, master in masters.items():
+        series_overrides = overrides.pop(uid, [])
+        content_hash = series_hash(master, series_overrides)
+        state = states.pop(uid, None)
+        range_start = window_start
+        if state is None:
+            state = CalendarSeries(source=source, uid=uid, content_hash=content_hash)
+            db.session.add(state)
+        elif not full and state.content_hash == content_hash \
+                and state.expanded_until is not None and state.expanded_until >= window_start:
+            kept_series.add(uid)
+            range_start = state.expanded_until
+        state.content_hash = content_hash
+
+        if range_start <= window_end:
+            try:
+                rows.extend(expand_series(master, series_overrides, range_start, window_end, local_offset))
+            except ValueError as e:
+                # Некорректное правило: кэшируем только первое вхождение
+                print(f"Error expanding recurring event {uid}: {e}")
+                if master['end_time'] >= window_start and master['start_time'] <= window_end:
+                    rows.append(master)
+        state.expanded_until = max(window_end, range_start)
+
+    # Изменённые вхождения без основной серии в feed - обычные события
+    for uid, series_overrides in overrides.items():
+        for override in series_overrides:
+            if override['cancelled'] or override['end_time'] < window_start or override['start_time'] > window_end:
+                continue
+            rows.append(dict(
+                override,
+                event_id=occurrence_event_id(uid, override['recurrence_id']),
+                series_uid=uid,
+                occurrence_start=override['recurrence_id']
+            ))
+
+    # Серии, исчезнувшие из feed; их вхождения в окне удалит diff
+    for state in states.values():
+        db.session.delete(state)
+
+    return rows, kept_series
+
+
+def get_sync_state(source, url):
+    """Состояние синхронизации источника (создаётся при первом обращении)"""
+    state = CalendarSyncState.query.filter_by(source=source).first()
+    if state is None:
+        state = CalendarSyncState(source=source)
+        db.session.add(state)
+    if state.url != url:
+        # Для другого URL сохранённые ETag и хэш недействительны
+        state.url = url
+        state.etag = None
+        state.last_modified = None
+        state.content_hash = None
+        state.synced_until = None
+    return state
+
+
+@calendar_cli.command('reclassify')
+def reclassify_command():
+    """Пересчёт предмета и типа занятия всех событий по текущим правилам"""
+    changed = reclassify_events()
+    db.session.commit()
+    click.echo(f"Reclassified events: {changed}")
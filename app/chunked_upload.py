@@ -0,0 +1,223 @@
+"""Загрузка больших файлов по частям с продолжением (в духе протокола tus)
+
+Клиент создаёт сессию с объявленным размером файла, затем отправляет части
+запросами PATCH с заголовком Upload-Offset и, когда приняты все байты,
+завершает загрузку. Каждая часть - отдельный короткий запрос (не больше
+MAX_CONTENT_LENGTH), поэтому обрыв сети теряет только текущую часть, а воркер
+не занят всю медленную загрузку. После обрыва клиент узнаёт принятое смещение
+(HEAD) и продолжает с него.
+
+Принятые байты дописываются в uploads/partials/<id>.part. Запись части и
+смена смещения в БД идут под блокировкой частичного файла (locked_partial),
+поэтому повтор или опоздавшая копия уже принятой части получает 409 и не
+трогает файл. Сессия живёт CHUNKED_UPLOAD_EXPIRY_SECONDS с последней части; брошенные
+сессии и их файлы удаляет задача планировщика.
+"""
+import os
+import shutil
+import secrets
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from sqlalchemy import select, update, delete
+from app.models import db, UploadSession
+from app.file_storage import TEMP_PREFIX, get_upload_folder
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+PARTIALS_DIR = 'partials'
+
+
+class UploadConflict(Exception):
+    """Смещение части не совпадает с принятым сервером (клиент должен спросить HEAD)"""
+
+    def __init__(self, offset):
+        super().__init__(f'Expected offset {offset}')
+        self.offset = offset
+
+
+class UploadTooLarge(Exception):
+    """Часть выходит за объявленный размер файла"""
+
+
+def get_partials_folder(app=None):
+    folder = os.path.join(get_upload_folder(app), PARTIALS_DIR)
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def partial_path(session_id, app=None):
+    return os.path.join(get_partials_folder(app), f'{session_id}.part')
+
+
+def session_lifetime(app):
+    return timedelta(seconds=app.config.get('CHUNKED_UPLOAD_EXPIRY_SECONDS', 24 * 3600))
+
+
+def create_session(app, user_id, calendar_event_id, filename, length):
+    """Новая сессия загрузки (без commit) и пустой частичный файл"""
+    now = datetime.utcnow()
+    session = UploadSession(
+        id=secrets.token_hex(16),
+        user_id=user_id,
+        calendar_event_id=calendar_event_id,
+        original_filename=filename,
+        length=length,
+        offset=0,
+        created_at=now,
+        expires_at=now + session_lifetime(app)
+    )
+    open(partial_path(session.id, app), 'wb').close()
+    db.session.add(session)
+    return session
+
+
+@contextmanager
+def locked_partial(session_id, app=None):
+    """Частичный файл сессии, открытый под исключительной блокировкой
+
+    Блокировка держится, пока запрос сверяет смещение, пишет часть и
+    сохраняет новое смещение, поэтому части одной сессии записываются строго
+    по очереди, в том числе из разных воркеров. Нет файла (загрузку завершили
+    или отменили) - FileNotFoundError.
+    """
+    with open(partial_path(session_id, app), 'r+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def accepted_offset(session, f):
+    """Смещение сессии, сверенное с частичным файлом (вызывается под блокировкой)
+
+    Смещение перечитывается из БД: пока запрос ждал блокировку, другие части
+    могли быть приняты, а сессию - завершить (FileNotFoundError). Файл короче смещения (его обрезали или повредили) -
+    смещение уменьшается до размера файла, и клиент досылает недостающее.
+    """
+    # Новая транзакция: снимок, взятый до ожидания блокировки, устарел
+    db.session.commit()
+    if db.session.scalar(select(UploadSession.offset).where(UploadSession.id == session.id)) is None:
+        raise FileNotFoundError(f'Upload session {session.id} is finished')
+    db.session.refresh(session)
+    size = os.fstat(f.fileno()).st_size
+    if size < session.offset:
+        db.session.execute(
+            update(UploadSession).where(UploadSession.id == session.id)
+            .values(offset=size)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        db.session.refresh(session)
+    return session.offset
+
+
+def append_chunk(app, session, offset, stream, chunk_size=64 * 1024):
+    """Дописывание части с позиции offset из потока запроса; возвращает новое смещение
+
+    Части, пришедшие не по порядку или повторно, отклоняются (UploadConflict);
+    байты сверх объявленного размера - UploadTooLarge. Тело запроса сначала
+    принимается во временный файл: медленный клиент не держит блокировку
+    сессии, а часть, опоздавшая после повтора, проверяется по смещению уже
+    после того, как пришла целиком, и ничего в файле не меняет.
+    """
+    if offset != session.offset:
+        raise UploadConflict(session.offset)
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024, dir=get_partials_folder(app)) as body:
+        received = 0
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            received += len(chunk)
+            if offset + received > session.length:
+                raise UploadTooLarge()
+            body.write(chunk)
+        body.seek(0)
+
+        with locked_partial(session.id, app) as f:
+            if accepted_offset(session, f) != offset:
+                raise UploadConflict(session.offset)
+            # Хвост от прерванной записи, смещение которой не было сохранено, отбрасывается
+            f.truncate(offset)
+            f.seek(offset)
+            shutil.copyfileobj(body, f, chunk_size)
+            f.flush()
+            os.fsync(f.fileno())
+
+            new_offset = offset + received
+            db.session.execute(
+                update(UploadSession)
+                .where(UploadSession.id == session.id)
+                .values(offset=new_offset, expires_at=datetime.utcnow() + session_lifetime(app))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+    db.session.refresh(session)
+    return new_offset
+
+
+def discard_session(app, session):
+    """Удаление сессии и её частичного файла (без commit)"""
+    db.session.delete(session)
+    try:
+        os.unlink(partial_path(session.id, app))
+    except FileNotFoundError:
+        pass
+
+
+def cleanup_upload_sessions(app=None):
+    """Удаление просроченных сессий, их частичных файлов и брошенных временных файлов
+
+    Возвращает {'sessions': ..., 'files': ...}.
+    """
+    app = app or current_app
+    now = datetime.utcnow()
+    expired = db.session.scalars(select(UploadSession.id).where(UploadSession.expires_at < now)).all()
+    if expired:
+        db.session.execute(delete(UploadSession).where(
+            UploadSession.id.in_(expired), UploadSession.expires_at < now
+        ))
+    db.session.commit()
+    active = set(db.session.scalars(select(UploadSession.id)))
+    db.session.rollback()
+
+    removed = 0
+    stale = time.time() - session_lifetime(app).total_seconds()
+    partials = get_partials_folder(app)
+    for name in os.listdir(partials):
+        path = os.path.join(partials, name)
+        session_id = name[:-len('.part')] if name.endswith('.part') else None
+        if session_id not in active and (session_id in expired or os.path.getmtime(path) < stale):
+            os.unlink(path)
+            removed += 1
+    # Временные файлы обычных загрузок, оставшиеся после падения процесса
+    upload_folder = get_upload_folder(app)
+    for name in os.listdir(upload_folder):
+        path = os.path.join(upload_folder, name)
+        if name.startswith(TEMP_PREFIX) and os.path.getmtime(path) < stale:
+            os.unlink(path)
+            removed += 1
+    return {'sessions': len(expired), 'files': removed}
+
+
+@click.command('sweep-uploads')
+def sweep_uploads_command():
+    """Удаление брошенных загрузок по частям и временных файлов"""
+    result = cleanup_upload_sessions()
+    click.echo(f"Removed {result['sessions']} upload sessions, {result['files']} files")
@@ -1,44 +1,117 @@
-"""Модуль для шифрования персональных данных"""
-from cryptography.fernet import Fernet
+"""Модуль для шифрования персональных данных
+
+Шифр (MultiFernet) строится один раз на приложение (вывод ключей, разбор base64)
+и переиспользуется всеми потоками; он пересоздаётся только при изменении
+ENCRYPTION_KEY, ENCRYPTION_OLD_KEYS или SECRET_KEY в конфигурации. Шифрует
+первый (текущий) ключ, расшифровывают все: после смены ключа данные читаются
+и до перешифрования (flask encryption rotate).
+"""
+from cryptography.fernet import Fernet, MultiFernet
 import os
 import base64
 import hashlib
+import threading
 from flask import current_app
 
+# Шифр для работы без контекста приложения: {SECRET_KEY из окружения: Fernet}
+_fallback_ciphers = {}
+_lock = threading.Lock()
+
+
+def _derive_key(secret_key):
+    """Ключ Fernet из SECRET_KEY: SHA256 даёт 32 байта, Fernet ждёт их в base64"""
+    key_bytes = hashlib.sha256(secret_key.encode('utf-8')).digest()
+    return base64.urlsafe_b64encode(key_bytes)
+
+
+def _key_from_config(config):
+    key = config.get('ENCRYPTION_KEY')
+
+    if not key:
+        # Генерируем ключ из SECRET_KEY
+        return _derive_key(config.get('SECRET_KEY', 'default-secret-key-change-me'))
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+    return key
+
+
+def _parse_key(value):
+    """Ключ Fernet как есть или, если это не ключ, вывод из секрета (как из SECRET_KEY)"""
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    try:
+        Fernet(value)
+        return value
+    except ValueError:
+        return _derive_key(value.decode('utf-8'))
+
+
+def get_decryption_keys(config):
+    """Ключи для расшифровки: текущий, затем прежние
+
+    Прежние - ENCRYPTION_OLD_KEYS (ключи или старые SECRET_KEY через запятую);
+    если задан ENCRYPTION_KEY, также ключ из SECRET_KEY, которым данные
+    шифровались до его появления.
+    """
+    keys = [_key_from_config(config)]
+    old_keys = config.get('ENCRYPTION_OLD_KEYS') or ''
+    if isinstance(old_keys, str):
+        old_keys = [key.strip() for key in old_keys.split(',')]
+    for key in old_keys:
+        if key:
+            keys.append(_parse_key(key))
+    if config.get('ENCRYPTION_KEY'):
+        keys.append(_derive_key(config.get('SECRET_KEY', 'default-secret-key-change-me')))
+    # Без повторов, порядок сохраняется
+    return list(dict.fromkeys(keys))
+
+
+def key_fingerprint(key):
+    """Короткий отпечаток ключа для журналов и состояния перешифрования"""
+    return hashlib.sha256(key).hexdigest()[:16]
+
 
 def get_encryption_key():
     """Получение ключа шифрования из конфигурации или генерация нового"""
     try:
-        key = current_app.config.get('ENCRYPTION_KEY')
-        
-        if not key:
-            # Генерируем ключ из SECRET_KEY
-            secret_key = current_app.config.get('SECRET_KEY', 'default-secret-key-change-me')
-            # Используем SHA256 для получения 32 байт
-            key_bytes = hashlib.sha256(secret_key.encode('utf-8')).digest()
-            # Кодируем в base64 для Fernet
-            key = base64.urlsafe_b64encode(key_bytes)
-        else:
-            if isinstance(key, str):
-                key = key.encode('utf-8')
-        
-        return key
+        return _key_from_config(current_app.config)
     except RuntimeError:
         # Если нет контекста приложения, используем дефолтный ключ
-        secret_key = os.getenv('SECRET_KEY', 'default-secret-key-change-me')
-        key_bytes = hashlib.sha256(secret_key.encode('utf-8')).digest()
-        return base64.urlsafe_b64encode(key_bytes)
+        return _derive_key(os.getenv('SECRET_KEY', 'default-secret-key-change-me'))
+
+
+def get_cipher(app=None):
+    """Шифр приложения из реестра (строится при первом обращении и при смене ключей)"""
+    if app is None:
+        try:
+            app = current_app._get_current_object()
+        except RuntimeError:
+            secret_key = os.getenv('SECRET_KEY', 'default-secret-key-change-me')
+            cipher = _fallback_ciphers.get(secret_key)
+            if cipher is None:
+                cipher = _fallback_ciphers.setdefault(secret_key, Fernet(_derive_key(secret_key)))
+            return cipher
+
+    # Отпечаток - исходные значения конфигурации: проверка стоит трёх обращений к словарю
+    config = app.config
+    fingerprint = (config.get('ENCRYPTION_KEY'), config.get('ENCRYPTION_OLD_KEYS'), config.get('SECRET_KEY'))
+    entry = app.extensions.get('encryption_cipher')
+    if entry is None or entry[0] != fingerprint:
+        with _lock:
+            entry = app.extensions.get('encryption_cipher')
+            if entry is None or entry[0] != fingerprint:
+                entry = (fingerprint, MultiFernet([Fernet(key) for key in get_decryption_keys(config)]))
+                app.extensions['encryption_cipher'] = entry
+    return entry[1]
 
 
 def encrypt_data(data: str) -> str:
     """Шифрование данных"""
     if not data:
         return ""
-    
+
     try:
-        key = get_encryption_key()
-        fernet = Fernet(key)
-        encrypted = fernet.encrypt(data.encode('utf-8'))
+        encrypted = get_cipher().encrypt(data.encode('utf-8'))
         return encrypted.decode('utf-8')
     except Exception as e:
         print(f"Error encrypting data: {e}")
@@ -50,14 +123,37 @@ def decrypt_data(encrypted_data: str) -> str:
     """Расшифровка данных"""
     if not encrypted_data:
         return ""
-    
+
     try:
-        key = get_encryption_key()
-        fernet = Fernet(key)
-        decrypted = fernet.decrypt(encrypted_data.encode('utf-8'))
+        decrypted = get_cipher().decrypt(encrypted_data.encode('utf-8'))
         return decrypted.decode('utf-8')
     except Exception as e:
         print(f"Error decrypting data: {e}")
         # В случае ошибки возвращаем исходные данные (возможно, не зашифровано)
         return encrypted_data
 
+
+def decrypt_many(encrypted_values) -> list:
+    """Расшифровка списка значений одним экземпляром шифра (порядок сохраняется)"""
+    values = list(encrypted_values)
+    if not any(values):
+        return ["" for _ in values]
+
+    try:
+        fernet = get_cipher()
+    except Exception as e:
+        print(f"Error decrypting data: {e}")
+        return [value or "" for value in values]
+
+    result = []
+    for value in values:
+        if not value:
+            result.append("")
+            continue
+        try:
+            result.append(fernet.decrypt(value.encode('utf-8')).decode('utf-8'))
+        except Exception as e:
+            print(f"Error decrypting data: {e}")
+            # Как и decrypt_data: возможно, значение не зашифровано
+            result.append(value)
+    return result
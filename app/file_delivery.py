@@ -0,0 +1,74 @@
+"""Отдача загруженных файлов: напрямую или через прокси
+
+Права на файл всегда проверяет приложение, а байты отдаёт выбранный способ
+(FILE_DELIVERY):
+
+- direct - поток из Werkzeug с поддержкой Range/If-Range (докачка, перемотка);
+  воркер занят, пока клиент не получит весь файл;
+- x-accel - заголовок X-Accel-Redirect, файл из internal-location отдаёт nginx;
+- x-sendfile - заголовок X-Sendfile для Apache (mod_xsendfile) и Passenger.
+
+При отдаче через прокси Range, If-Range и 304 обрабатывает сам прокси, а воркер
+освобождается сразу после проверки прав, как бы медленно ни качал клиент.
+"""
+import os
+from urllib.parse import quote
+from flask import current_app, request
+from werkzeug.security import safe_join
+from werkzeug.exceptions import NotFound
+from werkzeug.utils import send_file
+from app.file_storage import get_upload_folder
+
+DELIVERY_BACKENDS = ('direct', 'x-accel', 'x-sendfile')
+
+
+def get_delivery_backend(app=None):
+    """Способ отдачи файлов из FILE_DELIVERY"""
+    app = app or current_app
+    backend = (app.config.get('FILE_DELIVERY') or 'direct').lower()
+    if backend not in DELIVERY_BACKENDS:
+        raise ValueError(f'Unknown FILE_DELIVERY {backend!r}, expected one of {", ".join(DELIVERY_BACKENDS)}')
+    return backend
+
+
+def send_upload(relative_path, download_name, etag=None):
+    """Ответ с файлом из каталога загрузок (путь относительно него, как files.filename)
+
+    etag - постоянный идентификатор содержимого (SHA-256 блоба): If-Range и
+    If-None-Match с ним работают одинаково на всех серверах.
+    """
+    backend = get_delivery_backend()
+    path = safe_join(get_upload_folder(), relative_path)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+
+    response = send_file(
+        path,
+        request.environ,
+        as_attachment=True,
+        download_name=download_name,
+        etag=etag or True,
+        # Диапазоны и условные запросы при отдаче через прокси обрабатывает прокси
+        conditional=backend == 'direct',
+        use_x_sendfile=backend != 'direct',
+        response_class=current_app.response_class,
+        _root_path=current_app.root_path
+    )
+    if backend == 'direct':
+        # Werkzeug объявляет поддержку диапазонов только в ответах 206; без
+        # заголовка в полном ответе браузеры не докачивают прерванный файл
+        response.accept_ranges = 'bytes'
+    else:
+        # Тело ответа пустое, длину и диапазоны прокси выставляет по самому файлу:
+        # Content-Length файла при пустом теле WSGI-сервер счёл бы оборванным ответом
+        for header in ('Content-Length', 'Content-Range', 'Accept-Ranges'):
+            del response.headers[header]
+        # Иначе Werkzeug добавит Content-Length: 0 по пустому телу
+        response.automatically_set_content_length = False
+        if backend == 'x-accel':
+            del response.headers['X-Sendfile']
+            prefix = current_app.config.get('X_ACCEL_REDIRECT_PREFIX', '/protected-uploads/')
+            response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(relative_path)
+    # Файлы пользователей не должны оседать в общих кэшах
+    response.cache_control.private = True
+    return response
@@ -0,0 +1,117 @@
+"""Приём загружаемых файлов: запись тела запроса сразу в каталог загрузок
+
+Werkzeug по умолчанию складывает файл из multipart во временный файл, после чего
+file.save() копирует его ещё раз, а размер и контрольная сумма требуют
+отдельного чтения. UploadRequest отдаёт парсеру поток, который пишет части
+файла (по буферу парсера, 64 КБ) прямо во временный файл в каталоге загрузок и
+по пути считает SHA-256 и размер. Маршрут переименовывает его в итоговое имя
+(os.replace в том же каталоге атомарен), поэтому читатели никогда не видят
+недописанный файл. Незакреплённый временный файл удаляется при закрытии запроса.
+"""
+import os
+import hashlib
+import tempfile
+from flask import current_app, has_app_context
+from flask import Request
+
+TEMP_PREFIX = '.upload-'
+TEMP_SUFFIX = '.part'
+
+
+def get_upload_folder(app=None):
+    """Абсолютный путь каталога загрузок (UPLOAD_FOLDER относительно рабочего каталога)"""
+    if app is None:
+        app = current_app
+    folder = os.path.join(os.getcwd(), app.config.get('UPLOAD_FOLDER', 'uploads'))
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+class HashingUploadFile:
+    """Временный файл загрузки с подсчётом SHA-256 и размера при записи"""
+
+    def __init__(self, directory):
+        fd, self.temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, suffix=TEMP_SUFFIX, dir=directory)
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.committed_path = None
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def commit(self, path):
+        """Перенос в итоговое имя: данные сброшены на диск, затем атомарное переименование"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.temp_path, path)
+        self.committed_path = path
+        return path
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if self.committed_path is None:
+            try:
+                os.unlink(self.temp_path)
+            except FileNotFoundError:
+                pass
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __getattr__(self, name):
+        # read, readline, seek, tell и остальное - у временного файла
+        if name == '_file':
+            raise AttributeError(name)
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """Запрос, файлы которого пишутся прямо в каталог загрузок"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if has_app_context():
+            return HashingUploadFile(get_upload_folder())
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+def hashing_stream(file_storage, directory, chunk_size=64 * 1024):
+    """Файл из запроса как HashingUploadFile
+
+    Файл, принятый UploadRequest, возвращается как есть; иначе (например,
+    запрос другого класса) копируется порциями во временный файл в directory
+    с подсчётом суммы в том же проходе.
+    """
+    stream = file_storage.stream
+    if isinstance(stream, HashingUploadFile):
+        return stream
+    target = HashingUploadFile(directory)
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            target.write(chunk)
+    except BaseException:
+        target.close()
+        raise
+    return target
+
+
+def store_upload(file_storage, path):
+    """Сохранение файла из запроса под именем path (атомарное переименование); возвращает (размер, sha256)"""
+    stream = hashing_stream(file_storage, os.path.dirname(path))
+    stream.commit(path)
+    return stream.size, stream.sha256
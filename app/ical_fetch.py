@@ -0,0 +1,87 @@
+"""Условная загрузка iCal feed (ETag/Last-Modified) с проверкой хэша содержимого"""
+import hashlib
+from contextlib import contextmanager
+import urllib.error
+import urllib.parse
+import urllib.request
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# Статусы результата загрузки
+NOT_MODIFIED = 'not_modified'  # Сервер ответил 304
+CHANGED = 'changed'  # Сервер вернул тело (его хэш проверяется после чтения)
+
+
+class FeedStream:
+    """Ответ сервера с feed: построчное чтение с подсчётом SHA-256 и размера"""
+
+    def __init__(self, status, response=None, etag=None, last_modified=None, charset=None):
+        self.status = status
+        self.response = response
+        self.etag = etag
+        self.last_modified = last_modified
+        # charset из Content-Type (None, если сервер его не указал)
+        self.charset = charset
+        self.size = 0
+        self._hash = hashlib.sha256()
+
+    def __iter__(self):
+        if self.response is None:
+            return
+        for line in self.response:
+            self._hash.update(line)
+            self.size += len(line)
+            yield line
+
+    @property
+    def not_modified(self):
+        return self.status == NOT_MODIFIED
+
+    @property
+    def content_hash(self):
+        """SHA-256 прочитанной части тела (полного тела после итерации)"""
+        return self._hash.hexdigest()
+
+
+def get_ical_url(calendar_id):
+    """Публичный iCal URL календаря Google"""
+    # URL-encode calendar ID для использования в URL
+    encoded_calendar_id = urllib.parse.quote(calendar_id, safe='')
+    return f"https://calendar.google.com/calendar/ical/{encoded_calendar_id}/public/basic.ics"
+
+
+@contextmanager
+def open_feed(url, etag=None, last_modified=None, timeout=15):
+    """Открытие feed с заголовками If-None-Match/If-Modified-Since
+
+    Тело не читается целиком: FeedStream отдаёт строки по мере загрузки.
+    При ответе 304 поток пустой, а status равен NOT_MODIFIED.
+    """
+    req = urllib.request.Request(url)
+    req.add_header('User-Agent', USER_AGENT)
+    if etag:
+        req.add_header('If-None-Match', etag)
+    if last_modified:
+        req.add_header('If-Modified-Since', last_modified)
+
+    try:
+        response = urllib.request.urlopen(req, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            e.close()
+            yield FeedStream(
+                NOT_MODIFIED,
+                etag=e.headers.get('ETag') or etag,
+                last_modified=e.headers.get('Last-Modified') or last_modified
+            )
+            return
+        raise
+
+    with response:
+        yield FeedStream(
+            CHANGED,
+            response=response,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+            charset=response.headers.get_content_charset()
+        )
@@ -0,0 +1,282 @@
+"""Потоковый разбор iCal: VEVENT читаются построчно, без построения дерева компонентов"""
+from datetime import datetime, timedelta, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+# Свойства VEVENT, которые нужны для кэша календаря
+WANTED_PROPERTIES = frozenset((
+    b'UID', b'SUMMARY', b'DESCRIPTION', b'LOCATION', b'DTSTART', b'DTEND', b'RRULE',
+    b'RDATE', b'EXDATE', b'RECURRENCE-ID', b'STATUS'
+))
+
+# Свойства, которые могут повторяться: значения всех вхождений собираются в список
+MULTI_PROPERTIES = frozenset((b'RDATE', b'EXDATE'))
+
+TEXT_PROPERTIES = (
+    ('event_id', b'UID', ''),
+    ('title', b'SUMMARY', 'Без названия'),
+    ('description', b'DESCRIPTION', ''),
+    ('location', b'LOCATION', ''),
+)
+
+_ESCAPES = {'n': '\n', 'N': '\n', ',': ',', ';': ';', '\\': '\\'}
+
+
+def unfold_lines(lines):
+    """Склейка перенесённых строк (RFC 5545, 3.1): строка, начинающаяся с пробела
+    или табуляции, продолжает предыдущую"""
+    current = None
+    for line in lines:
+        line = line.rstrip(b'\r\n')
+        if line[:1] in (b' ', b'\t'):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def _split_unquoted(data, separator):
+    """Разбиение по разделителю вне двойных кавычек"""
+    parts = []
+    quoted = False
+    start = 0
+    for index, char in enumerate(data):
+        if char == 0x22:  # "
+            quoted = not quoted
+        elif char == separator and not quoted:
+            parts.append(data[start:index])
+            start = index + 1
+    parts.append(data[start:])
+    return parts
+
+
+def parse_content_line(line):
+    """Разбор строки "NAME;PARAM=value:VALUE" в (NAME, {PARAM: value}, VALUE)"""
+    head_end = line.find(b':')
+    if head_end < 0:
+        return None, {}, b''
+    head = line[:head_end]
+    if b'"' in head:
+        # В кавычках параметров может встречаться двоеточие
+        quoted = False
+        for index, char in enumerate(line):
+            if char == 0x22:
+                quoted = not quoted
+            elif char == 0x3A and not quoted:  # :
+                head_end = index
+                break
+        head = line[:head_end]
+    value = line[head_end + 1:]
+
+    if b';' not in head:
+        return head.upper(), {}, value
+
+    name, *raw_params = _split_unquoted(head, 0x3B)  # ;
+    params = {}
+    for raw in raw_params:
+        key, _, param_value = raw.partition(b'=')
+        params[key.decode('ascii', 'replace').upper()] = param_value.strip(b'"').decode('utf-8', 'replace')
+    return name.upper(), params, value
+
+
+def unescape_text(value):
+    """Снятие экранирования TEXT-значения (\\n, \\, \\; \\\\)"""
+    if '\\' not in value:
+        return value
+    result = []
+    chars = iter(value)
+    for char in chars:
+        if char == '\\':
+            following = next(chars, '')
+            result.append(_ESCAPES.get(following, following))
+        else:
+            result.append(char)
+    return ''.join(result)
+
+
+def _parse_naive(text, params):
+    """Разбор даты или даты-времени iCal по позициям (без часового пояса)"""
+    try:
+        # Разбор по позициям заметно быстрее strptime на больших feed
+        if params.get('VALUE') == 'DATE' or len(text) == 8:
+            return datetime(int(text[0:4]), int(text[4:6]), int(text[6:8]))
+        if text[8:9] == 'T':
+            return datetime(
+                int(text[0:4]), int(text[4:6]), int(text[6:8]),
+                int(text[9:11]), int(text[11:13]), int(text[13:15])
+            )
+    except ValueError:
+        pass
+    return None
+
+
+def _zone(tzid):
+    """Часовой пояс по TZID (None, если пояс неизвестен)"""
+    if not tzid or ZoneInfo is None:
+        return None
+    try:
+        return ZoneInfo(tzid)
+    except (KeyError, ValueError, OSError):
+        return None
+
+
+def parse_ical_datetime(value, params, local_offset):
+    """Разбор DTSTART/DTEND в naive datetime локального времени (UTC + local_offset)
+
+    Значения с суффиксом Z и без часового пояса считаются UTC, значения с TZID
+    переводятся в UTC через zoneinfo. Дата без времени (VALUE=DATE) - начало дня по UTC.
+    """
+    text = value.decode('ascii', 'replace').strip()
+    moment = _parse_naive(text, params)
+    if moment is None:
+        return None
+
+    if not text.endswith('Z'):
+        zone = _zone(params.get('TZID'))
+        if zone is not None:
+            moment = moment.replace(tzinfo=zone).astimezone(timezone.utc).replace(tzinfo=None)
+        # Неизвестный часовой пояс - считаем время указанным в UTC
+
+    return moment + local_offset
+
+
+def parse_ical_moment(text, params):
+    """Разбор значения в aware datetime для развёртывания повторений
+
+    В отличие от parse_ical_datetime часовой пояс TZID сохраняется: правило
+    повторения считается по местному времени серии (с учётом перехода на летнее время).
+    """
+    text = text.strip()
+    moment = _parse_naive(text, params)
+    if moment is None:
+        return None
+    zone = None if text.endswith('Z') else _zone(params.get('TZID'))
+    return moment.replace(tzinfo=zone or timezone.utc)
+
+
+def default_decode(value, params):
+    """Декодирование значения свойства по параметру CHARSET (по умолчанию UTF-8)"""
+    try:
+        return value.decode(params.get('CHARSET', 'utf-8'))
+    except (UnicodeDecodeError, LookupError):
+        return value.decode('utf-8', errors='replace')
+
+
+def iter_vevents(lines, window_start, window_end, local_offset=timedelta(0), decode=default_decode):
+    """Потоковый разбор VEVENT из итератора байтовых строк
+
+    Выдаёт словари с event_id, title, description, location, start_time, end_time
+    (naive, локальное время). У повторяющихся событий есть ключи rrule, series_start
+    (aware DTSTART), rdates и exdates, у изменённых вхождений - recurrence_id
+    (naive, локальное время) и cancelled. Обычные события вне окна
+    [window_start, window_end] отбрасываются до декодирования текстовых полей.
+    Повторяющиеся события и изменённые вхождения выдаются всегда: их вхождения
+    могут попасть в окно, даже если первое вхождение за его пределами.
+    """
+    in_event = False
+    depth = 0  # Вложенные компоненты внутри VEVENT (например, VALARM)
+    properties = {}
+
+    for line in unfold_lines(lines):
+        if not in_event:
+            if line == b'BEGIN:VEVENT':
+                in_event = True
+                depth = 0
+                properties = {}
+            continue
+
+        if line.startswith(b'BEGIN:'):
+            depth += 1
+            continue
+        if line.startswith(b'END:'):
+            if depth:
+                depth -= 1
+                continue
+            in_event = False
+            record = _build_record(properties, window_start, window_end, local_offset, decode)
+            if record is not None:
+                yield record
+            continue
+        if depth:
+            continue
+
+        name_end = line.find(b':')
+        if name_end < 0:
+            continue
+        params_start = line.find(b';', 0, name_end)
+        if params_start >= 0:
+            name_end = params_start
+        if line[:name_end].upper() not in WANTED_PROPERTIES:
+            continue
+        name, params, value = parse_content_line(line)
+        if name in MULTI_PROPERTIES:
+            properties.setdefault(name, []).append((params, value))
+        else:
+            # Повторные свойства игнорируем: нужно только первое вхождение
+            properties.setdefault(name, (params, value))
+
+
+def _build_record(properties, window_start, window_end, local_offset, decode):
+    """Сборка записи события из сырых свойств (None, если событие не нужно)"""
+    if b'UID' not in properties or b'DTSTART' not in properties or b'DTEND' not in properties:
+        return None
+
+    start_params, start_value = properties[b'DTSTART']
+    end_params, end_value = properties[b'DTEND']
+    start_time = parse_ical_datetime(start_value, start_params, local_offset)
+    end_time = parse_ical_datetime(end_value, end_params, local_offset)
+    if start_time is None or end_time is None:
+        return None
+
+    rrule = None
+    if b'RRULE' in properties:
+        rrule = properties[b'RRULE'][1].decode('ascii', 'replace').strip() or None
+    rdates = _parse_date_list(properties.get(b'RDATE', ()))
+    recurrence_id = None
+    if b'RECURRENCE-ID' in properties:
+        recurrence_params, recurrence_value = properties[b'RECURRENCE-ID']
+        recurrence_id = parse_ical_datetime(recurrence_value, recurrence_params, local_offset)
+    recurring = rrule is not None or bool(rdates)
+
+    # Отбрасываем события вне окна до декодирования текстовых полей
+    if not recurring and recurrence_id is None and (end_time < window_start or start_time > window_end):
+        return None
+
+    record = {'start_time': start_time, 'end_time': end_time}
+    for key, name, default in TEXT_PROPERTIES:
+        if name in properties:
+            params, value = properties[name]
+            record[key] = unescape_text(decode(value, params))
+        else:
+            record[key] = default
+    if not record['event_id']:
+        return None
+    if recurring:
+        record['rrule'] = rrule
+        record['series_start'] = parse_ical_moment(start_value.decode('ascii', 'replace'), start_params)
+        record['rdates'] = rdates
+        record['exdates'] = _parse_date_list(properties.get(b'EXDATE', ()))
+    elif recurrence_id is not None:
+        record['recurrence_id'] = recurrence_id
+        status = properties.get(b'STATUS')
+        record['cancelled'] = status is not None and status[1].strip().upper() == b'CANCELLED'
+    return record
+
+
+def _parse_date_list(entries):
+    """Разбор RDATE/EXDATE: несколько свойств, в каждом значения через запятую"""
+    moments = []
+    for params, value in entries:
+        for item in value.decode('ascii', 'replace').split(','):
+            # У периода (VALUE=PERIOD) берём только начало
+            moment = parse_ical_moment(item.partition('/')[0], params)
+            if moment is not None:
+                moments.append(moment)
+    return moments
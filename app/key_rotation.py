@@ -0,0 +1,155 @@
+"""Перешифрование ФИО пользователей текущим ключом после смены ключа
+
+Пока идёт перешифрование, приложение продолжает работать: MultiFernet читает
+данные и прежними ключами (ENCRYPTION_OLD_KEYS). Задача обходит users по
+первичному ключу порциями; каждая порция - короткая транзакция, а строка
+обновляется только если её шифротекст не изменился за это время (иначе ФИО уже
+перезаписано текущим ключом). Прогресс хранится в key_rotations по отпечатку
+текущего ключа, поэтому прерванный запуск продолжается с места остановки.
+"""
+import time
+from datetime import datetime
+import click
+from cryptography.fernet import Fernet, InvalidToken
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, update, func
+from app.models import db, User, KeyRotationState
+from app.encryption import get_cipher, get_decryption_keys, key_fingerprint
+
+encryption_cli = AppGroup('encryption', help='Ключи шифрования персональных данных')
+
+
+class KeyRotation:
+    """Перешифрование users.full_name_encrypted порциями по chunk_size строк"""
+
+    def __init__(self, app, chunk_size=500, pause=0.0):
+        self.chunk_size = chunk_size
+        self.pause = pause
+        primary_key = get_decryption_keys(app.config)[0]
+        self.fingerprint = key_fingerprint(primary_key)
+        self.primary = Fernet(primary_key)
+        self.cipher = get_cipher(app)
+
+    def get_state(self):
+        """Состояние перешифрования для текущего ключа (создаётся при первом запуске)"""
+        state = KeyRotationState.query.filter_by(key_fingerprint=self.fingerprint).first()
+        if state is None:
+            state = KeyRotationState(
+                key_fingerprint=self.fingerprint,
+                last_user_id=0,
+                rows_total=db.session.scalar(select(func.count(User.id))),
+                rows_done=0,
+                rows_rotated=0,
+                rows_failed=0,
+                elapsed_seconds=0
+            )
+            db.session.add(state)
+            db.session.commit()
+        return state
+
+    def reencrypt(self, token):
+        """Новый шифротекст; None - уже текущий ключ; InvalidToken - ни один ключ не подошёл"""
+        data = token.encode('utf-8')
+        try:
+            self.primary.decrypt(data)
+            return None
+        except InvalidToken:
+            pass
+        return self.cipher.rotate(data).decode('utf-8')
+
+    def run_chunk(self, state):
+        """Одна порция (своя транзакция); возвращает число просмотренных строк"""
+        started = time.perf_counter()
+        rows = db.session.execute(
+            select(User.id, User.full_name_encrypted)
+            .where(User.id > state.last_user_id)
+            .order_by(User.id)
+            .limit(self.chunk_size)
+        ).all()
+        if not rows:
+            state.finished_at = state.finished_at or datetime.utcnow()
+            db.session.commit()
+            return 0
+
+        rotated = failed = 0
+        for row in rows:
+            if not row.full_name_encrypted:
+                continue
+            try:
+                token = self.reencrypt(row.full_name_encrypted)
+            except InvalidToken:
+                # Незашифрованное значение или ключ, которого нет в ENCRYPTION_OLD_KEYS
+                failed += 1
+                continue
+            if token is None:
+                continue
+            rotated += db.session.execute(
+                update(User)
+                .where(User.id == row.id, User.full_name_encrypted == row.full_name_encrypted)
+                .values(full_name_encrypted=token)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+
+        state.last_user_id = rows[-1].id
+        state.rows_done += len(rows)
+        state.rows_rotated += rotated
+        state.rows_failed += failed
+        state.elapsed_seconds += time.perf_counter() - started
+        db.session.commit()
+        return len(rows)
+
+    def run(self, max_chunks=None, progress=None, restart=False):
+        """Перешифрование до конца таблицы (или max_chunks порций); возвращает состояние"""
+        state = self.get_state()
+        if restart:
+            # Повторный проход, например после добавления ключа в ENCRYPTION_OLD_KEYS
+            state.last_user_id = 0
+            state.rows_total = db.session.scalar(select(func.count(User.id)))
+            state.rows_done = state.rows_rotated = state.rows_failed = 0
+            state.elapsed_seconds = 0
+            state.started_at = datetime.utcnow()
+            state.finished_at = None
+            db.session.commit()
+        chunks = 0
+        while max_chunks is None or chunks < max_chunks:
+            if not self.run_chunk(state):
+                break
+            chunks += 1
+            if progress is not None:
+                progress(state)
+            if self.pause:
+                # Пауза между порциями снижает нагрузку на БД под работающим приложением
+                time.sleep(self.pause)
+        return state
+
+
+@encryption_cli.command('rotate')
+@click.option('--chunk-size', default=500, show_default=True, help='Строк в одной транзакции')
+@click.option('--pause', default=0.0, show_default=True, help='Пауза между порциями (секунды)')
+@click.option('--restart', is_flag=True, help='Начать проход заново')
+def rotate_command(chunk_size, pause, restart):
+    """Перешифрование ФИО текущим ключом (прерванный запуск продолжается)"""
+    rotation = KeyRotation(current_app._get_current_object(), chunk_size=chunk_size, pause=pause)
+
+    def progress(state):
+        click.echo(f"{state.rows_done}/{state.rows_total} rows, rotated: {state.rows_rotated}, "
+                   f"failed: {state.rows_failed}, {state.rows_per_second} rows/s")
+
+    state = rotation.run(progress=progress, restart=restart)
+    click.echo(f"Key {state.key_fingerprint}: done {state.rows_done} rows "
+               f"(rotated {state.rows_rotated}, failed {state.rows_failed}), {state.rows_per_second} rows/s")
+    if state.rows_failed:
+        click.echo("Some rows could not be decrypted: add the previous key to ENCRYPTION_OLD_KEYS and run again with --restart")
+
+
+@encryption_cli.command('status')
+def status_command():
+    """Прогресс перешифрования для текущего ключа"""
+    rotation = KeyRotation(current_app._get_current_object())
+    state = KeyRotationState.query.filter_by(key_fingerprint=rotation.fingerprint).first()
+    if state is None:
+        click.echo(f"Key {rotation.fingerprint}: rotation not started")
+        return
+    for name, value in state.as_dict().items():
+        click.echo(f"{name}: {value if value is not None else '-'}")
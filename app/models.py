@@ -24,6 +24,10 @@ class User(UserMixin, db.Model):
     queue_entries = db.relationship('QueueEntry', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     tasks = db.relationship('Task', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     files = db.relationship('File', backref='user', lazy='dynamic', cascade='all, delete-orphan')
+    # Счётчики только для чтения: строку создают и удаляют события в app/user_stats.py
+    stats = db.relationship('UserStats', uselist=False, viewonly=True)
+    # Слепой индекс ФИО для поиска (app/blind_index.py)
+    name_terms = db.relationship('UserNameTerm', cascade='all, delete-orphan')
     
     def set_password(self, password):
         """Установка пароля"""
@@ -36,12 +40,20 @@ class User(UserMixin, db.Model):
     def set_full_name(self, full_name: str):
         """Установка ФИО с шифрованием"""
         from app.encryption import encrypt_data
+        from app.pii_cache import invalidate_full_name
+        from app.blind_index import name_terms
         self.full_name_encrypted = encrypt_data(full_name)
+        invalidate_full_name(self.id)
+        # Индекс обновляется в той же транзакции: совпадающие хэши остаются, прежние удаляются
+        terms = set(name_terms(full_name))
+        kept = [row for row in self.name_terms if row.term in terms]
+        added = terms - {row.term for row in kept}
+        self.name_terms = kept + [UserNameTerm(term=term) for term in sorted(added)]
     
     def get_full_name(self) -> str:
         """Получение расшифрованного ФИО"""
-        from app.encryption import decrypt_data
-        return decrypt_data(self.full_name_encrypted)
+        from app.pii_cache import decrypt_full_name
+        return decrypt_full_name(self.id, self.full_name_encrypted)
     
     @property
     def full_name(self) -> str:
@@ -52,26 +64,227 @@ class User(UserMixin, db.Model):
         return f'<User {self.username}>'
 
 
+class UserStats(db.Model):
+    """Денормализованные счётчики пользователя (ведутся в app/user_stats.py)"""
+    __tablename__ = 'user_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    open_queue_count = db.Column(db.Integer, default=0, nullable=False)  # Записи очереди без ответа
+    open_tasks_count = db.Column(db.Integer, default=0, nullable=False)  # Незавершённые задачи
+    files_count = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserStats {self.user_id}>'
+
+
+class UserNameTerm(db.Model):
+    """Хэш слепого индекса ФИО пользователя (HMAC от ФИО или префикса слова)"""
+    __tablename__ = 'user_name_terms'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    term = db.Column(db.String(32), nullable=False)
+    
+    __table_args__ = (
+        # Поиск по хэшу - поиск по индексу, user_id берётся из него же
+        db.Index('idx_user_name_terms_term_user', 'term', 'user_id', unique=True),
+        db.Index('idx_user_name_terms_user', 'user_id'),
+    )
+    
+    def __repr__(self):
+        return f'<UserNameTerm {self.user_id} {self.term}>'
+
+
 class CalendarEvent(db.Model):
     """Модель события календаря (кэш событий Google Calendar)"""
     __tablename__ = 'calendar_events'
     
     id = db.Column(db.Integer, primary_key=True)
-    event_id = db.Column(db.String(255), unique=True, nullable=False, index=True)  # ID из Google Calendar
+    # Источник (календарь группы или подгруппы), из которого пришло событие
+    source = db.Column(db.String(100), nullable=False, default='default', server_default='default', index=True)
+    event_id = db.Column(db.String(255), nullable=False, index=True)  # ID из Google Calendar (уникален в источнике)
     title = db.Column(db.String(255), nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False, index=True)
+    start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime, nullable=False)
     description = db.Column(db.Text, nullable=True)
     location = db.Column(db.String(255), nullable=True)
+    series_uid = db.Column(db.String(255), nullable=True)  # UID повторяющейся серии (для вхождений)
+    occurrence_start = db.Column(db.DateTime, nullable=True)  # Исходное начало вхождения (RECURRENCE-ID)
+    # Классификация по названию при записи в кэш (app/subjects.py)
+    subject = db.Column(db.String(100), nullable=True)  # Предмет, например "История"
+    lesson_type = db.Column(db.String(10), nullable=True)  # Тип занятия: ПЗ, ЛК, ЛР
+    event_date = db.Column(db.Date, nullable=True)  # Дата начала (локальное время)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Связи
     files = db.relationship('File', backref='calendar_event', lazy='dynamic')
     
+    __table_args__ = (
+        db.UniqueConstraint('source', 'event_id', name='uq_calendar_events_source_event_id'),
+        db.Index('idx_series_occurrence', 'source', 'series_uid', 'occurrence_start', unique=True),
+        # Выборка пересечения с диапазоном: ограниченный просмотр по start_time, end_time - из индекса
+        db.Index('idx_calendar_events_start_end', 'start_time', 'end_time'),
+        # Покрывающий индекс для выборки дат занятий по предмету и типу
+        # (start_time - для отсечения уже начавшихся занятий без чтения таблицы)
+        db.Index('idx_calendar_events_subject_type_date', 'subject', 'lesson_type', 'event_date', 'start_time'),
+    )
+    
     def __repr__(self):
         return f'<CalendarEvent {self.title}>'
 
 
+class CalendarEventStaging(db.Model):
+    """Staging-таблица полной пересборки кэша календаря
+    
+    Заполняется новой версией расписания и переносится в calendar_events
+    одной транзакцией (calendar_sync.swap_staging); вне пересборки пустая.
+    """
+    __tablename__ = 'calendar_events_staging'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(100), nullable=False)
+    event_id = db.Column(db.String(255), nullable=False)
+    title = db.Column(db.String(255), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    location = db.Column(db.String(255), nullable=True)
+    series_uid = db.Column(db.String(255), nullable=True)
+    occurrence_start = db.Column(db.DateTime, nullable=True)
+    subject = db.Column(db.String(100), nullable=True)
+    lesson_type = db.Column(db.String(10), nullable=True)
+    event_date = db.Column(db.Date, nullable=True)
+    
+    __table_args__ = (db.UniqueConstraint('source', 'event_id', name='uq_calendar_events_staging_source_event_id'),)
+    
+    def __repr__(self):
+        return f'<CalendarEventStaging {self.event_id}>'
+
+
+class CalendarSeries(db.Model):
+    """Повторяющаяся серия событий: хэш правила и граница уже развёрнутых вхождений"""
+    __tablename__ = 'calendar_series'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(100), nullable=False, default='default', server_default='default')
+    uid = db.Column(db.String(255), nullable=False, index=True)  # UID серии из iCal
+    content_hash = db.Column(db.String(64), nullable=False)  # SHA-256 серии и изменённых вхождений
+    expanded_until = db.Column(db.DateTime, nullable=True)  # До какого момента вхождения уже в кэше
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('source', 'uid', name='uq_calendar_series_source_uid'),)
+    
+    def __repr__(self):
+        return f'<CalendarSeries {self.uid}>'
+
+
+class CalendarSyncState(db.Model):
+    """Состояние синхронизации iCal feed (условные запросы и хэш содержимого)"""
+    __tablename__ = 'calendar_sync_state'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(100), unique=True, nullable=False, index=True)  # Имя источника календаря
+    url = db.Column(db.Text, nullable=True)  # URL feed, для которого сохранены ETag и хэш
+    etag = db.Column(db.String(255), nullable=True)
+    last_modified = db.Column(db.String(255), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256 тела ответа
+    synced_until = db.Column(db.DateTime, nullable=True)  # Конец окна последней полной синхронизации
+    last_checked_at = db.Column(db.DateTime, nullable=True)
+    last_synced_at = db.Column(db.DateTime, nullable=True)
+    # Ошибки загрузки подряд; после исчерпания бюджета ошибок источник ждёт retry_at
+    consecutive_failures = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    retry_at = db.Column(db.DateTime, nullable=True)
+    # Поколение событий источника: растёт в каждой транзакции, изменившей события
+    generation = db.Column(db.Integer, default=0, nullable=False)
+    
+    def as_dict(self):
+        return {
+            'source': self.source,
+            'generation': self.generation or 0,
+            'last_checked_at': self.last_checked_at.isoformat() if self.last_checked_at else None,
+            'last_synced_at': self.last_synced_at.isoformat() if self.last_synced_at else None,
+            'consecutive_failures': self.consecutive_failures or 0,
+            'last_error': self.last_error,
+            'retry_at': self.retry_at.isoformat() if self.retry_at else None
+        }
+    
+    def __repr__(self):
+        return f'<CalendarSyncState {self.source}>'
+
+
+class SchedulerJobState(db.Model):
+    """Состояние периодической задачи фонового планировщика (последний запуск и backoff)"""
+    __tablename__ = 'scheduler_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False, index=True)  # Имя задачи
+    leader = db.Column(db.String(255), nullable=True)  # Процесс, выполнявший задачу (host:pid)
+    last_started_at = db.Column(db.DateTime, nullable=True)
+    last_finished_at = db.Column(db.DateTime, nullable=True)
+    last_success_at = db.Column(db.DateTime, nullable=True)
+    last_status = db.Column(db.String(20), nullable=True)  # ok, error
+    last_error = db.Column(db.Text, nullable=True)
+    last_duration_ms = db.Column(db.Integer, nullable=True)
+    consecutive_failures = db.Column(db.Integer, default=0, nullable=False)
+    next_run_at = db.Column(db.DateTime, nullable=True)
+    
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'leader': self.leader,
+            'last_started_at': self.last_started_at.isoformat() if self.last_started_at else None,
+            'last_finished_at': self.last_finished_at.isoformat() if self.last_finished_at else None,
+            'last_success_at': self.last_success_at.isoformat() if self.last_success_at else None,
+            'last_status': self.last_status,
+            'last_error': self.last_error,
+            'last_duration_ms': self.last_duration_ms,
+            'consecutive_failures': self.consecutive_failures,
+            'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None
+        }
+    
+    def __repr__(self):
+        return f'<SchedulerJobState {self.name}>'
+
+
+class KeyRotationState(db.Model):
+    """Прогресс перешифрования персональных данных новым ключом (app/key_rotation.py)"""
+    __tablename__ = 'key_rotations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    key_fingerprint = db.Column(db.String(16), unique=True, nullable=False)  # Отпечаток текущего ключа
+    last_user_id = db.Column(db.Integer, default=0, nullable=False)  # Курсор: обработаны id <= last_user_id
+    rows_total = db.Column(db.Integer, default=0, nullable=False)
+    rows_done = db.Column(db.Integer, default=0, nullable=False)
+    rows_rotated = db.Column(db.Integer, default=0, nullable=False)
+    rows_failed = db.Column(db.Integer, default=0, nullable=False)
+    elapsed_seconds = db.Column(db.Float, default=0, nullable=False)  # Время работы без пауз между запусками
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    @property
+    def rows_per_second(self):
+        return round(self.rows_done / self.elapsed_seconds, 1) if self.elapsed_seconds else None
+    
+    def as_dict(self):
+        return {
+            'key_fingerprint': self.key_fingerprint,
+            'last_user_id': self.last_user_id,
+            'rows_total': self.rows_total,
+            'rows_done': self.rows_done,
+            'rows_rotated': self.rows_rotated,
+            'rows_failed': self.rows_failed,
+            'rows_per_second': self.rows_per_second,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<KeyRotationState {self.key_fingerprint}>'
+
+
 class QueueEntry(db.Model):
     """Модель записи в очереди ответов"""
     __tablename__ = 'queue_entries'
@@ -93,6 +306,26 @@ class QueueEntry(db.Model):
         return f'<QueueEntry {self.user_id} - {self.subject}>'
 
 
+class QueueEvent(db.Model):
+    """Журнал изменений очереди для живых обновлений (app/queue_events.py)
+
+    Строка пишется в той же транзакции, что и изменение очереди; каждый
+    процесс читает новые строки и рассылает их своим подписчикам SSE.
+    """
+    __tablename__ = 'queue_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(50), nullable=False)
+    event_date = db.Column(db.Date, nullable=True)
+    kind = db.Column(db.String(20), nullable=False)  # joined, left, answered
+    entry_id = db.Column(db.Integer, nullable=False)  # Без внешнего ключа: запись очереди может быть удалена
+    user_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<QueueEvent {self.kind} {self.entry_id}>'
+
+
 class Task(db.Model):
     """Модель задачи (To-Do)"""
     __tablename__ = 'tasks'
@@ -105,10 +338,56 @@ class Task(db.Model):
     completed = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Счётчики задач по пользователям (админ-панель) считаются по индексу
+    __table_args__ = (db.Index('idx_tasks_user_completed', 'user_id', 'completed'),)
+    
     def __repr__(self):
         return f'<Task {self.title}>'
 
 
+class UploadSession(db.Model):
+    """Загрузка файла по частям (app/chunked_upload.py): принятые байты лежат в uploads/partials"""
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(db.String(32), primary_key=True)  # Случайный токен, он же имя частичного файла
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    calendar_event_id = db.Column(db.Integer, db.ForeignKey('calendar_events.id'), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    length = db.Column(db.BigInteger, nullable=False)  # Объявленный размер файла
+    offset = db.Column(db.BigInteger, default=0, nullable=False)  # Сколько байт уже принято
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Продлевается каждой частью
+    
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.original_filename,
+            'length': self.length,
+            'offset': self.offset,
+            'expires_at': self.expires_at.isoformat()
+        }
+    
+    def __repr__(self):
+        return f'<UploadSession {self.id} {self.offset}/{self.length}>'
+
+
+class FileBlob(db.Model):
+    """Содержимое загруженного файла в хранилище по SHA-256 (app/blob_store.py)"""
+    __tablename__ = 'file_blobs'
+    
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)  # Число строк files со ссылкой
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Кандидаты для сборщика мусора
+    __table_args__ = (db.Index('idx_file_blobs_refs_used', 'ref_count', 'last_used_at'),)
+    
+    def __repr__(self):
+        return f'<FileBlob {self.sha256[:12]} refs={self.ref_count}>'
+
+
 class File(db.Model):
     """Модель загруженного файла"""
     __tablename__ = 'files'
@@ -121,6 +400,11 @@ class File(db.Model):
     file_type = db.Column(db.String(50), nullable=False)  # image, document, etc.
     upload_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     file_size = db.Column(db.Integer, nullable=True)  # Размер в байтах
+    sha256 = db.Column(db.String(64), nullable=True)  # Контрольная сумма содержимого
+    # Содержимое в хранилище блобов (app/blob_store.py); у старых файлов - NULL
+    blob_sha256 = db.Column(db.String(64), db.ForeignKey('file_blobs.sha256'), nullable=True, index=True)
+    
+    __table_args__ = (db.Index('idx_files_user', 'user_id'),)
     
     def __repr__(self):
         return f'<File {self.original_filename}>'
@@ -0,0 +1,165 @@
+"""Кэш расшифрованных ФИО в памяти процесса (включается PII_CACHE_ENABLED)
+
+Одни и те же ФИО расшифровываются тысячи раз в день (очередь, админка, бот).
+Кэш ограничен по размеру (LRU) и по времени жизни записи, чтобы открытый текст
+не оставался в памяти бесконечно. Ключ - (user_id, хэш шифротекста): после
+смены ФИО старая запись не находится, а set_full_name удаляет её сразу.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from app.encryption import decrypt_data, decrypt_many
+
+
+class DecryptedCache:
+    """Потокобезопасный LRU с TTL и счётчиками попаданий"""
+
+    def __init__(self, max_entries=512, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._entries = OrderedDict()  # (user_id, hash) -> (value, expires_at)
+        self._keys = {}  # user_id -> текущий ключ пользователя
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(user_id, ciphertext):
+        return user_id, hashlib.sha256(ciphertext.encode('utf-8')).hexdigest()[:32]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            previous = self._keys.get(key[0])
+            if previous is not None and previous != key:
+                self._remove(previous)
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            self._keys[key[0]] = key
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, user_id):
+        """Удаление расшифрованного ФИО пользователя"""
+        with self._lock:
+            key = self._keys.get(user_id)
+            if key is not None:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        if self._keys.get(key[0]) == key:
+            del self._keys[key[0]]
+
+    def stats(self):
+        """Счётчики для мониторинга"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'enabled': True,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'hit_ratio': round(self.hits / total, 3) if total else None
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def get_pii_cache(app=None):
+    """Кэш приложения; None, если он выключен (PII_CACHE_ENABLED) или нет контекста приложения"""
+    if app is None:
+        if not has_app_context():
+            return None
+        app = current_app
+    if not app.config.get('PII_CACHE_ENABLED', False):
+        return None
+    cache = app.extensions.get('pii_cache')
+    if cache is None:
+        cache = app.extensions.setdefault('pii_cache', DecryptedCache(
+            app.config.get('PII_CACHE_SIZE', 512),
+            app.config.get('PII_CACHE_TTL_SECONDS', 300)
+        ))
+    return cache
+
+
+def decrypt_full_name(user_id, ciphertext):
+    """Расшифровка ФИО пользователя через кэш (если он включён)"""
+    cache = get_pii_cache()
+    if cache is None or user_id is None or not ciphertext:
+        return decrypt_data(ciphertext)
+    key = cache.make_key(user_id, ciphertext)
+    value = cache.get(key)
+    if value is None:
+        value = decrypt_data(ciphertext)
+        # Ошибка расшифровки (decrypt_data вернула шифротекст) не кэшируется
+        if value != ciphertext:
+            cache.put(key, value)
+    return value
+
+
+def decrypt_full_names(pairs):
+    """Пакетная расшифровка [(user_id, ciphertext), ...]: промахи кэша - одним decrypt_many"""
+    pairs = list(pairs)
+    cache = get_pii_cache()
+    if cache is None:
+        return decrypt_many(ciphertext for _, ciphertext in pairs)
+
+    result = [None] * len(pairs)
+    missing = []
+    for position, (user_id, ciphertext) in enumerate(pairs):
+        if user_id is None or not ciphertext:
+            missing.append(position)
+            continue
+        result[position] = cache.get(cache.make_key(user_id, ciphertext))
+        if result[position] is None:
+            missing.append(position)
+    if missing:
+        values = decrypt_many(pairs[position][1] for position in missing)
+        for position, value in zip(missing, values):
+            result[position] = value
+            user_id, ciphertext = pairs[position]
+            # При ошибке расшифровки возвращается сам шифротекст: его не кэшируем,
+            # иначе он показывался бы и после исправления ключа
+            if user_id is not None and ciphertext and value != ciphertext:
+                cache.put(cache.make_key(user_id, ciphertext), value)
+    return result
+
+
+def invalidate_full_name(user_id):
+    """Сброс кэша после изменения ФИО пользователя"""
+    cache = get_pii_cache()
+    if cache is not None and user_id is not None:
+        cache.invalidate(user_id)
+
+
+def get_pii_cache_stats(app):
+    """Счётчики кэша для мониторинга ({'enabled': False}, если кэш выключен)"""
+    cache = get_pii_cache(app)
+    return cache.stats() if cache is not None else {'enabled': False}
@@ -0,0 +1,366 @@
+"""Живые обновления очереди ответов (Server-Sent Events)
+
+Изменения очереди (joined, left, answered) пишутся в журнал queue_events в той
+же транзакции, что и сама запись очереди. В каждом процессе один мост опрашивает
+журнал и передаёт новые строки broadcaster'у процесса: событие кодируется один
+раз (с одной расшифровкой ФИО) и раздаётся всем подписчикам канала. Канал -
+предмет, для истории также дата занятия.
+
+Подписчик держит только курсор в кольцевом буфере канала и ждёт на общем
+Condition канала, без своей очереди и без соединения с БД, поэтому простаивающие
+подключения дешёвы (для тысяч подключений - воркеры gevent/eventlet).
+"""
+import sys
+import json
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from sqlalchemy import select, func, delete
+from app.models import db, QueueEvent, User
+
+QUEUE_SUBJECTS = ('ОАиП', 'История')
+QUEUE_EVENT_KINDS = ('joined', 'left', 'answered')
+# Канал всех предметов: страница очереди получает обе очереди одним подключением
+ALL_SUBJECTS = (None, None)
+
+
+def record_queue_event(entry, kind):
+    """Запись изменения очереди в журнал в текущей транзакции (без commit)"""
+    db.session.add(QueueEvent(
+        subject=entry.subject,
+        event_date=entry.event_date,
+        kind=kind,
+        entry_id=entry.id,
+        user_id=entry.user_id,
+        created_at=datetime.utcnow()
+    ))
+
+
+def channel_keys(subject, event_date):
+    """Каналы, в которые попадает событие: все предметы, предмет целиком и (для истории) дата"""
+    keys = [ALL_SUBJECTS, (subject, None)]
+    if event_date is not None:
+        keys.append((subject, event_date))
+    return keys
+
+
+def format_sse(event_id, kind, payload):
+    """Сообщение SSE в байтах"""
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {kind}\ndata: {data}\n\n".encode('utf-8')
+
+
+class QueueChannel:
+    """Кольцевой буфер последних событий канала и Condition его подписчиков"""
+
+    def __init__(self, size=256, start_id=0):
+        self.events = deque(maxlen=size)  # (seq, event_id, data)
+        self.seq = 0
+        # event_id последнего вытесненного из буфера события; до первого
+        # вытеснения - последнее событие до запуска моста: более ранних в буфере не было
+        self.evicted_id = start_id
+        self.condition = threading.Condition()
+
+    def publish(self, event_id, data):
+        with self.condition:
+            if len(self.events) == self.events.maxlen:
+                self.evicted_id = self.events[0][1]
+            self.seq += 1
+            self.events.append((self.seq, event_id, data))
+            self.condition.notify_all()
+
+    def cursor_after(self, event_id):
+        """Курсор для продолжения после события event_id (Last-Event-ID); None - нужен сброс"""
+        with self.condition:
+            # События с опоздавшим commit идут в буфере не по порядку id:
+            # сначала ищется само событие, которое клиент получил последним
+            for seq, buffered_id, _ in self.events:
+                if buffered_id == event_id:
+                    return seq
+            if event_id < self.evicted_id:
+                return None
+            for seq, buffered_id, _ in self.events:
+                if buffered_id > event_id:
+                    return seq - 1
+            return self.seq
+
+    def wait(self, cursor, timeout):
+        """События после cursor (ждёт не дольше timeout); None, если они вытеснены из буфера"""
+        with self.condition:
+            if self.seq == cursor:
+                self.condition.wait(timeout)
+            if self.seq == cursor:
+                return []
+            if not self.events or self.events[0][0] > cursor + 1:
+                return None
+            return [event for event in self.events if event[0] > cursor]
+
+
+class QueueBroadcaster:
+    """Подписчики очереди процесса, сгруппированные по каналам"""
+
+    def __init__(self, buffer_size=256):
+        self.buffer_size = buffer_size
+        self.subscribers = 0
+        # Начальный курсор моста: события до него процесс не рассылал
+        self.start_id = 0
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def channel(self, key):
+        channel = self._channels.get(key)
+        if channel is None:
+            with self._lock:
+                channel = self._channels.setdefault(key, QueueChannel(self.buffer_size, self.start_id))
+        return channel
+
+    def set_start_id(self, event_id):
+        """Клиенты с Last-Event-ID раньше event_id получат reset: этих событий в буферах нет"""
+        with self._lock:
+            self.start_id = event_id
+            channels = list(self._channels.values())
+        for channel in channels:
+            with channel.condition:
+                channel.evicted_id = max(channel.evicted_id, event_id)
+
+    def publish(self, keys, event_id, data):
+        for key in keys:
+            self.channel(key).publish(event_id, data)
+
+    def stream(self, key, last_event_id=None, heartbeat=15, retry_ms=3000):
+        """Генератор тела ответа SSE для канала key"""
+        channel = self.channel(key)
+        cursor = channel.seq if last_event_id is None else channel.cursor_after(last_event_id)
+        with self._lock:
+            self.subscribers += 1
+        try:
+            yield f"retry: {retry_ms}\n\n".encode('utf-8')
+            while True:
+                if cursor is None:
+                    # Пропущенные события уже вытеснены: клиент перечитывает очередь целиком
+                    yield b"event: reset\ndata: {}\n\n"
+                    cursor = channel.seq
+                    continue
+                events = channel.wait(cursor, heartbeat)
+                if events is None:
+                    cursor = None
+                elif events:
+                    cursor = events[-1][0]
+                    yield b''.join(event[2] for event in events)
+                else:
+                    # Комментарий не даёт прокси закрыть простаивающее соединение
+                    yield b": keepalive\n\n"
+        finally:
+            with self._lock:
+                self.subscribers -= 1
+
+
+class QueueEventBridge:
+    """Мост журнала queue_events в broadcaster процесса (опрос БД)
+
+    Изменения из этого процесса доставляются сразу (poke после commit),
+    из других воркеров - не позже poll_interval.
+
+    id строки выдаётся при INSERT, а видна она становится при commit, поэтому
+    строка с меньшим id может появиться после строки с большим (параллельные
+    транзакции, последовательности PostgreSQL). Пропуски в id за курсором
+    запоминаются и перечитываются ещё gap_timeout секунд: опоздавшая строка
+    рассылается, а номер, который так и не появился (откат), забывается.
+    """
+
+    # Больший пропуск - не параллельные транзакции (удаление журнала, сброс последовательности)
+    MAX_GAP = 1000
+
+    def __init__(self, app, broadcaster, poll_interval=1.0, batch_size=500, gap_timeout=30.0):
+        self.app = app
+        self.broadcaster = broadcaster
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        self.cursor = None
+        self.gaps = {}  # id -> time.monotonic(), до которого его ждать
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.run_forever, daemon=True, name='QueueEventBridge')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def poke(self):
+        """Немедленная проверка журнала (после изменения очереди в этом процессе)"""
+        self._wake.set()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self.poll()
+            except Exception as e:
+                print(f"Error polling queue events: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start_cursor(self):
+        """Начальный курсор (последнее событие журнала); читается один раз
+
+        Подписчики получают только изменения после него, поэтому он же -
+        нижняя граница Last-Event-ID в каналах broadcaster'а.
+        """
+        if self.cursor is not None:
+            return self.cursor
+        with self._start_lock:
+            if self.cursor is None:
+                cursor = db.session.scalar(select(func.max(QueueEvent.id))) or 0
+                self.broadcaster.set_start_id(cursor)
+                self.cursor = cursor
+        return self.cursor
+
+    def poll(self):
+        """Рассылка новых строк журнала; возвращает их число"""
+        self.start_cursor()
+        published = 0
+        now = time.monotonic()
+        self.gaps = {event_id: deadline for event_id, deadline in self.gaps.items() if deadline > now}
+        if self.gaps:
+            late = db.session.execute(
+                select(QueueEvent).where(QueueEvent.id.in_(list(self.gaps))).order_by(QueueEvent.id)
+            ).scalars().all()
+            for row in late:
+                del self.gaps[row.id]
+            published += self.publish(late)
+        while True:
+            rows = db.session.execute(
+                select(QueueEvent).where(QueueEvent.id > self.cursor).order_by(QueueEvent.id).limit(self.batch_size)
+            ).scalars().all()
+            if not rows:
+                break
+            self.remember_gaps(rows, now + self.gap_timeout)
+            published += self.publish(rows)
+            self.cursor = rows[-1].id
+            if len(rows) < self.batch_size:
+                break
+        # Не держим транзакцию чтения между опросами
+        db.session.rollback()
+        return published
+
+    def remember_gaps(self, rows, deadline):
+        """Номера между курсором и прочитанными строками, ещё не видимые в БД"""
+        previous = self.cursor
+        for row in rows:
+            if row.id - previous - 1 <= self.MAX_GAP:
+                for missing in range(previous + 1, row.id):
+                    self.gaps[missing] = deadline
+            previous = row.id
+
+    def publish(self, rows):
+        if not rows:
+            return 0
+        joined = {row.user_id for row in rows if row.kind == 'joined'}
+        users = {user.id: user for user in User.query.filter(User.id.in_(joined))} if joined else {}
+        for row in rows:
+            self.broadcaster.publish(
+                channel_keys(row.subject, row.event_date), row.id,
+                format_sse(row.id, row.kind, self.payload(row, users.get(row.user_id)))
+            )
+        return len(rows)
+
+    @staticmethod
+    def payload(row, user=None):
+        payload = {
+            'id': row.entry_id,
+            'user_id': row.user_id,
+            'subject': row.subject,
+            'event_date': row.event_date.isoformat() if row.event_date else None
+        }
+        if row.kind == 'joined':
+            payload['timestamp'] = row.created_at.isoformat()
+            payload['full_name'] = user.get_full_name() if user is not None else None
+        return payload
+
+
+def async_worker_active():
+    """Запущены ли мы в асинхронном воркере (gevent/eventlet с monkey patching)"""
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            return True
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher
+        if patcher.is_monkey_patched('thread'):
+            return True
+    return False
+
+
+def live_updates_enabled(app):
+    """Включён ли поток SSE (QUEUE_SSE_ENABLED; по умолчанию - только в асинхронном воркере)
+
+    Подключение SSE занимает воркер, пока открыта страница: в синхронных
+    воркерах (Passenger, gunicorn sync) несколько вкладок заняли бы их все,
+    поэтому там страница опрашивает /queue/api/list.
+    """
+    enabled = app.config.get('QUEUE_SSE_ENABLED')
+    if enabled is None:
+        return async_worker_active()
+    return enabled
+
+
+def get_queue_broadcaster(app):
+    """QueueBroadcaster приложения (один на процесс)"""
+    broadcaster = app.extensions.get('queue_broadcaster')
+    if broadcaster is None:
+        broadcaster = app.extensions.setdefault(
+            'queue_broadcaster', QueueBroadcaster(app.config.get('QUEUE_EVENTS_BUFFER', 256))
+        )
+    return broadcaster
+
+
+def get_queue_bridge(app):
+    """Мост журнала очереди процесса; поток запускается при первом обращении (не в тестах)
+
+    Вызывается в контексте приложения: начальный курсор читается сразу, до
+    того как страница очереди отдаст свой last_queue_event_id или поток
+    сверит Last-Event-ID.
+    """
+    bridge = app.extensions.get('queue_event_bridge')
+    if bridge is None:
+        bridge = app.extensions.setdefault('queue_event_bridge', QueueEventBridge(
+            app, get_queue_broadcaster(app), app.config.get('QUEUE_EVENTS_POLL_SECONDS', 1.0),
+            gap_timeout=app.config.get('QUEUE_EVENTS_GAP_SECONDS', 30)
+        ))
+        if not app.config.get('TESTING'):
+            bridge.start()
+    bridge.start_cursor()
+    return bridge
+
+
+def notify_queue_changed(app):
+    """Сигнал мосту этого процесса после commit изменения очереди"""
+    bridge = app.extensions.get('queue_event_bridge')
+    if bridge is not None:
+        bridge.poke()
+
+
+def latest_queue_event_id():
+    """Последнее событие журнала: с него страница очереди продолжает поток"""
+    return db.session.scalar(select(func.max(QueueEvent.id))) or 0
+
+
+def cleanup_queue_events(retention):
+    """Удаление событий журнала старше retention (timedelta); возвращает число строк"""
+    deleted = db.session.execute(
+        delete(QueueEvent).where(QueueEvent.created_at < datetime.utcnow() - retention)
+    ).rowcount
+    db.session.commit()
+    return deleted
@@ -1,22 +1,23 @@
 from datetime import datetime, date, timedelta
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, current_app
 from flask_login import login_required, current_user
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
 from app import db
 from app.models import QueueEntry, User, CalendarEvent
 from app.forms import QueueEntryForm
+from app.pii_cache import decrypt_full_names
+from app.queue_events import (
+    QUEUE_SUBJECTS, record_queue_event, notify_queue_changed, latest_queue_event_id,
+    ALL_SUBJECTS, get_queue_broadcaster, get_queue_bridge, live_updates_enabled
+)
 
 bp = Blueprint('queue', __name__)
 
 
-def is_history_event(event_title):
-    """Проверка, является ли событие занятием по истории"""
-    title_lower = event_title.lower()
-    # Проверяем различные варианты названий истории
-    history_keywords = ['история', 'history', 'истбг', 'ист.бг']
-    has_history_keyword = any(keyword in title_lower for keyword in history_keywords)
-    # Обязательно должно быть (ПЗ) в названии
-    has_pz = '(пз)' in title_lower or '(пз' in title_lower
-    return has_history_keyword and has_pz
+# Очередь по истории ведётся на практические занятия (классификация - app/subjects.py)
+HISTORY_SUBJECT = 'История'
+HISTORY_LESSON_TYPE = 'ПЗ'
 
 
 def get_history_dates():
@@ -24,20 +25,19 @@ def get_history_dates():
     now = datetime.utcnow()
     future = now + timedelta(days=60)  # Проверяем на 60 дней вперед
     
-    # Получаем все события в диапазоне
-    events = CalendarEvent.query.filter(
-        CalendarEvent.start_time >= now,
-        CalendarEvent.start_time <= future
-    ).all()
-    
-    history_dates = set()
-    for event in events:
-        if is_history_event(event.title):
-            # Берем дату начала события
-            event_date = event.start_time.date()
-            history_dates.add(event_date)
-    
-    return sorted(history_dates)
+    # SELECT DISTINCT по индексу (subject, lesson_type, event_date); event_date -
+    # дата start_time, поэтому диапазон дат только сужает просмотр, а уже
+    # начавшиеся сегодня занятия отсекает условие на start_time
+    return list(db.session.execute(
+        select(CalendarEvent.event_date).distinct().where(
+            CalendarEvent.subject == HISTORY_SUBJECT,
+            CalendarEvent.lesson_type == HISTORY_LESSON_TYPE,
+            CalendarEvent.event_date >= now.date(),
+            CalendarEvent.event_date <= future.date(),
+            CalendarEvent.start_time >= now,
+            CalendarEvent.start_time <= future
+        ).order_by(CalendarEvent.event_date)
+    ).scalars())
 
 
 @bp.route('/')
@@ -50,12 +50,13 @@ def index():
     history_dates = get_history_dates()
     
     # Получение очередей для обоих предметов
-    oaip_queue = QueueEntry.query.filter_by(
+    # Пользователи загружаются вместе с записями: шаблон выводит ФИО каждого
+    oaip_queue = QueueEntry.query.options(joinedload(QueueEntry.user)).filter_by(
         subject='ОАиП',
         has_answered=False
     ).order_by(QueueEntry.timestamp.asc()).all()
     
-    history_queue = QueueEntry.query.filter_by(
+    history_queue = QueueEntry.query.options(joinedload(QueueEntry.user)).filter_by(
         subject='История',
         has_answered=False
     ).order_by(QueueEntry.event_date.asc(), QueueEntry.timestamp.asc()).all()
@@ -73,6 +74,12 @@ def index():
         has_answered=False
     ).first()
     
+    app = current_app._get_current_object()
+    live_updates = live_updates_enabled(app)
+    if live_updates:
+        # Мост журнала очереди запускается до подключения страницы к потоку
+        get_queue_bridge(app)
+    
     return render_template(
         'queue.html',
         title='Очередь ответов',
@@ -81,7 +88,10 @@ def index():
         history_queue=history_queue,
         user_in_oaip=user_in_oaip,
         user_in_history=user_in_history,
-        history_dates=history_dates
+        history_dates=history_dates,
+        live_updates=live_updates,
+        last_queue_event_id=latest_queue_event_id() if live_updates else None,
+        list_poll_seconds=app.config.get('QUEUE_LIST_POLL_SECONDS', 10)
     )
 
 
@@ -126,16 +136,11 @@ def add():
                 return redirect(url_for('queue.index'))
             
             # Находим событие календаря для этой даты
-            calendar_event = None
-            events = CalendarEvent.query.filter(
-                CalendarEvent.start_time >= datetime.combine(event_date, datetime.min.time()),
-                CalendarEvent.start_time < datetime.combine(event_date + timedelta(days=1), datetime.min.time())
-            ).all()
-            
-            for event in events:
-                if is_history_event(event.title):
-                    calendar_event = event
-                    break
+            calendar_event = CalendarEvent.query.filter_by(
+                subject=HISTORY_SUBJECT,
+                lesson_type=HISTORY_LESSON_TYPE,
+                event_date=event_date
+            ).order_by(CalendarEvent.start_time.asc()).first()
             
             # Добавление в очередь
             queue_entry = QueueEntry(
@@ -165,7 +170,10 @@ def add():
             )
         
         db.session.add(queue_entry)
+        db.session.flush()
+        record_queue_event(queue_entry, 'joined')
         db.session.commit()
+        notify_queue_changed(current_app)
         
         if subject == 'История':
             flash(f'Вы добавлены в очередь по истории на {event_date.strftime("%d.%m.%Y")}.', 'success')
@@ -191,8 +199,10 @@ def remove(entry_id):
         flash('Эта запись уже отмечена как отвеченная.', 'warning')
         return redirect(url_for('queue.index'))
     
+    record_queue_event(entry, 'left')
     db.session.delete(entry)
     db.session.commit()
+    notify_queue_changed(current_app)
     
     flash('Вы удалены из очереди.', 'success')
     return redirect(url_for('queue.index'))
@@ -209,7 +219,9 @@ def mark_answered(entry_id):
         return redirect(url_for('queue.index'))
     
     entry.has_answered = True
+    record_queue_event(entry, 'answered')
     db.session.commit()
+    notify_queue_changed(current_app)
     
     flash('Вы отметили себя как ответившего.', 'success')
     return redirect(url_for('queue.index'))
@@ -221,21 +233,71 @@ def api_list():
     """API для получения списка очереди"""
     subject = request.args.get('subject')
     
-    if subject not in ['ОАиП', 'История']:
+    if subject not in QUEUE_SUBJECTS:
         return jsonify({'error': 'Неверный предмет'}), 400
     
-    entries = QueueEntry.query.filter_by(
+    # Записи вместе с пользователями одним запросом, ФИО - одной пакетной расшифровкой
+    entries = QueueEntry.query.options(joinedload(QueueEntry.user)).filter_by(
         subject=subject,
         has_answered=False
-    ).order_by(QueueEntry.timestamp.asc()).all()
+    ).order_by(QueueEntry.event_date.asc(), QueueEntry.timestamp.asc()).all()
+    full_names = decrypt_full_names((entry.user_id, entry.user.full_name_encrypted) for entry in entries)
     
     entries_list = [{
         'id': entry.id,
         'username': entry.user.username,
-        'full_name': entry.user.get_full_name(),
+        'full_name': full_name,
         'timestamp': entry.timestamp.isoformat(),
+        'event_date': entry.event_date.isoformat() if entry.event_date else None,
+        'user_id': entry.user_id,
         'is_current_user': entry.user_id == current_user.id
-    } for entry in entries]
+    } for entry, full_name in zip(entries, full_names)]
     
     return jsonify(entries_list)
 
+
+
+@bp.route('/stream')
+@login_required
+def stream():
+    """Поток изменений очереди (Server-Sent Events)
+    
+    Параметры: subject (без него - все предметы одним потоком) и, для истории,
+    необязательная date (YYYY-MM-DD). Продолжение после разрыва - по заголовку
+    Last-Event-ID или параметру after.
+    """
+    app = current_app._get_current_object()
+    if not live_updates_enabled(app):
+        # В синхронных воркерах поток занял бы воркер: страница опрашивает /queue/api/list
+        return jsonify({'error': 'Живые обновления отключены'}), 404
+    
+    subject = request.args.get('subject')
+    if subject is not None and subject not in QUEUE_SUBJECTS:
+        return jsonify({'error': 'Неверный предмет'}), 400
+    
+    event_date = None
+    if request.args.get('date'):
+        if subject is None:
+            return jsonify({'error': 'Неверный предмет'}), 400
+        try:
+            event_date = datetime.strptime(request.args['date'], '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Неверный формат даты'}), 400
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('after')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    get_queue_bridge(app)
+    # Генератор не использует контекст запроса: соединение с БД возвращается в пул сразу
+    body = get_queue_broadcaster(app).stream(
+        (subject, event_date) if subject else ALL_SUBJECTS, last_event_id,
+        heartbeat=app.config.get('QUEUE_STREAM_HEARTBEAT_SECONDS', 15)
+    )
+    response = current_app.response_class(body, mimetype='text/event-stream')
+    response.cache_control.no_cache = True
+    # nginx не должен буферизовать поток
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
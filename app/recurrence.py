@@ -0,0 +1,98 @@
+"""Развёртывание повторяющихся событий iCal (RRULE, RDATE, EXDATE, RECURRENCE-ID)"""
+import hashlib
+import re
+from datetime import datetime, timezone
+from dateutil.rrule import rrulestr, rruleset
+
+# UNTIL без суффикса Z (локальное время серии или дата)
+UNTIL_RE = re.compile(r'UNTIL=(\d{8})(?:T(\d{6}))?(Z?)', re.IGNORECASE)
+
+# Поля вхождения, которые берутся из серии или изменённого вхождения
+OCCURRENCE_FIELDS = ('title', 'description', 'location')
+
+
+def occurrence_event_id(series_uid, occurrence_start):
+    """event_id вхождения: UID серии и исходное начало вхождения (локальное время)"""
+    return f"{series_uid}_{occurrence_start:%Y%m%dT%H%M%S}"
+
+
+def _normalize_until(rule, zone):
+    """Перевод UNTIL в UTC: dateutil требует UTC, если DTSTART с часовым поясом"""
+    def replace(match):
+        if match.group(3):
+            return match.group(0)
+        moment = datetime.strptime(match.group(1) + (match.group(2) or '235959'), '%Y%m%d%H%M%S')
+        moment = moment.replace(tzinfo=zone).astimezone(timezone.utc)
+        return 'UNTIL=' + moment.strftime('%Y%m%dT%H%M%SZ')
+    return UNTIL_RE.sub(replace, rule)
+
+
+def build_ruleset(master):
+    """Набор правил серии: RRULE и RDATE минус EXDATE"""
+    dtstart = master['series_start']
+    rules = rruleset()
+    if master.get('rrule'):
+        rules.rrule(rrulestr(_normalize_until(master['rrule'], dtstart.tzinfo), dtstart=dtstart))
+    else:
+        # Серия только из RDATE: DTSTART - первое вхождение
+        rules.rdate(dtstart)
+    for moment in master.get('rdates', ()):
+        rules.rdate(moment)
+    for moment in master.get('exdates', ()):
+        rules.exdate(moment)
+    return rules
+
+
+def series_hash(master, overrides):
+    """SHA-256 серии вместе с изменёнными вхождениями: при совпадении развёрнутая часть актуальна"""
+    parts = [_fingerprint(master)] + sorted(_fingerprint(override) for override in overrides)
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _fingerprint(record):
+    return repr(sorted(record.items()))
+
+
+def _occurrence(series_uid, original_start, source, start_time, end_time):
+    row = {
+        'event_id': occurrence_event_id(series_uid, original_start),
+        'series_uid': series_uid,
+        'occurrence_start': original_start,
+        'start_time': start_time,
+        'end_time': end_time,
+    }
+    for field in OCCURRENCE_FIELDS:
+        row[field] = source[field]
+    return row
+
+
+def expand_series(master, overrides, range_start, range_end, local_offset):
+    """Вхождения серии, пересекающиеся с [range_start, range_end]
+
+    Границы и времена вхождений - naive, локальное время (UTC + local_offset).
+    Изменённые вхождения (RECURRENCE-ID) заменяют исходные, отменённые пропускаются.
+    """
+    series_uid = master['event_id']
+    duration = master['end_time'] - master['start_time']
+    by_start = {override['recurrence_id']: override for override in overrides}
+
+    after = (range_start - duration - local_offset).replace(tzinfo=timezone.utc)
+    before = (range_end - local_offset).replace(tzinfo=timezone.utc)
+
+    rows = []
+    for moment in build_ruleset(master).between(after, before, inc=True):
+        original_start = moment.astimezone(timezone.utc).replace(tzinfo=None) + local_offset
+        override = by_start.pop(original_start, None)
+        if override is None:
+            rows.append(_occurrence(series_uid, original_start, master, original_start, original_start + duration))
+        elif not override['cancelled']:
+            rows.append(_occurrence(
+                series_uid, original_start, override, override['start_time'], override['end_time']
+            ))
+
+    # Изменённые вхождения, которых нет среди вычисленных по правилу
+    for original_start, override in by_start.items():
+        if override['cancelled'] or not range_start - duration <= original_start <= range_end:
+            continue
+        rows.append(_occurrence(series_uid, original_start, override, override['start_time'], override['end_time']))
+    return rows
@@ -1,5 +1,5 @@
 from flask import Blueprint, render_template
-from flask_login import login_required
+from flask_login import login_required, current_user
 
 bp = Blueprint('main', __name__)
 
@@ -7,7 +7,10 @@ bp = Blueprint('main', __name__)
 @bp.route('/')
 def index():
     """Главная страница"""
-    return render_template('index.html', title='Главная')
+    from app.user_stats import get_user_stats
+    # Счётчики пользователя - одно чтение строки user_stats, без COUNT по таблицам
+    stats = get_user_stats(current_user.id) if current_user.is_authenticated else None
+    return render_template('index.html', title='Главная', stats=stats)
 
 
 @bp.route('/schedule')
@@ -0,0 +1,157 @@
+"""Индекс расписания по дням в памяти процесса
+
+Одно и то же представление "события по дням в локальном времени" нужно
+веб-страницам, API, очереди и боту. Индекс строится один раз после
+синхронизации (и в других процессах - при смене поколения кэша календаря):
+события хранятся компактными записями, отсортированными по началу, а поиск
+по дню и диапазону - bisect по списку начал, без обращения к БД.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from app.models import db, CalendarEvent
+
+# Сколько прошедших дней держать в индексе (все потребители смотрят вперёд)
+PAST_DAYS = 1
+
+
+class ScheduleEvent:
+    """Компактная запись события; атрибуты совпадают с CalendarEvent"""
+    __slots__ = ('id', 'event_id', 'source', 'title', 'start_time', 'end_time', 'description', 'location')
+
+    def __init__(self, id, event_id, source, title, start_time, end_time, description, location):
+        self.id = id
+        self.event_id = event_id
+        self.source = source
+        self.title = title
+        self.start_time = start_time
+        self.end_time = end_time
+        self.description = description
+        self.location = location
+
+    def __repr__(self):
+        return f'<ScheduleEvent {self.title}>'
+
+
+class ScheduleIndex:
+    """Неизменяемый индекс событий: диапазоны и дни за O(log n)"""
+
+    def __init__(self, events, generation=None):
+        self.generation = generation
+        self.built_at = time.monotonic()
+        self._events = tuple(sorted(events, key=lambda event: (event.start_time, event.id)))
+        self._starts = [event.start_time for event in self._events]
+        self._by_id = {event.id: event for event in self._events}
+        # Дни в локальном времени и границы их событий в _events
+        self._days = []
+        self._bounds = {}
+        for position, event in enumerate(self._events):
+            day = event.start_time.date()
+            if day in self._bounds:
+                self._bounds[day][1] = position + 1
+            else:
+                self._days.append(day)
+                self._bounds[day] = [position, position + 1]
+
+    def __len__(self):
+        return len(self._events)
+
+    def get(self, event_id):
+        """Событие по первичному ключу (None, если его нет в индексе)"""
+        return self._by_id.get(event_id)
+
+    def between(self, start, end):
+        """События, начинающиеся в [start, end], по возрастанию начала"""
+        return self._events[bisect_left(self._starts, start):bisect_right(self._starts, end)]
+
+    def day(self, day):
+        """События дня по возрастанию начала"""
+        bounds = self._bounds.get(day)
+        return self._events[bounds[0]:bounds[1]] if bounds else ()
+
+    def days(self, start_day=None, end_day=None):
+        """Дни с событиями в [start_day, end_day]"""
+        lo = bisect_left(self._days, start_day) if start_day else 0
+        hi = bisect_right(self._days, end_day) if end_day else len(self._days)
+        return self._days[lo:hi]
+
+    def group_by_day(self, start, end):
+        """События, начинающиеся в [start, end], сгруппированные по дням: {day: (events, ...)}"""
+        groups = {}
+        for event in self.between(start, end):
+            groups.setdefault(event.start_time.date(), []).append(event)
+        return {day: tuple(events) for day, events in groups.items()}
+
+
+def build_schedule_index(generation=None, now=None):
+    """Построение индекса из БД одной выборкой колонок"""
+    from app.calendar_routes import LOCAL_TIMEZONE_OFFSET, max_event_duration
+
+    if now is None:
+        now = datetime.utcnow() + LOCAL_TIMEZONE_OFFSET
+    since = now - timedelta(days=PAST_DAYS)
+    rows = db.session.execute(
+        select(
+            CalendarEvent.id, CalendarEvent.event_id, CalendarEvent.source, CalendarEvent.title,
+            CalendarEvent.start_time, CalendarEvent.end_time, CalendarEvent.description, CalendarEvent.location
+        ).where(
+            # Нижняя граница start_time ограничивает просмотр индекса (start_time, end_time)
+            CalendarEvent.start_time > since - max_event_duration(),
+            CalendarEvent.end_time >= since
+        )
+    ).all()
+    return ScheduleIndex((ScheduleEvent(*row) for row in rows), generation)
+
+
+class ScheduleIndexHolder:
+    """Текущий индекс приложения; поколение в БД проверяется не чаще check_interval"""
+
+    def __init__(self, check_interval=5):
+        self.check_interval = check_interval
+        self.index = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        from app.calendar_cache import calendar_generation
+
+        index = self.index
+        if index is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return index
+        with self._lock:
+            generation = calendar_generation()
+            self._checked_at = time.monotonic()
+            if self.index is None or self.index.generation != generation:
+                self.index = build_schedule_index(generation)
+            return self.index
+
+    def rebuild(self):
+        """Перестроение после синхронизации (в процессе, который её выполнил)"""
+        from app.calendar_cache import calendar_generation
+
+        with self._lock:
+            generation = calendar_generation()
+            self.index = build_schedule_index(generation)
+            self._checked_at = time.monotonic()
+            return self.index
+
+
+def _holder(app):
+    holder = app.extensions.get('schedule_index')
+    if holder is None:
+        holder = app.extensions.setdefault(
+            'schedule_index', ScheduleIndexHolder(app.config.get('CALENDAR_INDEX_CHECK_SECONDS', 5))
+        )
+    return holder
+
+
+def get_schedule_index(app):
+    """Актуальный индекс расписания приложения"""
+    return _holder(app).get()
+
+
+def rebuild_schedule_index(app):
+    """Перестроение индекса после синхронизации, изменившей события"""
+    return _holder(app).rebuild()
@@ -0,0 +1,423 @@
+"""Фоновый планировщик периодических задач
+
+Поток планировщика запускается в каждом процессе (воркеры Gunicorn/Passenger),
+но задачи выполняет только ведущий процесс: тот, кто удерживает advisory lock
+в PostgreSQL/MySQL или файловую блокировку для SQLite. Если ведущий процесс
+завершается, блокировку при следующей проверке забирает другой.
+"""
+import os
+import random
+import socket
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+from app.models import db, SchedulerJobState, CalendarSyncState
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+scheduler_cli = AppGroup('scheduler', help='Фоновый планировщик задач')
+
+
+class FileLock:
+    """Неблокирующая межпроцессная файловая блокировка (SQLite)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        if self._file is not None:
+            return True
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def is_held(self):
+        return self._file is not None
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        self._file.close()
+        self._file = None
+
+
+class AdvisoryLock:
+    """Advisory lock PostgreSQL (pg_try_advisory_lock) или MySQL (GET_LOCK)
+
+    Блокировка сессионная, поэтому удерживается на отдельном соединении до release();
+    при потере соединения она снимается сервером.
+    """
+
+    def __init__(self, engine, name):
+        self.engine = engine
+        self.name = name
+        # Ключ advisory lock в PostgreSQL - целое число
+        self.key = zlib.crc32(name.encode('utf-8'))
+        self._connection = None
+
+    def acquire(self):
+        if self._connection is not None:
+            return self.is_held()
+        connection = self.engine.connect()
+        try:
+            if self.engine.dialect.name == 'postgresql':
+                acquired = connection.execute(
+                    text('SELECT pg_try_advisory_lock(:key)'), {'key': self.key}
+                ).scalar()
+            else:
+                acquired = connection.execute(
+                    text('SELECT GET_LOCK(:name, 0)'), {'name': self.name}
+                ).scalar() == 1
+            # Не оставляем открытую транзакцию на удерживаемом соединении
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self._connection = connection
+        return True
+
+    def is_held(self):
+        if self._connection is None:
+            return False
+        try:
+            self._connection.execute(text('SELECT 1'))
+            self._connection.commit()
+            return True
+        except Exception:
+            # Соединение потеряно - вместе с ним потеряна и блокировка
+            self._close()
+            return False
+
+    def release(self):
+        if self._connection is None:
+            return
+        try:
+            if self.engine.dialect.name == 'postgresql':
+                self._connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': self.key})
+            else:
+                self._connection.execute(text('SELECT RELEASE_LOCK(:name)'), {'name': self.name})
+            self._connection.commit()
+        except Exception:
+            pass
+        self._close()
+
+    def _close(self):
+        try:
+            self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+
+
+def make_process_lock(app, name, path=None):
+    """Именованная межпроцессная блокировка для БД приложения
+
+    PostgreSQL/MySQL - advisory lock, остальные БД (SQLite) - файл instance/<name>.lock.
+    """
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name in ('postgresql', 'mysql', 'mariadb'):
+        return AdvisoryLock(engine, f"bsuir_diary_{name}")
+    return FileLock(path or os.path.join(app.instance_path, f"{name}.lock"))
+
+
+def make_leader_lock(app):
+    """Блокировка ведущего процесса планировщика"""
+    return make_process_lock(app, 'scheduler', path=app.config.get('SCHEDULER_LOCK_FILE'))
+
+
+def acquire_with_timeout(lock, timeout, poll_interval=0.2):
+    """Ожидание блокировки не дольше timeout секунд; True, если блокировка получена"""
+    deadline = time.monotonic() + timeout
+    while not lock.acquire():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_interval)
+    return True
+
+
+class Job:
+    """Периодическая задача: интервал со случайным разбросом и backoff после ошибок"""
+
+    def __init__(self, name, func, interval, jitter=0.1, retry_base=60, max_backoff=3600):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.retry_base = retry_base
+        self.max_backoff = max_backoff
+
+    def next_delay(self, failures=0):
+        """Пауза до следующего запуска в секундах (после failures ошибок подряд)"""
+        if failures:
+            delay = min(self.retry_base * 2 ** (failures - 1), self.max_backoff)
+        else:
+            delay = self.interval
+        # Разброс не даёт нескольким инсталляциям ходить к Google в одну и ту же секунду
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+class Scheduler:
+    """Планировщик: выборы ведущего процесса и запуск созревших задач"""
+
+    def __init__(self, app, lock=None, poll_interval=None):
+        self.app = app
+        self.jobs = {}
+        self.lock = lock
+        self.poll_interval = poll_interval or app.config.get('SCHEDULER_POLL_SECONDS', 30)
+        self.identity = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+        self._next_run = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_job(self, job):
+        self.jobs[job.name] = job
+        return job
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.run_forever, daemon=True, name='Scheduler')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self.lock is not None:
+            self.lock.release()
+        self.is_leader = False
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                wait = self.tick()
+            except Exception as e:
+                print(f"Error in scheduler loop: {e}")
+                wait = self.poll_interval
+            self._stop.wait(wait)
+
+    def tick(self):
+        """Один шаг планировщика; возвращает паузу до следующего шага в секундах"""
+        with self.app.app_context():
+            if not self._ensure_leader():
+                return self.poll_interval
+
+            now = datetime.utcnow()
+            for name, job in self.jobs.items():
+                if self._next_run[name] <= now:
+                    self.run_job(job)
+
+            until_next = min(self._next_run.values(), default=now + timedelta(seconds=self.poll_interval))
+            # Ведущий тоже просыпается не реже poll_interval, чтобы проверить блокировку
+            return max(0, min((until_next - datetime.utcnow()).total_seconds(), self.poll_interval))
+
+    def _ensure_leader(self):
+        if self.lock is None:
+            self.lock = make_leader_lock(self.app)
+        was_leader = self.is_leader
+        self.is_leader = self.lock.is_held() or self.lock.acquire()
+        if self.is_leader and not was_leader:
+            print(f"Scheduler: {self.identity} became leader")
+            self._load_schedule()
+        return self.is_leader
+
+    def _load_schedule(self):
+        """Расписание из БД: после смены ведущего задачи не запускаются раньше срока"""
+        now = datetime.utcnow()
+        states = {state.name: state for state in SchedulerJobState.query.all()}
+        for name in self.jobs:
+            state = states.get(name)
+            self._next_run[name] = state.next_run_at if state is not None and state.next_run_at else now
+
+    def run_job(self, job):
+        """Запуск задачи с записью статуса последнего запуска"""
+        state = SchedulerJobState.query.filter_by(name=job.name).first()
+        if state is None:
+            state = SchedulerJobState(name=job.name, consecutive_failures=0)
+            db.session.add(state)
+        state.leader = self.identity
+        state.last_started_at = datetime.utcnow()
+        db.session.commit()
+
+        started = time.perf_counter()
+        try:
+            job.func()
+        except Exception as e:
+            db.session.rollback()
+            state.consecutive_failures = (state.consecutive_failures or 0) + 1
+            state.last_status = 'error'
+            state.last_error = str(e)[:1000]
+            print(f"Scheduler job {job.name} failed ({state.consecutive_failures} in a row): {e}")
+        else:
+            state.consecutive_failures = 0
+            state.last_status = 'ok'
+            state.last_error = None
+            state.last_success_at = datetime.utcnow()
+
+        finished = datetime.utcnow()
+        state.last_finished_at = finished
+        state.last_duration_ms = int((time.perf_counter() - started) * 1000)
+        state.next_run_at = finished + timedelta(seconds=job.next_delay(state.consecutive_failures))
+        self._next_run[job.name] = state.next_run_at
+        db.session.commit()
+        return state
+
+
+def sync_calendar_job():
+    """Задача планировщика: синхронизация кэша календаря
+
+    Идёт через single-flight: если обновление уже запущено из запроса
+    или другим процессом, задача дожидается его, а не загружает feed повторно.
+    """
+    from flask import current_app
+    from app.calendar_refresh import get_refresher
+    get_refresher(current_app._get_current_object()).refresh()
+
+
+def cleanup_queue_events_job():
+    """Задача планировщика: очистка старых строк журнала изменений очереди"""
+    from flask import current_app
+    from app.queue_events import cleanup_queue_events
+    hours = current_app.config.get('QUEUE_EVENTS_RETENTION_HOURS', 24)
+    cleanup_queue_events(timedelta(hours=hours))
+
+
+def collect_blob_garbage_job():
+    """Задача планировщика: удаление содержимого загруженных файлов без ссылок"""
+    from app.blob_store import collect_blob_garbage
+    collect_blob_garbage()
+
+
+def cleanup_upload_sessions_job():
+    """Задача планировщика: удаление брошенных загрузок по частям"""
+    from app.chunked_upload import cleanup_upload_sessions
+    cleanup_upload_sessions()
+
+
+def create_scheduler(app, lock=None):
+    """Планировщик со стандартными задачами приложения"""
+    config = app.config
+    scheduler = Scheduler(app, lock=lock)
+    scheduler.add_job(Job(
+        'calendar_sync',
+        sync_calendar_job,
+        interval=config.get('CALENDAR_SYNC_INTERVAL_SECONDS', 3600),
+        jitter=config.get('CALENDAR_SYNC_JITTER', 0.1),
+        retry_base=config.get('SCHEDULER_RETRY_BASE_SECONDS', 60),
+        max_backoff=config.get('SCHEDULER_MAX_BACKOFF_SECONDS', 3600)
+    ))
+    scheduler.add_job(Job(
+        'queue_events_cleanup',
+        cleanup_queue_events_job,
+        interval=3600,
+        retry_base=config.get('SCHEDULER_RETRY_BASE_SECONDS', 60),
+        max_backoff=config.get('SCHEDULER_MAX_BACKOFF_SECONDS', 3600)
+    ))
+    scheduler.add_job(Job(
+        'file_blobs_gc',
+        collect_blob_garbage_job,
+        interval=config.get('BLOB_GC_INTERVAL_SECONDS', 24 * 3600),
+        retry_base=config.get('SCHEDULER_RETRY_BASE_SECONDS', 60),
+        max_backoff=config.get('SCHEDULER_MAX_BACKOFF_SECONDS', 3600)
+    ))
+    scheduler.add_job(Job(
+        'upload_sessions_cleanup',
+        cleanup_upload_sessions_job,
+        interval=config.get('CHUNKED_UPLOAD_CLEANUP_INTERVAL_SECONDS', 3600),
+        retry_base=config.get('SCHEDULER_RETRY_BASE_SECONDS', 60),
+        max_backoff=config.get('SCHEDULER_MAX_BACKOFF_SECONDS', 3600)
+    ))
+    return scheduler
+
+
+def start_scheduler(app):
+    """Запуск планировщика в фоновом потоке (один раз на процесс)"""
+    if not app.config.get('SCHEDULER_ENABLED', True) or app.config.get('TESTING'):
+        return None
+    scheduler = app.extensions.get('scheduler')
+    if scheduler is None:
+        scheduler = create_scheduler(app)
+        app.extensions['scheduler'] = scheduler
+        scheduler.start()
+    return scheduler
+
+
+def get_scheduler_status(app):
+    """Статус задач планировщика: последний запуск из БД и роль текущего процесса"""
+    scheduler = app.extensions.get('scheduler')
+    return {
+        'process': scheduler.identity if scheduler else f"{socket.gethostname()}:{os.getpid()}",
+        'running': scheduler is not None,
+        'is_leader': bool(scheduler and scheduler.is_leader),
+        'jobs': [state.as_dict() for state in SchedulerJobState.query.order_by(SchedulerJobState.name).all()],
+        'calendar_sources': [
+            state.as_dict() for state in CalendarSyncState.query.order_by(CalendarSyncState.source).all()
+        ]
+    }
+
+
+@scheduler_cli.command('run')
+def run_command():
+    """Запуск планировщика в текущем процессе (отдельно от веб-воркеров)"""
+    from flask import current_app
+    app = current_app._get_current_object()
+    scheduler = create_scheduler(app)
+    app.extensions['scheduler'] = scheduler
+    click.echo(f"Scheduler started: {scheduler.identity}")
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+
+
+@scheduler_cli.command('status')
+def status_command():
+    """Статус последних запусков задач"""
+    from flask import current_app
+    status = get_scheduler_status(current_app)
+    if not status['jobs']:
+        click.echo('Задачи ещё не запускались')
+    for job in status['jobs']:
+        click.echo(
+            f"{job['name']}: {job['last_status'] or '-'}, последний запуск {job['last_started_at'] or '-'}, "
+            f"ошибок подряд {job['consecutive_failures']}, следующий запуск {job['next_run_at'] or '-'}"
+        )
+        if job['last_error']:
+            click.echo(f"  ошибка: {job['last_error']}")
@@ -0,0 +1,134 @@
+"""Классификация событий календаря по предмету и типу занятия
+
+Предмет и тип занятия (ПЗ/ЛК/ЛР) определяются по названию один раз - при
+записи события в кэш - и хранятся в индексируемых колонках calendar_events,
+поэтому выборки вида "даты практических по истории" идут по индексу, а не
+перебором названий. Правила задаются в конфигурации (SUBJECT_RULES,
+LESSON_TYPE_RULES): значение определяет первое правило, ключевое слово
+которого встречается в названии (без учёта регистра).
+"""
+import json
+from flask import current_app, has_app_context
+from sqlalchemy import event, select, update
+from app.models import db, CalendarEvent
+
+DEFAULT_SUBJECT_RULES = {
+    'История': ['история', 'history', 'истбг', 'ист.бг'],
+    'ОАиП': ['основы алгоритмизации', 'оаип'],
+}
+DEFAULT_LESSON_TYPE_RULES = {
+    'ПЗ': ['(пз'],
+    'ЛК': ['(лк'],
+    'ЛР': ['(лр'],
+}
+# Колонки, которые вычисляются из записи события, а не приходят из iCal
+CLASS_COLUMNS = ('subject', 'lesson_type', 'event_date')
+
+# Названия в расписании повторяются, поэтому результат классификации запоминается
+MAX_CACHED_TITLES = 10000
+
+
+def parse_rules(value, default):
+    """Правила из конфигурации: словарь или JSON {"значение": ["ключевое слово", ...]}"""
+    if not value:
+        return default
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError as e:
+            print(f"Invalid classification rules {value!r}: {e}")
+            return default
+    if not isinstance(value, dict):
+        print(f"Invalid classification rules {value!r}, expected an object")
+        return default
+    return value
+
+
+class SubjectRules:
+    """Набор правил классификации названий событий"""
+
+    def __init__(self, subjects=None, lesson_types=None):
+        self.subjects = self._compile(DEFAULT_SUBJECT_RULES if subjects is None else subjects)
+        self.lesson_types = self._compile(DEFAULT_LESSON_TYPE_RULES if lesson_types is None else lesson_types)
+        self._cache = {}
+
+    @staticmethod
+    def _compile(rules):
+        if isinstance(rules, dict):
+            rules = rules.items()
+        return tuple((name, tuple(keyword.lower() for keyword in keywords)) for name, keywords in rules)
+
+    @staticmethod
+    def _match(rules, title_lower):
+        for name, keywords in rules:
+            if any(keyword in title_lower for keyword in keywords):
+                return name
+        return None
+
+    def classify(self, title):
+        """(предмет, тип занятия) по названию; None, если правило не подошло"""
+        result = self._cache.get(title)
+        if result is None:
+            title_lower = (title or '').lower()
+            result = (self._match(self.subjects, title_lower), self._match(self.lesson_types, title_lower))
+            if len(self._cache) < MAX_CACHED_TITLES:
+                self._cache[title] = result
+        return result
+
+    def classify_record(self, record):
+        """Копия записи события с заполненными CLASS_COLUMNS"""
+        subject, lesson_type = self.classify(record.get('title'))
+        start_time = record.get('start_time')
+        return dict(
+            record,
+            subject=subject,
+            lesson_type=lesson_type,
+            event_date=start_time.date() if start_time is not None else None
+        )
+
+
+_default_rules = SubjectRules()
+
+
+def get_subject_rules(app=None):
+    """Правила классификации приложения (без контекста приложения - правила по умолчанию)"""
+    if app is None:
+        if not has_app_context():
+            return _default_rules
+        app = current_app
+    rules = app.extensions.get('subject_rules')
+    if rules is None:
+        rules = app.extensions.setdefault('subject_rules', SubjectRules(
+            parse_rules(app.config.get('SUBJECT_RULES'), DEFAULT_SUBJECT_RULES),
+            parse_rules(app.config.get('LESSON_TYPE_RULES'), DEFAULT_LESSON_TYPE_RULES)
+        ))
+    return rules
+
+
+@event.listens_for(CalendarEvent, 'before_insert')
+@event.listens_for(CalendarEvent, 'before_update')
+def classify_event(mapper, connection, target):
+    """Классификация событий, записанных через ORM (синхронизация классифицирует пакетно)"""
+    target.subject, target.lesson_type = get_subject_rules().classify(target.title)
+    target.event_date = target.start_time.date() if target.start_time is not None else None
+
+
+def reclassify_events(rules=None, batch_size=1000):
+    """Пересчёт классификации всех событий кэша после смены правил (без commit)
+
+    Возвращает число изменённых строк.
+    """
+    rules = rules or get_subject_rules()
+    rows = db.session.execute(
+        select(CalendarEvent.id, CalendarEvent.title, CalendarEvent.start_time, *[
+            getattr(CalendarEvent, column) for column in CLASS_COLUMNS
+        ])
+    ).all()
+    changes = []
+    for row in rows:
+        record = rules.classify_record({'title': row.title, 'start_time': row.start_time})
+        if any(getattr(row, column) != record[column] for column in CLASS_COLUMNS):
+            changes.append({'id': row.id, **{column: record[column] for column in CLASS_COLUMNS}})
+    for start in range(0, len(changes), batch_size):
+        db.session.execute(update(CalendarEvent), changes[start:start + batch_size])
+    return len(changes)
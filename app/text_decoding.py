@@ -0,0 +1,104 @@
+"""Декодирование текстовых полей iCal: кодировка определяется один раз на документ,
+исправление mojibake выполняется только для подозрительных строк"""
+import codecs
+import re
+from functools import lru_cache
+
+DEFAULT_ENCODING = 'utf-8'
+# Кодировка, на которую переключаемся, если документ не декодируется как UTF-8
+FALLBACK_ENCODING = 'cp1251'
+
+# Типичные следы UTF-8 текста, прочитанного в однобайтовой кодировке:
+# latin-1/cp1252 - "Ð"/"Ñ" (кириллица), "Ã"/"Â" (латиница), "â" (типографские знаки)
+# перед символом из верхней половины таблицы ("ÐŸÑ€Ð¸"),
+# cp1251 - "Р"/"С" перед символом из диапазона 0x80-0xBF ("Р'СЂРё")
+MOJIBAKE_RE = re.compile(
+    '[ÂÃÐÑâ][\u0080-¿ŒœŠšŸŽžƒˆ˜–-›€™]'
+    '|[РС][\u0080-¿Ё-Џё-џҐґ–-›€№™]'
+)
+# В cp1251 mojibake каждая буква кириллицы превращается в пару "Р"/"С" + символ,
+# в обычном тексте заглавные Р и С встречаются редко
+CP1251_LEADS_MIN = 3
+
+# Однобайтовые кодировки, через которые мог пройти UTF-8 текст
+REPAIR_ENCODINGS = ('latin-1', 'cp1252', 'cp1251')
+
+
+def looks_like_mojibake(text):
+    """Дешёвая проверка: есть ли в строке признаки неверно декодированного UTF-8"""
+    if text.isascii():
+        return False
+    # Поиск подстрок и count заметно дешевле регулярного выражения на каждом поле
+    if 'Ð' not in text and 'Ñ' not in text and 'Ã' not in text and 'Â' not in text and 'â' not in text \
+            and text.count('Р') + text.count('С') < CP1251_LEADS_MIN:
+        return False
+    return MOJIBAKE_RE.search(text) is not None
+
+
+@lru_cache(maxsize=4096)
+def repair_mojibake(text):
+    """Исправление UTF-8 текста, декодированного в однобайтовой кодировке
+
+    Результат кэшируется: названия занятий повторяются каждую неделю.
+    Если ни одна кодировка не даёт корректный UTF-8, строка возвращается как есть.
+    """
+    for encoding in REPAIR_ENCODINGS:
+        try:
+            # Строгое декодирование: обычный текст почти никогда не образует корректный UTF-8
+            return text.encode(encoding).decode('utf-8')
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            continue
+    return text
+
+
+def detect_encoding(charset=None, head=b''):
+    """Кодировка документа: BOM, затем charset из Content-Type, затем UTF-8"""
+    if head.startswith(b'\xef\xbb\xbf'):
+        return DEFAULT_ENCODING
+    if charset:
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            pass
+    return DEFAULT_ENCODING
+
+
+class FeedDecoder:
+    """Декодер полей одного документа iCal
+
+    Кодировка документа определяется при создании (и один раз уточняется, если
+    первое же поле не декодируется как UTF-8); каждое поле декодируется за один проход.
+    """
+
+    def __init__(self, charset=None, head=b''):
+        self.encoding = detect_encoding(charset, head)
+        self._encoding_checked = self.encoding != DEFAULT_ENCODING
+        self.repaired = 0
+
+    def decode(self, value, params=None):
+        """Декодирование значения свойства (bytes) с учётом параметра CHARSET"""
+        encoding = self.encoding
+        if params and 'CHARSET' in params:
+            encoding = params['CHARSET']
+        try:
+            text = value.decode(encoding)
+        except LookupError:
+            text = value.decode(self.encoding, errors='replace')
+        except UnicodeDecodeError:
+            if not self._encoding_checked and encoding == self.encoding:
+                # Документ не в UTF-8: переключаем кодировку один раз для всего документа
+                self.encoding = FALLBACK_ENCODING
+                self._encoding_checked = True
+            text = value.decode(self.encoding, errors='replace')
+        else:
+            if not self._encoding_checked and encoding == self.encoding and not value.isascii():
+                self._encoding_checked = True
+
+        if looks_like_mojibake(text):
+            fixed = repair_mojibake(text)
+            if fixed != text:
+                self.repaired += 1
+            return fixed
+        return text
+
+    __call__ = decode
@@ -1,11 +1,17 @@
 import os
 from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
+from flask import Blueprint, abort, current_app, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from app import db
-from app.models import File, CalendarEvent
+from app.models import File, CalendarEvent, UploadSession
 from app.utils import allowed_file, get_secure_filename
+from app.file_delivery import send_upload
+from app.blob_store import get_blob_store
+from app.chunked_upload import (
+    UploadConflict, UploadTooLarge, create_session, append_chunk, discard_session, partial_path,
+    locked_partial, accepted_offset
+)
 
 bp = Blueprint('upload', __name__)
 
@@ -37,32 +43,13 @@ def upload_file():
                 flash('Занятие не найдено.', 'danger')
                 return redirect(request.url)
             
-            # Сохранение файла
+            # Сохранение файла: содержимое один раз в хранилище блобов,
+            # повторная загрузка того же файла на диск не пишется
             filename = get_secure_filename(file.filename)
-            from datetime import datetime as dt
-            timestamp = dt.now().strftime('%Y%m%d_%H%M%S_')
-            unique_filename = timestamp + filename
-            
-            upload_folder = os.path.join(os.getcwd(), 'uploads')
-            os.makedirs(upload_folder, exist_ok=True)
-            
-            file_path = os.path.join(upload_folder, unique_filename)
-            file.save(file_path)
-            
-            # Определение типа файла
-            file_ext = filename.rsplit('.', 1)[1].lower()
-            file_type = 'image' if file_ext in ['png', 'jpg', 'jpeg', 'gif'] else 'document'
+            blob = get_blob_store().store_upload(file)
             
             # Сохранение в БД
-            file_record = File(
-                user_id=current_user.id,
-                calendar_event_id=cal_event.id,
-                filename=unique_filename,
-                original_filename=filename,
-                file_type=file_type,
-                file_size=os.path.getsize(file_path)
-            )
-            db.session.add(file_record)
+            db.session.add(file_record(cal_event.id, filename, blob))
             db.session.commit()
             
             flash('Файл успешно загружен и привязан к занятию.', 'success')
@@ -86,7 +73,133 @@ def upload_file():
         'start': event.start_time.isoformat()
     } for event in events]
     
-    return render_template('upload.html', title='Загрузка файлов', events=events_list)
+    return render_template('upload.html', title='Загрузка файлов', events=events_list,
+                           max_content_length=current_app.config.get('MAX_CONTENT_LENGTH'),
+                           chunked_max_size=current_app.config.get('CHUNKED_UPLOAD_MAX_SIZE'))
+
+
+def file_record(calendar_event_id, filename, blob):
+    """Строка files для содержимого из хранилища блобов"""
+    # Определение типа файла
+    file_ext = filename.rsplit('.', 1)[1].lower()
+    file_type = 'image' if file_ext in ['png', 'jpg', 'jpeg', 'gif'] else 'document'
+    return File(
+        user_id=current_user.id,
+        calendar_event_id=calendar_event_id,
+        filename=blob.relative_path,
+        original_filename=filename,
+        file_type=file_type,
+        file_size=blob.size,
+        sha256=blob.sha256,
+        blob_sha256=blob.sha256
+    )
+
+
+def get_own_session(session_id):
+    """Сессия загрузки текущего пользователя (чужие и несуществующие - 404)"""
+    session = db.session.get(UploadSession, session_id)
+    if session is None or session.user_id != current_user.id or session.expires_at < datetime.utcnow():
+        abort(404)
+    return session
+
+
+def offset_headers(session):
+    return {
+        'Upload-Offset': str(session.offset),
+        'Upload-Length': str(session.length),
+        'Cache-Control': 'no-store'
+    }
+
+
+@bp.route('/sessions', methods=['POST'])
+@login_required
+def create_upload_session():
+    """Начало загрузки по частям: объявление имени и размера файла"""
+    filename = get_secure_filename(request.form.get('filename', ''))
+    length = request.headers.get('Upload-Length') or request.form.get('length')
+    calendar_event_id = request.form.get('calendar_event_id')
+    
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'Недопустимый тип файла'}), 400
+    try:
+        length = int(length)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Не указан размер файла'}), 400
+    if length <= 0:
+        return jsonify({'error': 'Не указан размер файла'}), 400
+    if length > current_app.config.get('CHUNKED_UPLOAD_MAX_SIZE', 512 * 1024 * 1024):
+        return jsonify({'error': 'Файл слишком большой'}), 413
+    cal_event = db.session.get(CalendarEvent, calendar_event_id) if calendar_event_id else None
+    if cal_event is None:
+        return jsonify({'error': 'Занятие не найдено'}), 400
+    
+    session = create_session(current_app, current_user.id, cal_event.id, filename, length)
+    db.session.commit()
+    response = jsonify(session.as_dict())
+    response.status_code = 201
+    response.headers['Location'] = url_for('upload.upload_session', session_id=session.id)
+    response.headers.update(offset_headers(session))
+    return response
+
+
+@bp.route('/sessions/<session_id>', methods=['HEAD'])
+@login_required
+def upload_session(session_id):
+    """Сколько байт уже принято (для продолжения после обрыва)"""
+    session = get_own_session(session_id)
+    return '', 200, offset_headers(session)
+
+
+@bp.route('/sessions/<session_id>', methods=['PATCH'])
+@login_required
+def upload_chunk(session_id):
+    """Приём очередной части с позиции Upload-Offset"""
+    session = get_own_session(session_id)
+    try:
+        offset = int(request.headers['Upload-Offset'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Не указан Upload-Offset'}), 400
+    try:
+        append_chunk(current_app, session, offset, request.stream)
+    except UploadConflict:
+        return jsonify({'error': 'Неверное смещение', 'offset': session.offset}), 409, offset_headers(session)
+    except FileNotFoundError:
+        # Загрузку завершили или отменили, пока часть принималась
+        abort(404)
+    except UploadTooLarge:
+        return jsonify({'error': 'Часть выходит за размер файла'}), 413, offset_headers(session)
+    return '', 204, offset_headers(session)
+
+
+@bp.route('/sessions/<session_id>/finalize', methods=['POST'])
+@login_required
+def finalize_upload_session(session_id):
+    """Завершение загрузки по частям: файл переносится в хранилище и привязывается к занятию"""
+    session = get_own_session(session_id)
+    try:
+        with locked_partial(session.id) as partial:
+            # Смещение в БД сверяется с файлом: в хранилище попадает только файл целиком
+            offset = accepted_offset(session, partial)
+            if offset != session.length or os.fstat(partial.fileno()).st_size != session.length:
+                return jsonify({'error': 'Файл загружен не полностью', 'offset': offset}), 409, offset_headers(session)
+            blob = get_blob_store().import_file(partial_path(session.id))
+            record = file_record(session.calendar_event_id, session.original_filename, blob)
+            db.session.add(record)
+            db.session.delete(session)
+            db.session.commit()
+    except FileNotFoundError:
+        # Ту же сессию уже завершил или отменил другой запрос
+        abort(404)
+    return jsonify({'id': record.id, 'sha256': blob.sha256, 'size': blob.size}), 201
+
+
+@bp.route('/sessions/<session_id>', methods=['DELETE'])
+@login_required
+def cancel_upload_session(session_id):
+    """Отмена загрузки по частям"""
+    discard_session(current_app, get_own_session(session_id))
+    db.session.commit()
+    return '', 204
 
 
 @bp.route('/files/<int:file_id>')
@@ -100,8 +213,8 @@ def download_file(file_id):
         flash('У вас нет прав для доступа к этому файлу.', 'danger')
         return redirect(url_for('upload.upload_file'))
     
-    upload_folder = os.path.join(os.getcwd(), 'uploads')
-    return send_from_directory(upload_folder, file_record.filename, as_attachment=True)
+    # Байты отдаёт Werkzeug или прокси (FILE_DELIVERY), права проверены выше
+    return send_upload(file_record.filename, file_record.original_filename, etag=file_record.blob_sha256)
 
 
 @bp.route('/files/event/<int:event_id>')
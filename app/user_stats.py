@@ -0,0 +1,188 @@
+"""Денормализованные счётчики пользователя (user_stats)
+
+Открытые записи очереди, незавершённые задачи и файлы пользователя хранятся
+готовыми числами и читаются без COUNT. Счётчики меняются событиями маппера в
+той же транзакции, что и сама запись: атомарным UPDATE count = count + delta,
+поэтому одновременные изменения не теряются. Изменения в обход ORM (массовые
+UPDATE/DELETE, правки в БД руками) счётчики не видят - их выравнивает
+flask stats reconcile.
+"""
+from datetime import datetime
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event, select, update, insert, delete, func, or_, bindparam
+from sqlalchemy.orm import attributes
+from app.models import db, User, UserStats, QueueEntry, Task, File
+
+stats_cli = AppGroup('stats', help='Счётчики пользователей')
+
+# Счётчик -> (модель, условие учёта строки по значениям её атрибутов)
+COUNTERS = {
+    'open_queue_count': (QueueEntry, lambda values: not values['has_answered']),
+    'open_tasks_count': (Task, lambda values: not values['completed']),
+    'files_count': (File, lambda values: True),
+}
+# Атрибуты, от которых зависит условие
+COUNTER_ATTRS = {QueueEntry: ('user_id', 'has_answered'), Task: ('user_id', 'completed'), File: ('user_id',)}
+
+
+def _values(target, old=False):
+    """Текущие значения атрибутов строки или значения до изменения (old)"""
+    values = {}
+    for key in COUNTER_ATTRS[type(target)]:
+        value = getattr(target, key)
+        if old:
+            history = attributes.get_history(target, key)
+            if history.deleted:
+                value = history.deleted[0]
+        values[key] = value
+    return values
+
+
+def _apply(connection, deltas):
+    """Атомарное изменение счётчиков: {(user_id, counter): delta}"""
+    for (user_id, counter), delta in deltas.items():
+        if not delta or user_id is None:
+            continue
+        column = UserStats.__table__.c[counter]
+        # Строки нет (пользователь удаляется или счётчики ещё не созданы) - ничего не меняем,
+        # расхождение исправит reconcile
+        connection.execute(
+            update(UserStats.__table__)
+            .where(UserStats.__table__.c.user_id == user_id)
+            .values({column: column + delta, 'updated_at': datetime.utcnow()})
+        )
+
+
+def _contributions(target, values):
+    """Вклад строки в счётчики: [(user_id, counter)]"""
+    return [
+        (values['user_id'], counter)
+        for counter, (model, counts) in COUNTERS.items()
+        if isinstance(target, model) and counts(values)
+    ]
+
+
+def _on_insert(mapper, connection, target):
+    _apply(connection, {key: 1 for key in _contributions(target, _values(target))})
+
+
+def _on_delete(mapper, connection, target):
+    _apply(connection, {key: -1 for key in _contributions(target, _values(target, old=True))})
+
+
+def _on_update(mapper, connection, target):
+    deltas = {}
+    for key in _contributions(target, _values(target, old=True)):
+        deltas[key] = deltas.get(key, 0) - 1
+    for key in _contributions(target, _values(target)):
+        deltas[key] = deltas.get(key, 0) + 1
+    _apply(connection, deltas)
+
+
+for _model in COUNTER_ATTRS:
+    event.listen(_model, 'after_insert', _on_insert)
+    event.listen(_model, 'after_delete', _on_delete)
+    event.listen(_model, 'after_update', _on_update)
+
+
+@event.listens_for(User, 'after_insert')
+def create_user_stats(mapper, connection, target):
+    """Нулевые счётчики нового пользователя (его записи вставляются после него)"""
+    connection.execute(insert(UserStats.__table__).values(
+        user_id=target.id, open_queue_count=0, open_tasks_count=0, files_count=0,
+        updated_at=datetime.utcnow()
+    ))
+
+
+@event.listens_for(User, 'after_delete')
+def delete_user_stats(mapper, connection, target):
+    """Удаление счётчиков вместе с пользователем (его записи удаляются раньше него)"""
+    connection.execute(delete(UserStats.__table__).where(UserStats.__table__.c.user_id == target.id))
+
+
+def actual_counts_query():
+    """Счётчики, посчитанные по таблицам: (user_id, open_queue_count, open_tasks_count, files_count)"""
+    queue_counts = (
+        select(QueueEntry.user_id, func.count().label('count'))
+        .where(QueueEntry.has_answered.is_(False))
+        .group_by(QueueEntry.user_id)
+        .subquery()
+    )
+    task_counts = (
+        select(Task.user_id, func.count().label('count'))
+        .where(Task.completed.is_(False))
+        .group_by(Task.user_id)
+        .subquery()
+    )
+    file_counts = select(File.user_id, func.count().label('count')).group_by(File.user_id).subquery()
+    return (
+        select(
+            User.id.label('user_id'),
+            func.coalesce(queue_counts.c.count, 0).label('open_queue_count'),
+            func.coalesce(task_counts.c.count, 0).label('open_tasks_count'),
+            func.coalesce(file_counts.c.count, 0).label('files_count')
+        )
+        .outerjoin(queue_counts, queue_counts.c.user_id == User.id)
+        .outerjoin(task_counts, task_counts.c.user_id == User.id)
+        .outerjoin(file_counts, file_counts.c.user_id == User.id)
+    )
+
+
+def reconcile_user_stats(dry_run=False):
+    """Пересчёт расходящихся счётчиков одним проходом; возвращает {'fixed', 'created', 'deleted'}"""
+    actual = actual_counts_query().subquery()
+    stats = UserStats.__table__
+    counters = list(COUNTERS)
+    drifted = db.session.execute(
+        select(actual, stats.c.user_id.label('stats_user_id'))
+        .outerjoin(stats, stats.c.user_id == actual.c.user_id)
+        .where(or_(stats.c.user_id.is_(None), *(stats.c[name] != actual.c[name] for name in counters)))
+    ).all()
+    missing = [row for row in drifted if row.stats_user_id is None]
+    changed = [row for row in drifted if row.stats_user_id is not None]
+    orphaned = ~select(User.id).where(User.id == stats.c.user_id).exists()
+    result = {
+        'fixed': len(changed),
+        'created': len(missing),
+        'deleted': db.session.scalar(select(func.count()).select_from(stats).where(orphaned))
+    }
+    if dry_run:
+        return result
+
+    now = datetime.utcnow()
+    if missing:
+        db.session.execute(insert(stats), [
+            dict({name: getattr(row, name) for name in counters}, user_id=row.user_id, updated_at=now)
+            for row in missing
+        ])
+    if changed:
+        # Один executemany UPDATE: значения берутся из пересчёта
+        db.session.execute(
+            update(stats).where(stats.c.user_id == bindparam('b_user_id')),
+            [
+                dict({name: getattr(row, name) for name in counters}, b_user_id=row.user_id, updated_at=now)
+                for row in changed
+            ]
+        )
+    if result['deleted']:
+        db.session.execute(delete(stats).where(orphaned))
+    db.session.commit()
+    return result
+
+
+def get_user_stats(user_id):
+    """Счётчики пользователя одним чтением по первичному ключу (нули, если строки нет)"""
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        return {name: 0 for name in COUNTERS}
+    return {name: getattr(stats, name) for name in COUNTERS}
+
+
+@stats_cli.command('reconcile')
+@click.option('--dry-run', is_flag=True, help='Только показать расхождения')
+def reconcile_command(dry_run):
+    """Пересчёт счётчиков пользователей, разошедшихся с таблицами"""
+    result = reconcile_user_stats(dry_run=dry_run)
+    prefix = 'Would fix' if dry_run else 'Fixed'
+    click.echo(f"{prefix} {result['fixed']} rows, created {result['created']}, deleted {result['deleted']}")
@@ -0,0 +1 @@
+"""Бенчмарки производительности (запускаются вручную, в pytest не входят)"""
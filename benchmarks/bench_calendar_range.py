@@ -0,0 +1,129 @@
+"""
+Бенчмарк выборки событий по диапазону на длинной истории (100 000 событий)
+
+Сравнивает прежний запрос /calendar/events/cached (start_time < end AND
+end_time > start при индексе только по start_time) с ограниченным просмотром
+составного индекса (start_time, end_time) и нижней границей start_time из
+CALENDAR_MAX_EVENT_HOURS. Для недели в начале, середине и конце истории
+выводится среднее время запроса и план SQLite. Используется временная SQLite
+база на диске.
+
+Использование:
+    python -m benchmarks.bench_calendar_range [--events 100000] [--repeat 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Занятия по расписанию: 6 пар в день начиная с 9:00
+LESSON_STARTS = [timedelta(hours=9), timedelta(hours=10, minutes=35), timedelta(hours=12, minutes=25),
+                 timedelta(hours=14), timedelta(hours=15, minutes=50), timedelta(hours=17, minutes=25)]
+
+
+def generate_rows(count, first_day):
+    """Синтетическая история: по 6 занятий в день, начиная с first_day"""
+    rows = []
+    now = datetime.utcnow()
+    for number in range(count):
+        day, lesson = divmod(number, len(LESSON_STARTS))
+        start = first_day + timedelta(days=day) + LESSON_STARTS[lesson]
+        rows.append({
+            'source': 'default',
+            'event_id': f'event-{number}',
+            'title': f'Занятие {number % 40} (ПЗ)',
+            'start_time': start,
+            'end_time': start + timedelta(minutes=80),
+            'updated_at': now
+        })
+    return rows
+
+
+def measure(query, repeat):
+    """Среднее время выполнения запроса (мс) и число строк"""
+    from app import db
+
+    count = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        count = len(db.session.execute(query).all())
+    return (time.perf_counter() - started) * 1000 / repeat, count
+
+
+def plan(query):
+    from sqlalchemy import text
+    from app import db
+
+    compiled = query.compile(db.engine, compile_kwargs={'literal_binds': True})
+    return '; '.join(row[-1] for row in db.session.execute(text(f'EXPLAIN QUERY PLAN {compiled}')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from sqlalchemy import select, insert, text
+    from app import create_app, db
+    from app.calendar_routes import overlaps_range
+    from app.models import CalendarEvent
+
+    app = create_app('development')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+
+    days = args.events // len(LESSON_STARTS) + 1
+    first_day = datetime(2025, 9, 1) - timedelta(days=days - 60)
+    ranges = {
+        'начало истории': first_day + timedelta(days=7),
+        'середина': first_day + timedelta(days=days // 2),
+        'текущая неделя': first_day + timedelta(days=days - 60),
+    }
+
+    with app.app_context():
+        db.create_all()
+        rows = generate_rows(args.events, first_day)
+        for chunk in range(0, len(rows), 10000):
+            db.session.execute(insert(CalendarEvent), rows[chunk:chunk + 10000])
+        db.session.commit()
+        print(f"Событий: {args.events}, история с {first_day.date()} ({days} дней)")
+
+        def legacy(start, end):
+            return select(CalendarEvent).where(
+                CalendarEvent.start_time < end, CalendarEvent.end_time > start
+            ).order_by(CalendarEvent.start_time)
+
+        def bounded(start, end):
+            return select(CalendarEvent).where(overlaps_range(start, end)).order_by(CalendarEvent.start_time)
+
+        for name, indexes, build in (
+            ('legacy (индекс start_time)',
+             'CREATE INDEX ix_calendar_events_start_time ON calendar_events (start_time)', legacy),
+            ('bounded (start_time, end_time)',
+             'CREATE INDEX idx_calendar_events_start_end ON calendar_events (start_time, end_time)', bounded),
+        ):
+            db.session.execute(text('DROP INDEX IF EXISTS idx_calendar_events_start_end'))
+            db.session.execute(text('DROP INDEX IF EXISTS ix_calendar_events_start_time'))
+            db.session.execute(text(indexes))
+            db.session.execute(text('ANALYZE'))
+            db.session.commit()
+
+            print(f"\n{name}")
+            for label, start in ranges.items():
+                query = build(start, start + timedelta(days=7))
+                elapsed, count = measure(query, args.repeat)
+                print(f"  {label:16s} {elapsed:8.2f} мс, событий: {count}")
+            print(f"  план: {plan(build(ranges['текущая неделя'], ranges['текущая неделя'] + timedelta(days=7)))}")
+
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
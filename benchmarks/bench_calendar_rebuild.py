@@ -0,0 +1,130 @@
+"""
+Бенчмарк принудительной пересборки кэша календаря под нагрузкой чтения
+
+Сравнивает прежний force_refresh (удаление всех событий с commit и повторная
+загрузка) с пересборкой через staging-таблицу. Пока идёт пересборка, отдельный
+поток читает расписание на 30 дней, как fetch_events_from_google. Выводится
+время пересборки, время замены, число пустых ответов читателю, длительность
+периода без расписания и максимальная задержка чтения. Используется временная
+SQLite база на диске и feed из файла (file:// URL).
+
+Использование:
+    python -m benchmarks.bench_calendar_rebuild [--events 5000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ics_fixture import write_ics
+
+
+class Reader(threading.Thread):
+    """Поток, непрерывно читающий расписание и замеряющий задержку и пустые ответы"""
+
+    def __init__(self, app):
+        super().__init__(daemon=True)
+        self.app = app
+        self.stop = threading.Event()
+        self.reads = 0
+        self.empty_reads = 0
+        self.first_empty = None
+        self.last_empty = None
+        self.max_latency = 0.0
+
+    def run(self):
+        from app.models import CalendarEvent
+        from app.calendar_routes import LOCAL_TIMEZONE_OFFSET
+
+        with self.app.app_context():
+            from app import db
+            while not self.stop.is_set():
+                now = datetime.utcnow() + LOCAL_TIMEZONE_OFFSET
+                started = time.perf_counter()
+                count = CalendarEvent.query.filter(
+                    CalendarEvent.start_time >= now,
+                    CalendarEvent.start_time <= now + timedelta(days=30)
+                ).count()
+                db.session.rollback()
+                finished = time.perf_counter()
+                self.reads += 1
+                self.max_latency = max(self.max_latency, finished - started)
+                if not count:
+                    self.empty_reads += 1
+                    self.first_empty = self.first_empty or started
+                    self.last_empty = finished
+                time.sleep(0.001)
+
+    @property
+    def empty_window(self):
+        if self.first_empty is None:
+            return 0.0
+        return self.last_empty - self.first_empty
+
+
+def legacy_force_refresh():
+    """Прежний алгоритм: удалить все события, сохранить и загрузить feed заново"""
+    from app import db
+    from app.models import CalendarEvent
+    from app.calendar_routes import sync_calendar_cache
+
+    CalendarEvent.query.delete()
+    db.session.commit()
+    return sync_calendar_cache(force=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=5000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    db_path = os.path.join(directory, 'bench.db')
+    feed_path = os.path.join(directory, 'feed.ics')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from app import create_app, db
+    from app.calendar_routes import sync_calendar_cache
+
+    app = create_app('development')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['GOOGLE_CALENDAR_ID'] = 'bench'
+    app.config['CALENDAR_ICAL_URL'] = f'file://{feed_path}'
+
+    size = write_ics(feed_path, args.events)
+    print(f"Feed: {size / 1024:.0f} KB, событий: {args.events}")
+
+    with app.app_context():
+        db.create_all()
+        for name, run in (
+            ('delete-all + загрузка', legacy_force_refresh),
+            ('staging + замена', lambda: sync_calendar_cache(force=True)),
+        ):
+            sync_calendar_cache(force=True)
+
+            reader = Reader(app)
+            reader.start()
+            time.sleep(0.05)
+            started = time.perf_counter()
+            result = run()
+            total = time.perf_counter() - started
+            time.sleep(0.05)
+            reader.stop.set()
+            reader.join()
+
+            print(f"{name:24s} всего: {total * 1000:7.1f} мс "
+                  f"(пересборка {result.rebuild_ms} мс, замена {result.swap_ms} мс); "
+                  f"чтений: {reader.reads}, пустых: {reader.empty_reads}, "
+                  f"без расписания: {reader.empty_window * 1000:7.1f} мс, "
+                  f"макс. задержка чтения: {reader.max_latency * 1000:6.1f} мс")
+
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
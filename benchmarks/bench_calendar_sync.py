@@ -0,0 +1,89 @@
+"""
+Бенчмарк синхронизации кэша календаря на синтетическом feed из 5000 событий
+
+Сравнивает построчный upsert (SELECT на каждый VEVENT) с diff-синхронизацией
+из app.calendar_sync. Используется временная SQLite база на диске.
+
+Использование:
+    python -m benchmarks.bench_calendar_sync [--events 5000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ics_fixture import generate_ics
+
+
+def legacy_upsert(records):
+    """Прежний алгоритм: отдельный SELECT на каждое событие"""
+    from app import db
+    from app.models import CalendarEvent
+
+    for record in records:
+        existing = CalendarEvent.query.filter_by(event_id=record['event_id']).first()
+        if existing:
+            existing.title = record['title']
+            existing.start_time = record['start_time']
+            existing.end_time = record['end_time']
+            existing.description = record['description']
+            existing.location = record['location']
+            existing.updated_at = datetime.utcnow()
+        else:
+            db.session.add(CalendarEvent(**record))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=5000)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from app import create_app, db
+    from app.calendar_routes import parse_ical_events, LOCAL_TIMEZONE_OFFSET
+    from app.calendar_sync import sync_calendar_events
+    from app.models import CalendarEvent
+
+    app = create_app('development')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+
+    data = generate_ics(args.events)
+    window_start = datetime.utcnow() + LOCAL_TIMEZONE_OFFSET
+    window_end = window_start + timedelta(days=60)
+
+    with app.app_context():
+        db.create_all()
+        records = parse_ical_events(data, window_start, window_end)
+        print(f"Feed: {len(data) / 1024:.0f} KB, событий в окне: {len(records)}")
+
+        for name, run in (
+            ('legacy (SELECT на событие)', lambda: legacy_upsert(records)),
+            ('diff + bulk', lambda: sync_calendar_events(records, window_start, window_end)),
+        ):
+            CalendarEvent.query.delete()
+            db.session.commit()
+
+            started = time.perf_counter()
+            run()
+            first_sync = time.perf_counter() - started
+
+            started = time.perf_counter()
+            result = run()
+            repeat_sync = time.perf_counter() - started
+
+            print(f"{name:28s} первая синхронизация: {first_sync * 1000:8.1f} мс, "
+                  f"повторная: {repeat_sync * 1000:8.1f} мс"
+                  + (f"  [{result}]" if result else ''))
+
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
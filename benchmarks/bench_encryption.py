@@ -0,0 +1,61 @@
+"""
+Бенчмарк расшифровки ФИО: стоимость одного вызова decrypt_data
+
+Сравнивает прежний путь (чтение конфигурации, вывод ключа из SECRET_KEY и новый
+Fernet на каждый вызов) с шифром из реестра приложения. Замеры для ключа из
+ENCRYPTION_KEY и для ключа, выводимого из SECRET_KEY.
+
+Использование:
+    python -m benchmarks.bench_encryption [--calls 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def legacy_decrypt(encrypted_data):
+    """Прежний decrypt_data: ключ и Fernet на каждый вызов"""
+    from cryptography.fernet import Fernet
+    from app.encryption import get_encryption_key
+
+    fernet = Fernet(get_encryption_key())
+    return fernet.decrypt(encrypted_data.encode('utf-8')).decode('utf-8')
+
+
+def measure(func, value, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        func(value)
+    return (time.perf_counter() - started) * 1e6 / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=20000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+    from cryptography.fernet import Fernet
+    from app import create_app
+    from app.encryption import encrypt_data, decrypt_data
+
+    app = create_app('development')
+    for label, key in (
+        ('ENCRYPTION_KEY', Fernet.generate_key().decode('utf-8')),
+        ('ключ из SECRET_KEY', None),
+    ):
+        app.config['ENCRYPTION_KEY'] = key
+        with app.app_context():
+            value = encrypt_data('Иванов Иван Иванович')
+            assert legacy_decrypt(value) == decrypt_data(value)
+            legacy = measure(legacy_decrypt, value, args.calls)
+            cached = measure(decrypt_data, value, args.calls)
+        print(f"{label:20s} прежний: {legacy:6.1f} мкс/вызов, реестр: {cached:6.1f} мкс/вызов "
+              f"(x{legacy / cached:.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Бенчмарк разбора iCal: icalendar.Calendar.from_ical против потокового парсера
+
+Feed содержит несколько лет истории, из которых в 60-дневное окно попадает
+малая часть. Измеряются время разбора и пиковое потребление памяти (tracemalloc).
+
+Использование:
+    python -m benchmarks.bench_ical_parse [--events 20000] [--history-days 1095]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ics_fixture import write_ics
+
+
+def parse_from_ical(path, window_start, window_end, local_offset):
+    """Прежний путь: полное дерево компонентов и обход cal.walk()"""
+    import icalendar
+
+    with open(path, 'rb') as f:
+        cal = icalendar.Calendar.from_ical(f.read())
+
+    records = []
+    for component in cal.walk():
+        if component.name != 'VEVENT':
+            continue
+        dtstart = component.get('DTSTART')
+        dtend = component.get('DTEND')
+        if not dtstart or not dtend:
+            continue
+        start_time = dtstart.dt.astimezone(timezone.utc).replace(tzinfo=None) + local_offset
+        end_time = dtend.dt.astimezone(timezone.utc).replace(tzinfo=None) + local_offset
+        if end_time < window_start or start_time > window_end:
+            continue
+        records.append({
+            'event_id': str(component.get('UID')),
+            'title': str(component.get('SUMMARY', 'Без названия')),
+            'description': str(component.get('DESCRIPTION', '')),
+            'location': str(component.get('LOCATION', '')),
+            'start_time': start_time,
+            'end_time': end_time,
+        })
+    return records
+
+
+def parse_streaming(path, window_start, window_end, local_offset):
+    """Новый путь: построчный разбор из файла"""
+    from app.calendar_routes import parse_ical_events
+
+    with open(path, 'rb') as f:
+        return parse_ical_events(f, window_start, window_end)
+
+
+def measure(func, *args):
+    """Время без tracemalloc (он сильно замедляет код) и пик памяти отдельным прогоном"""
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--history-days', type=int, default=3 * 365)
+    args = parser.parse_args()
+
+    from app.calendar_routes import LOCAL_TIMEZONE_OFFSET
+
+    path = os.path.join(tempfile.mkdtemp(), 'history.ics')
+    size = write_ics(path, args.events, history_days=args.history_days)
+    window_start = datetime.utcnow() + LOCAL_TIMEZONE_OFFSET
+    window_end = window_start + timedelta(days=60)
+    print(f"Feed: {size / 1024 / 1024:.1f} MB, событий: {args.events}, истории: {args.history_days} дн.")
+
+    results = {}
+    for name, func in (('from_ical + walk', parse_from_ical), ('потоковый парсер', parse_streaming)):
+        records, elapsed, peak = measure(func, path, window_start, window_end, LOCAL_TIMEZONE_OFFSET)
+        results[name] = records
+        print(f"{name:18s} время: {elapsed * 1000:9.1f} мс, пик памяти: {peak / 1024 / 1024:7.1f} MB, "
+              f"событий в окне: {len(records)}")
+
+    ids = [sorted(r['event_id'] for r in records) for records in results.values()]
+    print("Наборы событий совпадают" if ids[0] == ids[1] else "ВНИМАНИЕ: наборы событий различаются")
+    os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
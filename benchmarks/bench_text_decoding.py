@@ -0,0 +1,186 @@
+"""
+Бенчмарк декодирования текстовых полей: прежний safe_decode против FeedDecoder
+
+Поля берутся из сгенерированного feed (кириллические названия, описания и аудитории),
+часть полей искусственно испорчена (UTF-8, прочитанный как latin-1 или cp1251).
+safe_decode получает значения так же, как раньше из Calendar.from_ical (vText),
+FeedDecoder - сырые байты из потокового парсера. Отдельно показан нижний предел:
+один bytes.decode без проверок.
+
+Использование:
+    python -m benchmarks.bench_text_decoding [--events 20000] [--mojibake-share 0.05]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ics_fixture import generate_ics
+
+
+def legacy_safe_decode(value, default='', params=None):
+    """Прежний safe_decode без изменений: каскад попыток декодирования на каждое поле"""
+    if value is None:
+        return default
+    
+    # Проверяем параметр CHARSET из iCal, если есть
+    charset = 'utf-8'  # По умолчанию UTF-8
+    if params and 'CHARSET' in params:
+        charset = params['CHARSET'].lower()
+    
+    # Пробуем разные методы получения значения
+    # 1. Если это bytes, декодируем напрямую
+    if isinstance(value, bytes):
+        try:
+            return value.decode(charset)
+        except (UnicodeDecodeError, LookupError):
+            try:
+                return value.decode('utf-8')
+            except UnicodeDecodeError:
+                try:
+                    return value.decode('latin-1')
+                except:
+                    return value.decode('utf-8', errors='replace')
+    
+    # 2. Если это vText объект, используем to_ical()
+    if hasattr(value, 'to_ical'):
+        try:
+            ical_bytes = value.to_ical()
+            if isinstance(ical_bytes, bytes):
+                # Пробуем декодировать с указанным charset или UTF-8
+                try:
+                    decoded = ical_bytes.decode(charset)
+                    return decoded
+                except (UnicodeDecodeError, LookupError):
+                    # Если указанный charset не работает, пробуем UTF-8
+                    try:
+                        decoded = ical_bytes.decode('utf-8')
+                        return decoded
+                    except UnicodeDecodeError:
+                        # Если UTF-8 не работает, пробуем latin-1 (часто используется в старых iCal)
+                        try:
+                            decoded = ical_bytes.decode('latin-1')
+                            return decoded
+                        except:
+                            # В крайнем случае используем replace для замены нечитаемых символов
+                            decoded = ical_bytes.decode('utf-8', errors='replace')
+                            return decoded
+            else:
+                # Это уже строка
+                return str(ical_bytes)
+        except (AttributeError, TypeError):
+            pass
+    
+    # 3. Если это уже строка, но может содержать неправильную кодировку
+    # Пробуем перекодировать через latin-1 -> utf-8 (частая проблема)
+    if isinstance(value, str):
+        # Проверяем, не является ли это неправильно декодированной UTF-8 строкой
+        # Это происходит, когда UTF-8 байты были декодированы как latin-1 или cp1252
+        try:
+            # Если строка содержит символы, которые выглядят как неправильно декодированные
+            # (например, последовательности типа "????" или странные символы)
+            if any(ord(c) > 127 for c in value):
+                # Пробуем исправить через latin-1 -> utf-8
+                # Это работает, если UTF-8 был декодирован как latin-1
+                try:
+                    fixed = value.encode('latin-1').decode('utf-8')
+                    # Проверяем, что исправление дало результат (нет замененных символов)
+                    if '\ufffd' not in fixed and '?' not in fixed[:10]:
+                        return fixed
+                except (UnicodeEncodeError, UnicodeDecodeError):
+                    pass
+                
+                # Пробуем исправить через cp1252 -> utf-8 (Windows кодировка)
+                try:
+                    fixed = value.encode('cp1252').decode('utf-8')
+                    if '\ufffd' not in fixed and '?' not in fixed[:10]:
+                        return fixed
+                except (UnicodeEncodeError, UnicodeDecodeError):
+                    pass
+                
+                # Пробуем исправить через cp1251 -> utf-8 (кириллица в Windows)
+                try:
+                    fixed = value.encode('cp1251').decode('utf-8')
+                    if '\ufffd' not in fixed and '?' not in fixed[:10]:
+                        return fixed
+                except (UnicodeEncodeError, UnicodeDecodeError):
+                    pass
+        except:
+            pass
+        return value
+    
+    # 5. В крайнем случае используем str()
+    try:
+        return str(value)
+    except:
+        return default
+
+
+def collect_fields(events_count, mojibake_share):
+    """Сырые значения SUMMARY/DESCRIPTION/LOCATION из feed"""
+    from app.ical_stream import unfold_lines, parse_content_line
+
+    rng = random.Random(42)
+    fields = []
+    for line in unfold_lines(io.BytesIO(generate_ics(events_count))):
+        name, params, value = parse_content_line(line)
+        if name not in (b'SUMMARY', b'DESCRIPTION', b'LOCATION'):
+            continue
+        if not value.isascii() and rng.random() < mojibake_share:
+            # UTF-8 текст, однажды прочитанный в однобайтовой кодировке и сохранённый снова
+            encoding = rng.choice(('latin-1', 'cp1251'))
+            value = value.decode('utf-8').encode('utf-8').decode(encoding, errors='ignore').encode('utf-8')
+        fields.append((value, params))
+    return fields
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--mojibake-share', type=float, default=0.05)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from app.text_decoding import FeedDecoder
+
+    fields = collect_fields(args.events, args.mojibake_share)
+    print(f"Полей: {len(fields)}, доля испорченных: {args.mojibake_share:.0%}")
+
+    from icalendar import vText
+
+    # Значения в том виде, в котором их отдавал Calendar.from_ical
+    ical_values = [(vText(value.decode('utf-8')), params) for value, params in fields]
+
+    def run_plain():
+        return [value.decode('utf-8') for value, params in fields]
+
+    def run_legacy():
+        return [legacy_safe_decode(value, '', params) for value, params in ical_values]
+
+    def run_decoder():
+        decoder = FeedDecoder()
+        return [decoder(value, params) for value, params in fields], decoder
+
+    timings = {}
+    for name, func in (('bytes.decode', run_plain), ('safe_decode', run_legacy), ('FeedDecoder', run_decoder)):
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = (best, result)
+        print(f"{name:12s} лучшее время: {best * 1000:8.1f} мс, {best / len(fields) * 1e6:6.2f} мкс/поле")
+
+    _, (decoded, decoder) = timings['FeedDecoder']
+    plain = timings['bytes.decode'][1]
+    print(f"Исправлено mojibake: {decoder.repaired}, "
+          f"полей, отличающихся от простого decode: {sum(1 for a, b in zip(plain, decoded) if a != b)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Бенчмарк приёма загрузки: разбор multipart и сохранение файла
+
+Сравнивает прежний путь (Werkzeug пишет файл во временный файл, затем
+file.save() копирует его в каталог загрузок, размер - os.path.getsize, сумма -
+отдельное чтение) с UploadRequest, который пишет файл прямо в каталог загрузок
+и считает SHA-256 и размер в том же проходе.
+
+Использование:
+    python -m benchmarks.bench_upload [--size-mb 16] [--runs 5]
+"""
+import argparse
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size-mb', type=int, default=16)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+    from flask import Flask, Request, request
+    from app.file_storage import UploadRequest, get_upload_folder, store_upload
+
+    folder = tempfile.mkdtemp()
+    content = os.urandom(args.size_mb * 1024 * 1024)
+
+    def legacy_view():
+        file = request.files['file']
+        path = os.path.join(get_upload_folder(), 'legacy.bin')
+        file.save(path)
+        size = os.path.getsize(path)
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                digest.update(chunk)
+        return f'{size} {digest.hexdigest()}'
+
+    def streaming_view():
+        size, sha256 = store_upload(request.files['file'], os.path.join(get_upload_folder(), 'streamed.bin'))
+        return f'{size} {sha256}'
+
+    results = {}
+    for label, request_class, view in (
+        ('file.save + getsize + чтение для суммы', Request, legacy_view),
+        ('UploadRequest (один проход)', UploadRequest, streaming_view),
+    ):
+        app = Flask(__name__)
+        app.config['UPLOAD_FOLDER'] = folder
+        app.config['MAX_CONTENT_LENGTH'] = None
+        app.request_class = request_class
+        app.add_url_rule('/upload', 'upload', view, methods=['POST'])
+        client = app.test_client()
+
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            response = client.post('/upload', data={'file': (io.BytesIO(content), 'scan.pdf')})
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 200
+        results[label] = response.get_data(as_text=True)
+        print(f"{label:40s} {min(timings) * 1000:8.1f} ms (лучший из {args.runs})")
+
+    assert len(set(results.values())) == 1
+    shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Генерация синтетических iCal feed для бенчмарков синхронизации календаря"""
+from datetime import datetime, timedelta
+
+SUBJECTS = [
+    'История Беларуси (ПЗ)',
+    'История Беларуси (ЛК)',
+    'Основы алгоритмизации и программирования (ЛР)',
+    'Основы алгоритмизации и программирования (ЛК)',
+    'Математический анализ (ПЗ)',
+    'Физика (ЛР)',
+    'Английский язык (ПЗ)',
+    'Линейная алгебра и аналитическая геометрия (ЛК)',
+]
+
+ROOMS = ['101-1', '215-4', '402-5', '114а-2', '608-4']
+
+
+def _fold(line):
+    """Перенос длинных строк по RFC 5545 (75 октетов)"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        chunk = data[:limit]
+        # Не разрываем многобайтовый символ UTF-8
+        while chunk and (data[len(chunk):len(chunk) + 1] or b'\x00')[0] & 0xC0 == 0x80:
+            chunk = chunk[:-1]
+        parts.append(chunk.decode('utf-8'))
+        data = data[len(chunk):]
+    return '\r\n '.join(parts)
+
+
+def generate_ics(events_count=5000, start=None, history_days=0, step_minutes=None):
+    """Календарь из events_count событий, начиная за history_days дней до start (UTC)
+
+    События равномерно распределяются по 60-дневному окну кэширования, если
+    step_minutes не задан; с history_days часть событий оказывается в прошлом.
+    """
+    if start is None:
+        start = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    first = start - timedelta(days=history_days)
+    span_minutes = (60 + history_days) * 24 * 60
+    if step_minutes is None:
+        step_minutes = max(1, span_minutes // max(events_count, 1))
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'PRODID:-//Google Inc//Google Calendar 70.9054//EN',
+        'VERSION:2.0',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:561401',
+        'X-WR-TIMEZONE:Europe/Minsk',
+    ]
+    for index in range(events_count):
+        event_start = first + timedelta(minutes=step_minutes * index)
+        event_end = event_start + timedelta(minutes=80)
+        subject = SUBJECTS[index % len(SUBJECTS)]
+        lines.extend([
+            'BEGIN:VEVENT',
+            f"DTSTART:{event_start.strftime('%Y%m%dT%H%M%SZ')}",
+            f"DTEND:{event_end.strftime('%Y%m%dT%H%M%SZ')}",
+            f"DTSTAMP:{start.strftime('%Y%m%dT%H%M%SZ')}",
+            f"UID:bench-{index:06d}@google.com",
+            _fold(f"DESCRIPTION:Преподаватель: Иванов И.И.\\nПодгруппа: {index % 2 + 1}\\nЗанятие №{index}"),
+            _fold(f"LOCATION:{ROOMS[index % len(ROOMS)]}"),
+            'SEQUENCE:0',
+            'STATUS:CONFIRMED',
+            _fold(f"SUMMARY:{subject}"),
+            'TRANSP:OPAQUE',
+            'END:VEVENT',
+        ])
+    lines.append('END:VCALENDAR')
+    return ('\r\n'.join(lines) + '\r\n').encode('utf-8')
+
+
+def write_ics(path, *args, **kwargs):
+    """Запись синтетического календаря в файл"""
+    data = generate_ics(*args, **kwargs)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
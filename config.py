@@ -21,6 +21,22 @@ class Config:
     # Ключ шифрования для персональных данных (ФИО)
     # Если не указан, будет автоматически сгенерирован из SECRET_KEY в encryption.py
     ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY')
+    # Прежние ключи (или прежние SECRET_KEY) через запятую: ими данные только расшифровываются,
+    # пока flask encryption rotate не перешифрует их текущим ключом
+    ENCRYPTION_OLD_KEYS = os.environ.get('ENCRYPTION_OLD_KEYS', '')
+    # Ключ HMAC слепого индекса для поиска по ФИО (по умолчанию выводится из SECRET_KEY)
+    # и минимальная длина префикса слова, по которому ищет админ-панель
+    BLIND_INDEX_KEY = os.environ.get('BLIND_INDEX_KEY')
+    BLIND_INDEX_MIN_PREFIX = int(os.environ.get('BLIND_INDEX_MIN_PREFIX', 2))
+    
+    # Пользователей на странице админ-панели (параметр per_page - не больше 200)
+    ADMIN_USERS_PER_PAGE = int(os.environ.get('ADMIN_USERS_PER_PAGE', 50))
+    
+    # Кэш расшифрованных ФИО в памяти процесса (по умолчанию выключен): размер и время
+    # жизни записи в секундах. Счётчики попаданий - /admin/pii_cache
+    PII_CACHE_ENABLED = os.environ.get('PII_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    PII_CACHE_SIZE = int(os.environ.get('PII_CACHE_SIZE', 512))
+    PII_CACHE_TTL_SECONDS = int(os.environ.get('PII_CACHE_TTL_SECONDS', 300))
     
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///bsuir_diary.db'
@@ -32,6 +48,68 @@ class Config:
     GOOGLE_CALENDAR_ID = os.environ.get('GOOGLE_CALENDAR_ID') or \
         '7101b214c03700a0d4044eda7f8082c3fda8d10e80cf66f718274c85b88c375a@group.calendar.google.com'
     
+    # Переопределение URL iCal feed (например, для зеркала или тестового сервера)
+    CALENDAR_ICAL_URL = os.environ.get('CALENDAR_ICAL_URL')
+    # Через сколько часов сдвига окна кэширования делать безусловную загрузку feed
+    CALENDAR_WINDOW_SLACK_HOURS = int(os.environ.get('CALENDAR_WINDOW_SLACK_HOURS', 24))
+    # Дополнительные календари групп и подгрупп: "имя=calendar_id_или_url,имя2=..."
+    # (GOOGLE_CALENDAR_ID синхронизируется как источник "default")
+    CALENDAR_SOURCES = os.environ.get('CALENDAR_SOURCES', '')
+    # Сколько feed загружать одновременно и таймаут загрузки одного feed (секунды)
+    CALENDAR_SYNC_MAX_WORKERS = int(os.environ.get('CALENDAR_SYNC_MAX_WORKERS', 4))
+    CALENDAR_FETCH_TIMEOUT = int(os.environ.get('CALENDAR_FETCH_TIMEOUT', 15))
+    # Сколько ошибок подряд источник повторяет при каждой синхронизации, прежде чем
+    # перейти на backoff (SCHEDULER_RETRY_BASE_SECONDS ... SCHEDULER_MAX_BACKOFF_SECONDS)
+    CALENDAR_SOURCE_ERROR_BUDGET = int(os.environ.get('CALENDAR_SOURCE_ERROR_BUDGET', 3))
+    # Сколько готовых JSON-ответов /calendar/events/cached хранить в памяти процесса
+    CALENDAR_RESPONSE_CACHE_SIZE = int(os.environ.get('CALENDAR_RESPONSE_CACHE_SIZE', 128))
+    # Как часто процесс проверяет, не изменился ли кэш календаря, для индекса расписания (секунды)
+    CALENDAR_INDEX_CHECK_SECONDS = float(os.environ.get('CALENDAR_INDEX_CHECK_SECONDS', 5))
+    # Наибольшая длительность события (часы): нижняя граница выборки событий по диапазону.
+    # Более длинные события при синхронизации попадают в лог и могут не показываться
+    CALENDAR_MAX_EVENT_HOURS = int(os.environ.get('CALENDAR_MAX_EVENT_HOURS', 168))
+    # Правила классификации событий (JSON {"значение": ["ключевое слово", ...]}); пусто - правила
+    # по умолчанию из app/subjects.py. После изменения: flask calendar reclassify
+    SUBJECT_RULES = os.environ.get('SUBJECT_RULES')
+    LESSON_TYPE_RULES = os.environ.get('LESSON_TYPE_RULES')
+    
+    # Фоновый планировщик (синхронизация календаря вне обработки запросов)
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    # Файл блокировки ведущего процесса для SQLite (по умолчанию instance/scheduler.lock)
+    SCHEDULER_LOCK_FILE = os.environ.get('SCHEDULER_LOCK_FILE')
+    # Как часто процессы проверяют, не пора ли стать ведущим или запустить задачу (секунды)
+    SCHEDULER_POLL_SECONDS = int(os.environ.get('SCHEDULER_POLL_SECONDS', 30))
+    # Backoff после ошибки: первая пауза и верхняя граница (секунды)
+    SCHEDULER_RETRY_BASE_SECONDS = int(os.environ.get('SCHEDULER_RETRY_BASE_SECONDS', 60))
+    SCHEDULER_MAX_BACKOFF_SECONDS = int(os.environ.get('SCHEDULER_MAX_BACKOFF_SECONDS', 3600))
+    # Интервал синхронизации календаря (секунды) и случайный разброс (доля интервала)
+    CALENDAR_SYNC_INTERVAL_SECONDS = int(os.environ.get('CALENDAR_SYNC_INTERVAL_SECONDS', 3600))
+    CALENDAR_SYNC_JITTER = float(os.environ.get('CALENDAR_SYNC_JITTER', 0.1))
+    # Stale-while-revalidate: при чтении кэша старше CALENDAR_STALE_SECONDS запускается одно
+    # фоновое обновление; пустой кэш ждёт его не дольше CALENDAR_REFRESH_WAIT_SECONDS
+    CALENDAR_REFRESH_ON_READ = os.environ.get('CALENDAR_REFRESH_ON_READ', 'true').lower() in ('1', 'true', 'yes')
+    CALENDAR_STALE_SECONDS = int(os.environ.get('CALENDAR_STALE_SECONDS', 7200))
+    CALENDAR_REFRESH_WAIT_SECONDS = float(os.environ.get('CALENDAR_REFRESH_WAIT_SECONDS', 5))
+    # Сколько ждать обновления, уже идущего в другом процессе (секунды)
+    CALENDAR_REFRESH_LOCK_TIMEOUT = int(os.environ.get('CALENDAR_REFRESH_LOCK_TIMEOUT', 120))
+    
+    # Живые обновления очереди. Поток SSE: true/false; не задано - включён только в асинхронных
+    # воркерах (gevent, eventlet), иначе страница раз в QUEUE_LIST_POLL_SECONDS опрашивает /queue/api/list
+    QUEUE_SSE_ENABLED = (
+        os.environ['QUEUE_SSE_ENABLED'].lower() in ('1', 'true', 'yes')
+        if os.environ.get('QUEUE_SSE_ENABLED') else None
+    )
+    QUEUE_LIST_POLL_SECONDS = int(os.environ.get('QUEUE_LIST_POLL_SECONDS', 10))
+    # SSE: как часто каждый процесс читает журнал изменений
+    # (секунды), сколько последних событий канала хранить для переподключения,
+    # интервал keepalive и сколько часов хранить журнал в БД
+    QUEUE_EVENTS_POLL_SECONDS = float(os.environ.get('QUEUE_EVENTS_POLL_SECONDS', 1))
+    QUEUE_EVENTS_BUFFER = int(os.environ.get('QUEUE_EVENTS_BUFFER', 256))
+    QUEUE_STREAM_HEARTBEAT_SECONDS = int(os.environ.get('QUEUE_STREAM_HEARTBEAT_SECONDS', 15))
+    QUEUE_EVENTS_RETENTION_HOURS = int(os.environ.get('QUEUE_EVENTS_RETENTION_HOURS', 24))
+    # Сколько секунд ждать событие, номер которого пропущен (его транзакция ещё не завершена)
+    QUEUE_EVENTS_GAP_SECONDS = float(os.environ.get('QUEUE_EVENTS_GAP_SECONDS', 30))
+    
     # Telegram Bot
     TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN')
     
@@ -41,6 +119,17 @@ class Config:
     # Upload settings
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB max file size
+    # Содержимое без ссылок удаляется не раньше, чем через столько секунд после последнего использования
+    BLOB_GC_GRACE_SECONDS = int(os.environ.get('BLOB_GC_GRACE_SECONDS', 3600))
+    BLOB_GC_INTERVAL_SECONDS = int(os.environ.get('BLOB_GC_INTERVAL_SECONDS', 24 * 3600))
+    # Загрузка по частям (/upload/sessions): часть ограничена MAX_CONTENT_LENGTH, файл целиком - этим лимитом
+    CHUNKED_UPLOAD_MAX_SIZE = int(os.environ.get('CHUNKED_UPLOAD_MAX_SIZE', 512 * 1024 * 1024))
+    CHUNKED_UPLOAD_EXPIRY_SECONDS = int(os.environ.get('CHUNKED_UPLOAD_EXPIRY_SECONDS', 24 * 3600))
+    CHUNKED_UPLOAD_CLEANUP_INTERVAL_SECONDS = int(os.environ.get('CHUNKED_UPLOAD_CLEANUP_INTERVAL_SECONDS', 3600))
+    # Отдача файлов: direct (Werkzeug, с Range), x-accel (nginx X-Accel-Redirect), x-sendfile (Apache, Passenger)
+    FILE_DELIVERY = os.environ.get('FILE_DELIVERY', 'direct')
+    # internal-location nginx, которому соответствует UPLOAD_FOLDER
+    X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX', '/protected-uploads/')
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx', 'txt', 'zip'}
 
 
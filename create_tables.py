@@ -12,7 +12,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app, db
 # Импортируем все модели для их регистрации
-from app.models import User, QueueEntry, CalendarEvent, Task, File
+from app.models import User, UserStats, UserNameTerm, QueueEntry, QueueEvent, KeyRotationState, CalendarEvent, CalendarEventStaging, CalendarSeries, CalendarSyncState, SchedulerJobState, Task, File, FileBlob
 
 def create_tables():
     """Создание всех таблиц в базе данных"""
@@ -27,9 +27,19 @@ def create_tables():
             print("\nСозданные таблицы:")
             print("  - users")
             print("  - queue_entries")
+            print("  - queue_events")
             print("  - calendar_events")
+            print("  - calendar_events_staging")
+            print("  - calendar_series")
+            print("  - calendar_sync_state")
+            print("  - scheduler_jobs")
+            print("  - key_rotations")
+            print("  - user_name_terms")
+            print("  - user_stats")
             print("  - tasks")
             print("  - files")
+            print("  - file_blobs")
+            print("  - upload_sessions")
             print("  - alembic_version")
         except Exception as e:
             print(f"✗ Ошибка при создании таблиц: {e}")
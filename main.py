@@ -82,20 +82,6 @@ def start_telegram_bot():
         traceback.print_exc()
 
 
-def update_calendar_periodically():
-    """Периодическое обновление календаря в фоне"""
-    import time
-    while True:
-        try:
-            time.sleep(3600)  # Обновление каждый час
-            with app.app_context():
-                from app.calendar_routes import update_calendar_cache
-                update_calendar_cache()
-        except Exception as e:
-            print(f"Error in calendar update thread: {e}")
-            time.sleep(60)  # При ошибке ждем минуту
-
-
 @app.before_request
 def before_request():
     """Выполняется перед каждым запросом"""
@@ -125,27 +111,17 @@ def before_request():
             print(f"Warning: Could not start Telegram bot: {e}", file=sys.stderr)
         app._telegram_bot_started = True
     
-    # Запуск фоновой задачи обновления календаря (один раз)
-    if not hasattr(app, '_calendar_update_started'):
-        calendar_thread = threading.Thread(target=update_calendar_periodically, daemon=True, name="CalendarUpdater")
-        calendar_thread.start()
-        
-        # Первоначальное обновление календаря
+    # Запуск фонового планировщика (один раз на процесс). Поток стартует в каждом
+    # воркере, но синхронизацию календаря выполняет только ведущий процесс;
+    # запрос не ждёт загрузки feed
+    if not hasattr(app, '_scheduler_started'):
         try:
-            with app.app_context():
-                from app.calendar_routes import update_calendar_cache
-                update_calendar_cache()
+            from app.scheduler import start_scheduler
+            start_scheduler(app)
         except Exception as e:
-            # Если таблицы еще не созданы, пропускаем обновление календаря
-            error_str = str(e)
-            if 'doesn\'t exist' in error_str or 'Table' in error_str or 'ProgrammingError' in error_str:
-                # Это ошибка отсутствия таблиц - это нормально
-                pass
-            else:
-                import sys
-                print(f"Warning: Could not update calendar: {e}", file=sys.stderr)
-        
-        app._calendar_update_started = True
+            import sys
+            print(f"Warning: Could not start scheduler: {e}", file=sys.stderr)
+        app._scheduler_started = True
 
 
 # WSGI entry point для production серверов (Passenger, Gunicorn и т.д.)
@@ -10,6 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import create_app, db
 from app.models import User, File, CalendarEvent
+from app.schedule_index import get_schedule_index
 
 # Глобальная переменная для хранения состояния загрузки файлов
 file_upload_states = {}
@@ -20,10 +21,22 @@ schedule_states = {}
 # Глобальная переменная для хранения Application бота (для отправки уведомлений)
 bot_application = None
 
+# Приложение Flask создаётся один раз на процесс бота: пул соединений с БД
+# и индекс расписания переиспользуются между обновлениями
+flask_app = None
+
+
+def get_flask_app():
+    """Приложение Flask для обработчиков бота (одно на процесс)"""
+    global flask_app
+    if flask_app is None:
+        flask_app = create_app()
+    return flask_app
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /start"""
-    app = create_app()
+    app = get_flask_app()
     with app.app_context():
         # Сохранение telegram_id пользователя
         telegram_id = str(update.effective_user.id)
@@ -67,7 +80,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def schedule_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /schedule - показать ближайшие занятия (только inline-кнопки с навигацией по дням)"""
-    app = create_app()
+    app = get_flask_app()
     with app.app_context():
         # Получение событий из кэша БД
         # Используем локальное время (UTC+3) для сравнения
@@ -75,17 +88,8 @@ async def schedule_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         now = datetime.utcnow() + LOCAL_TIMEZONE_OFFSET
         future = now + timedelta(days=14)  # Показываем на 2 недели вперед
         
-        events = CalendarEvent.query.filter(
-            CalendarEvent.start_time >= now,
-            CalendarEvent.start_time <= future
-        ).order_by(CalendarEvent.start_time).all()
-        
-        if not events:
-            await update.message.reply_text("Ближайшие занятия не найдены.")
-            return
-        
-        # Группировка событий по дням
-        events_by_day = group_events_by_day(events)
+        # События, сгруппированные по дням, из индекса расписания (без запроса к БД)
+        events_by_day = get_schedule_index(app).group_by_day(now, future)
         
         if not events_by_day:
             await update.message.reply_text("Ближайшие занятия не найдены.")
@@ -128,7 +132,7 @@ async def schedule_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def approve_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /approve <username> - подтверждение пользователя (только админ)"""
-    app = create_app()
+    app = get_flask_app()
     with app.app_context():
         # Проверка, является ли пользователь админом
         telegram_id = str(update.effective_user.id)
@@ -170,15 +174,18 @@ async def approve_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"Пользователь {username} успешно активирован!")
 
 
-def group_events_by_day(events):
-    """Группировка событий по дням"""
-    events_by_day = {}
-    for event in events:
-        day_key = event.start_time.date()
-        if day_key not in events_by_day:
-            events_by_day[day_key] = []
-        events_by_day[day_key].append(event)
-    return events_by_day
+def get_day_events(event_ids):
+    """События дня по сохранённым ID из индекса расписания (по возрастанию начала)
+
+    Должно вызываться в контексте приложения. События, исчезнувшие после
+    синхронизации, пропускаются.
+    """
+    from flask import current_app
+    index = get_schedule_index(current_app._get_current_object())
+    return sorted(
+        (event for event in map(index.get, event_ids) if event is not None),
+        key=lambda event: event.start_time
+    )
 
 
 def format_day_events_from_ids(events_by_day_serialized, day_index):
@@ -193,8 +200,7 @@ def format_day_events_from_ids(events_by_day_serialized, day_index):
     current_day_str = sorted_days[day_index]
     event_ids = events_by_day_serialized[current_day_str]
     
-    # Получение событий из БД (должно вызываться в контексте приложения)
-    day_events = CalendarEvent.query.filter(CalendarEvent.id.in_(event_ids)).all()
+    day_events = get_day_events(event_ids)
     
     if not day_events:
         return None, None, None
@@ -217,7 +223,7 @@ def format_day_events_from_ids(events_by_day_serialized, day_index):
     message = f"📅 {day_name_ru}, {day_date}\n\n"
     keyboard = []
     
-    for event in sorted(day_events, key=lambda x: x.start_time):
+    for event in day_events:
         start_str = event.start_time.strftime('%H:%M')
         message += f"• {start_str} - {event.title}\n"
         
@@ -241,8 +247,7 @@ def format_schedule_day(events_by_day_serialized, day_index):
     current_day_str = sorted_days[day_index]
     event_ids = events_by_day_serialized[current_day_str]
     
-    # Получение событий из БД (должно вызываться в контексте приложения)
-    day_events = CalendarEvent.query.filter(CalendarEvent.id.in_(event_ids)).all()
+    day_events = get_day_events(event_ids)
     
     if not day_events:
         return None, None, None
@@ -265,7 +270,7 @@ def format_schedule_day(events_by_day_serialized, day_index):
     message = f"📅 {day_name_ru}, {day_date}\n\nВыберите занятие:"
     keyboard = []
     
-    for event in sorted(day_events, key=lambda x: x.start_time):
+    for event in day_events:
         start_str = event.start_time.strftime('%H:%M')
         # Обрезаем название, если слишком длинное
         title = event.title[:35] + "..." if len(event.title) > 35 else event.title
@@ -279,7 +284,7 @@ def format_schedule_day(events_by_day_serialized, day_index):
 
 async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка загруженных файлов"""
-    app = create_app()
+    app = get_flask_app()
     with app.app_context():
         # Получение пользователя по telegram_id
         telegram_id = str(update.effective_user.id)
@@ -316,19 +321,8 @@ async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
         now = datetime.utcnow() + LOCAL_TIMEZONE_OFFSET
         future = now + timedelta(days=14)  # Показываем на 2 недели вперед
         
-        events = CalendarEvent.query.filter(
-            CalendarEvent.start_time >= now,
-            CalendarEvent.start_time <= future
-        ).order_by(CalendarEvent.start_time).all()
-        
-        if not events:
-            await update.message.reply_text(
-                "Ближайшие занятия не найдены. Файл не может быть загружен."
-            )
-            return
-        
-        # Группировка событий по дням (сохраняем только ID событий)
-        events_by_day = group_events_by_day(events)
+        # Группировка событий по дням из индекса расписания (сохраняем только ID событий)
+        events_by_day = get_schedule_index(app).group_by_day(now, future)
         
         if not events_by_day:
             await update.message.reply_text(
@@ -390,7 +384,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    app = create_app()
+    app = get_flask_app()
     with app.app_context():
         if query.data.startswith("select_event_"):
             # Выбор события для просмотра
@@ -432,25 +426,32 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 # Скачивание файла
                 file_obj = await context.bot.get_file(file_info['file_id'])
                 
-                # Сохранение файла
+                # Сохранение файла: скачивание во временный файл хранилища блобов,
+                # затем перенос по SHA-256 (тот же файл с сайта на диске не дублируется)
                 import os
-                upload_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
-                os.makedirs(upload_folder, exist_ok=True)
-                
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-                filename = timestamp + file_info['original_filename']
-                file_path = os.path.join(upload_folder, filename)
-                
-                await file_obj.download(file_path)
+                import tempfile
+                from app.blob_store import get_blob_store
+                from app.file_storage import TEMP_PREFIX, TEMP_SUFFIX
+                store = get_blob_store(app)
+                fd, file_path = tempfile.mkstemp(prefix=TEMP_PREFIX, suffix=TEMP_SUFFIX, dir=store.root)
+                os.close(fd)
+                try:
+                    await file_obj.download(file_path)
+                    blob = store.import_file(file_path)
+                finally:
+                    if os.path.exists(file_path):
+                        os.unlink(file_path)
                 
                 # Сохранение в БД
                 file_record = File(
                     user_id=file_info['user_id'],
                     calendar_event_id=event.id,
-                    filename=filename,
+                    filename=blob.relative_path,
                     original_filename=file_info['original_filename'],
                     file_type=file_info['file_type'],
-                    file_size=os.path.getsize(file_path)
+                    file_size=blob.size,
+                    sha256=blob.sha256,
+                    blob_sha256=blob.sha256
                 )
                 db.session.add(file_record)
                 db.session.commit()
@@ -20,12 +20,15 @@ def app():
     app.config['WTF_CSRF_ENABLED'] = False
     app.config['SECRET_KEY'] = 'test-secret-key'
     app.config['ENCRYPTION_KEY'] = 'test-encryption-key-for-testing-only'
+    # Без фоновой загрузки календаря из Google при чтении кэша
+    app.config['CALENDAR_REFRESH_ON_READ'] = False
     
     with app.app_context():
         db.create_all()
         yield app
-        db.drop_all()
+        # Сначала закрываем сессию: незавершённая транзакция теста блокирует DROP TABLE
         db.session.remove()
+        db.drop_all()
 
 
 @pytest.fixture
@@ -1,8 +1,9 @@
 """Тесты для админ-панели"""
 import os
 import pytest
+from sqlalchemy import event as sa_event
 from app import create_app, db
-from app.models import User
+from app.models import User, QueueEntry, Task, File
 
 # Устанавливаем SQLite для тестов
 os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
@@ -183,3 +184,68 @@ def test_admin_users_list_shows_all_users(client, admin_user, regular_user, app)
     assert 'admin' in data
     assert 'user1' in data
 
+
+def add_students(count, offset=0):
+    """Пользователи с записью очереди, двумя задачами (одна выполнена) и файлом"""
+    for number in range(offset, offset + count):
+        student = User(username=f'student{number:03d}', is_active=number % 2 == 0)
+        student.set_full_name(f'Студент {number}')
+        student.set_password('pass')
+        db.session.add(student)
+        db.session.flush()
+        db.session.add(QueueEntry(user_id=student.id, subject='ОАиП'))
+        db.session.add(Task(user_id=student.id, title='Задача'))
+        db.session.add(Task(user_id=student.id, title='Готово', completed=True))
+        db.session.add(File(user_id=student.id, filename=f'{number}.pdf', original_filename='a.pdf', file_type='document'))
+    db.session.commit()
+    db.session.expire_all()
+
+
+def count_page_queries(client, url):
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    sa_event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(url)
+    finally:
+        sa_event.remove(db.engine, 'before_cursor_execute', listener)
+    assert response.status_code == 200
+    return response.data.decode('utf-8'), len(statements)
+
+
+def test_admin_users_query_count_is_constant(client, admin_user, app):
+    """Тест: число запросов страницы пользователей не зависит от числа пользователей"""
+    client.post('/auth/login', data={'username': 'admin', 'password': 'adminpass'})
+
+    add_students(2)
+    _, small_queries = count_page_queries(client, '/admin/users?per_page=200')
+    add_students(30, offset=2)
+    data, large_queries = count_page_queries(client, '/admin/users?per_page=200')
+
+    assert small_queries == large_queries
+    assert 'student031' in data and 'Студент 31' in data
+    assert data.count('Очередь: 1<br>') == 32
+    assert data.count('Задачи: 1<br>') == 32
+    assert data.count('Файлы: 1') == 32
+
+
+def test_admin_users_filter_sort_and_pages(client, admin_user, app):
+    """Тест: фильтр, сортировка и страницы выполняются в SQL"""
+    client.post('/auth/login', data={'username': 'admin', 'password': 'adminpass'})
+    add_students(5)
+
+    data = client.get('/admin/users?status=pending').data.decode('utf-8')
+    assert 'Найдено: 2.' in data
+    assert 'student001' in data and 'student000' not in data
+
+    data = client.get('/admin/users?status=admin').data.decode('utf-8')
+    assert 'Найдено: 1.' in data and 'student' not in data
+
+    data = client.get('/admin/users?sort=username&order=asc&per_page=2&page=2').data.decode('utf-8')
+    assert '2 из 3' in data
+    assert 'student000' not in data and 'student001' in data and 'student002' in data
+
+    # Администратор без записей очереди - последний при сортировке по убыванию очереди
+    data = client.get('/admin/users?sort=queue&order=desc&per_page=5&page=2').data.decode('utf-8')
+    assert '<strong>admin</strong>' in data
+
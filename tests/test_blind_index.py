@@ -0,0 +1,126 @@
+"""Тесты слепого индекса ФИО и поиска пользователей в админ-панели"""
+import os
+import pytest
+from cryptography.fernet import Fernet
+from sqlalchemy import text
+from app import db
+from app.models import User, UserNameTerm
+from app.blind_index import normalize_name, name_terms, search_user_ids, reindex_names
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+
+def add_user(username, full_name, **kwargs):
+    user = User(username=username, is_active=True, **kwargs)
+    user.set_full_name(full_name)
+    user.set_password('testpass')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def admin_client(app, client):
+    add_user('admin', 'Администратор Админ', is_admin=True)
+    client.post('/auth/login', data={'username': 'admin', 'password': 'testpass'})
+    return client
+
+
+def test_normalize_name():
+    """Тест: регистр, ё и знаки препинания не влияют на поиск"""
+    assert normalize_name('  Пётр-Сергеевич  ФЁДОРОВ, ') == 'петр сергеевич федоров'
+    assert normalize_name('123') == ''
+
+
+def test_terms_are_keyed(app):
+    """Тест: хэши зависят от ключа и не содержат открытого текста"""
+    terms = name_terms('Иванов Иван')
+    assert terms and all(len(term) == 32 and 'иван' not in term for term in terms)
+    app.config['BLIND_INDEX_KEY'] = 'other-key'
+    assert set(name_terms('Иванов Иван')).isdisjoint(terms)
+
+
+def test_search_by_prefix_and_exact(app):
+    """Тест: поиск по префиксам слов (в любом порядке) и по ФИО целиком"""
+    ivanov = add_user('u1', 'Иванов Иван Иванович')
+    ivanova = add_user('u2', 'Иванова Мария Петровна')
+    petrov = add_user('u3', 'Петров Пётр Петрович')
+
+    assert search_user_ids('иван') == [ivanov.id, ivanova.id]
+    assert search_user_ids('Мар Иванова') == [ivanova.id]
+    assert search_user_ids('петр') == [ivanova.id, petrov.id]
+    assert search_user_ids('иванов иван иванович', exact=True) == [ivanov.id]
+    assert search_user_ids('иванов иван', exact=True) == []
+    assert search_user_ids('Сидоров') == []
+
+
+def test_set_full_name_updates_index(app):
+    """Тест: смена ФИО заменяет хэши, удаление пользователя удаляет их"""
+    user = add_user('u1', 'Иванов Иван')
+    user.set_full_name('Сидоров Иван')
+    db.session.commit()
+    assert search_user_ids('Иванов') == []
+    assert search_user_ids('Сидоров') == [user.id]
+
+    # Повторная установка того же ФИО не дублирует хэши
+    count = UserNameTerm.query.count()
+    user.set_full_name('Сидоров Иван')
+    db.session.commit()
+    assert UserNameTerm.query.count() == count
+
+    db.session.delete(user)
+    db.session.commit()
+    assert UserNameTerm.query.count() == 0
+
+
+def test_search_uses_index(app):
+    """Тест: поиск по хэшу - поиск по покрывающему индексу"""
+    plan = db.session.execute(text(
+        "EXPLAIN QUERY PLAN SELECT user_id FROM user_name_terms WHERE term IN ('a', 'b') GROUP BY user_id"
+    )).all()
+    assert 'COVERING INDEX idx_user_name_terms_term_user' in ' '.join(row[-1] for row in plan)
+
+
+def test_reindex_names(app):
+    """Тест: заполнение индекса для пользователей без него и полная перестройка"""
+    first = add_user('u1', 'Иванов Иван')
+    second = add_user('u2', 'Петров Пётр')
+    UserNameTerm.query.filter_by(user_id=second.id).delete()
+    db.session.commit()
+
+    assert reindex_names(chunk_size=1) == {'indexed': 1, 'failed': 0}
+    assert search_user_ids('Петров') == [second.id]
+
+    app.config['BLIND_INDEX_KEY'] = 'new-index-key'
+    assert search_user_ids('Иванов') == []
+    assert reindex_names(rebuild=True) == {'indexed': 2, 'failed': 0}
+    assert search_user_ids('Иванов') == [first.id]
+    assert UserNameTerm.query.count() == len(name_terms('Иванов Иван')) + len(name_terms('Петров Пётр'))
+
+
+def test_reindex_skips_undecryptable_names(app):
+    """Тест: ФИО, зашифрованное неизвестным ключом, не индексируется и попадает в отчёт"""
+    app.config['ENCRYPTION_KEY'] = Fernet.generate_key().decode('utf-8')
+    lost = add_user('u1', 'Иванов Иван')
+    app.config['ENCRYPTION_KEY'] = Fernet.generate_key().decode('utf-8')
+    kept = add_user('u2', 'Петров Пётр')
+
+    assert reindex_names(rebuild=True) == {'indexed': 1, 'failed': 1}
+    assert UserNameTerm.query.filter_by(user_id=lost.id).count() == 0
+    assert search_user_ids('Петров') == [kept.id]
+
+    result = app.test_cli_runner().invoke(args=['encryption', 'reindex-names'])
+    assert 'Indexed 0 users, failed: 1' in result.output
+    assert 'ENCRYPTION_OLD_KEYS' in result.output
+
+
+def test_admin_search_endpoint(admin_client):
+    """Тест: эндпоинт поиска возвращает расшифрованные ФИО найденных"""
+    add_user('u1', 'Иванов Иван Иванович')
+    response = admin_client.get('/admin/users/search?q=ив иванович')
+    assert response.status_code == 200
+    assert [user['full_name'] for user in response.get_json()['users']] == ['Иванов Иван Иванович']
+
+    assert admin_client.get('/admin/users/search?q=Иванов&exact=1').get_json() == {'users': []}
+    assert admin_client.get('/admin/users/search').status_code == 400
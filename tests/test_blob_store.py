@@ -0,0 +1,136 @@
+"""Тесты хранилища загруженных файлов по содержимому"""
+import os
+import io
+import hashlib
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from app.models import User, File, FileBlob, CalendarEvent
+from app.blob_store import get_blob_store
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+CONTENT = b'%PDF-1.4 lecture ' * 4096
+
+
+@pytest.fixture
+def uploads(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def logged_in(app, client, uploads):
+    user = User(username='testuser', is_active=True)
+    user.set_full_name('Иванов Иван Иванович')
+    user.set_password('testpass')
+    db.session.add(user)
+    db.session.add(CalendarEvent(
+        event_id='e1', title='ОАиП (ЛК)',
+        start_time=datetime.utcnow() + timedelta(days=1), end_time=datetime.utcnow() + timedelta(days=1, hours=2)
+    ))
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'testpass'})
+    return client
+
+
+def upload(client, content, name='lecture.pdf'):
+    return client.post('/upload/upload', data={
+        'file': (io.BytesIO(content), name),
+        'calendar_event_id': CalendarEvent.query.one().id
+    })
+
+
+def blob_files(uploads):
+    return sorted(
+        name for _, _, names in os.walk(uploads / 'blobs') for name in names
+    )
+
+
+def test_duplicate_uploads_share_one_blob(logged_in, uploads):
+    """Тест: повторная загрузка того же содержимого не пишет второй файл"""
+    upload(logged_in, CONTENT)
+    upload(logged_in, CONTENT, name='copy.pdf')
+    upload(logged_in, b'other')
+
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    assert blob_files(uploads) == sorted([sha256, hashlib.sha256(b'other').hexdigest()])
+    assert (uploads / 'blobs' / sha256[:2] / sha256[2:4] / sha256).read_bytes() == CONTENT
+    assert db.session.get(FileBlob, sha256).ref_count == 2
+    # Временных файлов не осталось
+    assert [name for name in os.listdir(uploads) if name != 'blobs'] == []
+
+    copy = File.query.filter_by(original_filename='copy.pdf').one()
+    response = logged_in.get(f'/upload/files/{copy.id}')
+    assert response.data == CONTENT
+    assert 'copy.pdf' in response.headers['Content-Disposition']
+
+
+def test_bot_import_deduplicates_with_web_upload(app, logged_in, uploads):
+    """Тест: файл из бота (import_file) ссылается на тот же блоб"""
+    upload(logged_in, CONTENT)
+    downloaded = uploads / 'downloaded.part'
+    downloaded.write_bytes(CONTENT)
+
+    blob = get_blob_store(app).import_file(str(downloaded))
+    assert blob.deduplicated
+    assert not downloaded.exists()
+    assert len(blob_files(uploads)) == 1
+
+
+def test_gc_removes_unreferenced_blobs(app, logged_in, uploads):
+    """Тест: блоб без ссылок удаляется после отсрочки, с ссылками - остаётся"""
+    upload(logged_in, CONTENT)
+    upload(logged_in, b'kept')
+    store = get_blob_store(app)
+
+    db.session.delete(File.query.filter_by(sha256=hashlib.sha256(CONTENT).hexdigest()).one())
+    db.session.commit()
+    assert store.collect_garbage(timedelta(hours=1)) == {'blobs': 0, 'files': 0, 'bytes': 0}
+
+    result = store.collect_garbage(timedelta(0))
+    assert result == {'blobs': 1, 'files': 1, 'bytes': len(CONTENT)}
+    assert blob_files(uploads) == [hashlib.sha256(b'kept').hexdigest()]
+    assert FileBlob.query.count() == 1
+
+
+def test_gc_removes_orphaned_and_temporary_files(app, uploads):
+    """Тест: файлы без строки и брошенные временные файлы удаляются"""
+    store = get_blob_store(app)
+    orphan = store.path_for('ab' * 32)
+    os.makedirs(os.path.dirname(orphan))
+    with open(orphan, 'wb') as f:
+        f.write(b'12345')
+    with open(os.path.join(store.root, '.upload-abc.part'), 'wb') as f:
+        f.write(b'123')
+
+    assert store.collect_garbage(timedelta(0)) == {'blobs': 0, 'files': 2, 'bytes': 8}
+    assert blob_files(uploads) == []
+
+
+def test_gc_keeps_file_of_recreated_blob(app, logged_in, uploads):
+    """Тест: сборщик не удаляет файл, если строку блоба успели создать заново"""
+    upload(logged_in, CONTENT)
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    store = get_blob_store(app)
+
+    # Строка снова существует к моменту удаления файла (новая загрузка того же содержимого)
+    result = {'blobs': 0, 'files': 0, 'bytes': 0}
+    store._unlink_unreferenced(sha256, result)
+    assert result['files'] == 0
+    assert os.path.exists(store.path_for(sha256))
+    assert db.session.get(FileBlob, sha256).ref_count == 1
+
+
+def test_new_blob_row_rewrites_file_left_on_disk(app, logged_in, uploads):
+    """Тест: при новой строке блоба файл кладётся заново, а не считается дубликатом"""
+    store = get_blob_store(app)
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    # Файл от удалённой строки, который сборщик вот-вот удалит
+    os.makedirs(os.path.dirname(store.path_for(sha256)))
+    with open(store.path_for(sha256), 'wb') as f:
+        f.write(b'stale')
+
+    upload(logged_in, CONTENT)
+    assert (uploads / 'blobs' / sha256[:2] / sha256[2:4] / sha256).read_bytes() == CONTENT
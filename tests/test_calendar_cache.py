@@ -0,0 +1,101 @@
+"""Тесты кэша готовых ответов /calendar/events/cached"""
+import os
+import pytest
+from datetime import datetime
+from app import db
+from app.models import User, CalendarEvent, CalendarSyncState
+from app.calendar_cache import ResponseCache, get_response_cache, calendar_generation
+from app.calendar_routes import update_calendar_cache
+from tests.test_calendar_fetch import feed_server, make_ics  # noqa: F401 (фикстура)
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+RANGE = '/calendar/events/cached?start=2025-11-01T00:00:00%2B03:00&end=2025-11-08T00:00:00%2B03:00'
+
+
+@pytest.fixture
+def logged_in(app, client):
+    user = User(username='testuser', is_active=True)
+    user.set_full_name('Иванов Иван Иванович')
+    user.set_password('testpass')
+    db.session.add(user)
+    db.session.add(CalendarEvent(
+        event_id='event-1',
+        title='Физика (ЛР)',
+        start_time=datetime(2025, 11, 3, 9, 0),
+        end_time=datetime(2025, 11, 3, 10, 20)
+    ))
+    db.session.add(CalendarSyncState(source='default', generation=1))
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'testpass'})
+    return client
+
+
+def bump_generation(title):
+    """Синхронизация изменила событие и подняла поколение"""
+    CalendarEvent.query.filter_by(event_id='event-1').one().title = title
+    CalendarSyncState.query.filter_by(source='default').one().generation += 1
+    db.session.commit()
+
+
+def test_repeated_request_served_from_cache(app, logged_in):
+    """Тест: повторный запрос того же диапазона не кодирует ответ заново"""
+    first = logged_in.get(RANGE)
+    second = logged_in.get(RANGE)
+
+    assert first.get_json()[0]['start'] == '2025-11-03T09:00:00+03:00'
+    assert second.data == first.data
+    cache = get_response_cache(app)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_etag_returns_304(app, logged_in):
+    """Тест: совпавший If-None-Match даёт 304 без тела"""
+    etag = logged_in.get(RANGE).headers['ETag']
+
+    response = logged_in.get(RANGE, headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_sync_generation_invalidates_cache(app, logged_in):
+    """Тест: после синхронизации меняются и тело, и ETag"""
+    etag = logged_in.get(RANGE).headers['ETag']
+    bump_generation('Физика (ЛК)')
+
+    response = logged_in.get(RANGE, headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.get_json()[0]['title'] == 'Физика (ЛК)'
+    assert response.headers['ETag'] != etag
+
+
+def test_response_cache_is_bounded():
+    """Тест: LRU вытесняет давно не запрошенный ключ"""
+    cache = ResponseCache(max_entries=2)
+    for key in ('a', 'b'):
+        cache.put(key, 1, key.encode())
+    cache.get('a', 1)
+    cache.put('c', 1, b'c')
+
+    assert len(cache) == 2
+    assert cache.get('b', 1) is None
+    assert cache.get('a', 1).body == b'a'
+    # Новое поколение сбрасывает все ответы
+    assert cache.get('a', 2) is None
+
+
+def test_generation_changes_only_with_events(app, feed_server):
+    """Тест: поколение растёт при изменении событий, но не при 304"""
+    update_calendar_cache()
+    assert calendar_generation() == (('default', 1),)
+
+    update_calendar_cache()
+    assert calendar_generation() == (('default', 1),)
+
+    feed_server.body = make_ics('Физика (ЛР)', 'Математический анализ (ПЗ)')
+    update_calendar_cache()
+    assert calendar_generation() == (('default', 2),)
@@ -0,0 +1,178 @@
+"""Тесты условной загрузки iCal feed на локальном HTTP-сервере"""
+import os
+import hashlib
+import threading
+import time
+import pytest
+from datetime import datetime, timedelta
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from app import db
+from app.models import CalendarEvent, CalendarSyncState
+from app.calendar_routes import update_calendar_cache
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+
+def make_ics(*titles):
+    """iCal с событиями на ближайшие дни"""
+    start = datetime.utcnow() + timedelta(days=1)
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//test//EN']
+    for index, title in enumerate(titles):
+        event_start = start + timedelta(days=index)
+        lines += [
+            'BEGIN:VEVENT',
+            f"UID:feed-event-{index}",
+            f"DTSTART:{event_start.strftime('%Y%m%dT%H%M%SZ')}",
+            f"DTEND:{(event_start + timedelta(hours=1)).strftime('%Y%m%dT%H%M%SZ')}",
+            f"SUMMARY:{title}",
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(lines).encode('utf-8')
+
+
+class FeedServer:
+    """Локальная замена Google Calendar с поддержкой ETag"""
+
+    def __init__(self):
+        self.body = make_ics('Физика (ЛР)')
+        self.send_etag = True
+        self.delay = 0  # Задержка ответа в секундах (для тестов конкурентных обновлений)
+        self.fail = False  # Отвечать 500 (недоступный источник)
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                etag = '"' + hashlib.md5(server.body).hexdigest() + '"'
+                server.requests.append({key.lower(): value for key, value in self.headers.items()})
+                time.sleep(server.delay)
+                if server.fail:
+                    self.send_error(500)
+                    return
+                if server.send_etag and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/calendar; charset=utf-8')
+                if server.send_etag:
+                    self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(server.body)))
+                self.end_headers()
+                self.wfile.write(server.body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/basic.ics"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def feed_server(app):
+    with FeedServer() as server:
+        app.config['CALENDAR_ICAL_URL'] = server.url
+        yield server
+
+
+def test_first_sync_stores_etag_and_hash(app, feed_server):
+    """Тест: первая синхронизация сохраняет ETag и SHA-256 тела"""
+    result = update_calendar_cache()
+
+    assert result.inserted == 1
+    state = CalendarSyncState.query.filter_by(source='default').first()
+    assert state.etag
+    assert state.content_hash == hashlib.sha256(feed_server.body).hexdigest()
+    assert 'if-none-match' not in feed_server.requests[0]
+
+
+def test_not_modified_skips_sync(app, feed_server):
+    """Тест: при ответе 304 разбор и запись в БД пропускаются"""
+    update_calendar_cache()
+    CalendarEvent.query.delete()
+    db.session.commit()
+
+    result = update_calendar_cache()
+
+    assert feed_server.requests[-1].get('if-none-match')
+    assert not result.changed
+    # Разбор не выполнялся, поэтому удалённое событие не восстановлено
+    assert CalendarEvent.query.count() == 0
+
+
+def test_same_hash_skips_sync_without_etag(app, feed_server):
+    """Тест: без ETag совпадение хэша тела тоже пропускает запись"""
+    feed_server.send_etag = False
+    update_calendar_cache()
+    CalendarEvent.query.delete()
+    db.session.commit()
+
+    result = update_calendar_cache()
+
+    assert not result.changed
+    assert CalendarEvent.query.count() == 0
+
+
+def test_changed_feed_is_synced(app, feed_server):
+    """Тест: изменённый feed разбирается и синхронизируется"""
+    update_calendar_cache()
+    feed_server.body = make_ics('Физика (ЛР)', 'Математический анализ (ПЗ)')
+
+    result = update_calendar_cache()
+
+    assert result.inserted == 1
+    assert result.unchanged == 1
+    assert CalendarEvent.query.count() == 2
+
+
+def test_force_ignores_conditional_headers(app, feed_server):
+    """Тест: принудительное обновление загружает feed безусловно"""
+    update_calendar_cache()
+    CalendarEvent.query.delete()
+    db.session.commit()
+
+    result = update_calendar_cache(force=True)
+
+    assert 'if-none-match' not in feed_server.requests[-1]
+    assert result.inserted == 1
+
+
+def test_force_rebuild_replaces_cache(app, feed_server):
+    """Тест: принудительная пересборка заменяет кэш и сохраняет первичные ключи"""
+    update_calendar_cache()
+    kept_id = CalendarEvent.query.filter_by(event_id='feed-event-0').one().id
+    db.session.add(CalendarEvent(
+        event_id='removed-event',
+        title='Удалённое занятие',
+        start_time=datetime.utcnow() + timedelta(days=90),
+        end_time=datetime.utcnow() + timedelta(days=90, hours=1)
+    ))
+    db.session.commit()
+    feed_server.body = make_ics('Физика (ЛР)', 'Математический анализ (ПЗ)')
+
+    result = update_calendar_cache(force=True)
+
+    assert (result.inserted, result.unchanged, result.deleted) == (1, 1, 1)
+    assert result.rebuild_ms is not None and result.swap_ms is not None
+    assert CalendarEvent.query.filter_by(event_id='feed-event-0').one().id == kept_id
+    assert CalendarEvent.query.filter_by(event_id='removed-event').first() is None
+
+
+def test_failed_force_rebuild_keeps_cache(app, feed_server):
+    """Тест: при недоступном feed принудительное обновление не опустошает кэш"""
+    update_calendar_cache()
+    feed_server.fail = True
+
+    assert update_calendar_cache(force=True) is None
+    assert CalendarEvent.query.count() == 1
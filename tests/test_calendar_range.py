@@ -0,0 +1,53 @@
+"""Тесты выборки событий календаря по диапазону"""
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app import db
+from app.models import CalendarEvent
+from app.calendar_routes import overlaps_range, _encode_cached_events
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+
+def add_event(event_id, start, duration):
+    db.session.add(CalendarEvent(event_id=event_id, title=event_id, start_time=start, end_time=start + duration))
+
+
+def test_overlap_query_is_bounded_index_scan(app):
+    """Тест: пересечение с диапазоном - поиск по индексу с обеими границами start_time"""
+    start, end = datetime(2025, 11, 3), datetime(2025, 11, 10)
+    query = CalendarEvent.query.filter(overlaps_range(start, end)).order_by(CalendarEvent.start_time)
+    compiled = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+
+    plan = ' '.join(row[-1] for row in db.session.execute(text(f'EXPLAIN QUERY PLAN {compiled}')))
+
+    assert 'USING INDEX idx_calendar_events_start_end (start_time>? AND start_time<?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_overlap_includes_events_started_before_range(app):
+    """Тест: события, начавшиеся до диапазона и ещё идущие, попадают в выборку"""
+    start = datetime(2025, 11, 3)
+    add_event('inside', start + timedelta(hours=9), timedelta(minutes=80))
+    add_event('multi-day', start - timedelta(days=2), timedelta(days=3))
+    add_event('finished', start - timedelta(days=1), timedelta(hours=2))
+    add_event('after', start + timedelta(days=7), timedelta(hours=1))
+    db.session.commit()
+
+    events = CalendarEvent.query.filter(overlaps_range(start, start + timedelta(days=7))).all()
+
+    assert sorted(event.event_id for event in events) == ['inside', 'multi-day']
+
+
+def test_max_duration_is_configurable(app):
+    """Тест: нижняя граница start_time зависит от CALENDAR_MAX_EVENT_HOURS"""
+    start = datetime(2025, 11, 3)
+    add_event('long', start - timedelta(days=2), timedelta(days=3))
+    db.session.commit()
+    app.config['CALENDAR_MAX_EVENT_HOURS'] = 24
+
+    assert _encode_cached_events(start, start + timedelta(days=1)) == b'[]'
+
+    app.config['CALENDAR_MAX_EVENT_HOURS'] = 72
+    assert b'"long"' in _encode_cached_events(start, start + timedelta(days=1))
@@ -0,0 +1,92 @@
+"""Тесты single-flight обновления кэша календаря"""
+import os
+import threading
+import time
+from app.models import CalendarEvent
+from app.calendar_refresh import SingleFlight, get_refresher
+from app.calendar_routes import fetch_events_from_google
+from tests.test_calendar_fetch import feed_server  # noqa: F401 (фикстура)
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+
+def test_single_flight_runs_once_for_concurrent_callers():
+    """Тест: одновременные вызовы получают одну и ту же операцию"""
+    calls = []
+    release = threading.Event()
+
+    def slow(flight):
+        calls.append(flight)
+        release.wait(5)
+        return 'done'
+
+    flights = SingleFlight()
+    started = [flights.start(slow) for _ in range(10)]
+    release.set()
+    started[0].wait(5)
+
+    assert len(calls) == 1
+    assert all(flight is started[0] for flight in started)
+    assert started[0].result == 'done'
+
+
+def test_forced_flight_runs_after_regular():
+    """Тест: принудительное обновление не присоединяется к обычному"""
+    order = []
+    release = threading.Event()
+
+    def work(flight):
+        release.wait(5)
+        order.append(flight.force)
+
+    flights = SingleFlight()
+    regular = flights.start(work)
+    forced = flights.start(work, force=True)
+    assert flights.start(work) is forced
+    release.set()
+    forced.wait(5)
+
+    assert regular.done.is_set()
+    assert order == [False, True]
+
+
+def test_concurrent_refresh_fetches_feed_once(app, feed_server):
+    """Тест: пачка параллельных обновлений загружает feed один раз"""
+    feed_server.delay = 0.3
+    refresher = get_refresher(app)
+    errors = []
+
+    def refresh():
+        try:
+            refresher.refresh(timeout=10)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=refresh) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(feed_server.requests) == 1
+    assert CalendarEvent.query.count() == 1
+
+
+def test_stale_empty_cache_waits_bounded(app, feed_server):
+    """Тест: пустой устаревший кэш ждёт обновление не дольше заданного времени"""
+    app.config['CALENDAR_REFRESH_ON_READ'] = True
+    app.config['CALENDAR_REFRESH_WAIT_SECONDS'] = 0.1
+    feed_server.delay = 1
+
+    started = time.perf_counter()
+    events = fetch_events_from_google()
+    elapsed = time.perf_counter() - started
+
+    assert events == []
+    assert elapsed < 0.8
+    # Обновление продолжилось в фоне, следующий запрос получает данные
+    get_refresher(app).flights._flight.wait(5)
+    assert len(fetch_events_from_google()) == 1
+    assert len(feed_server.requests) == 1
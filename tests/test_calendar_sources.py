@@ -0,0 +1,107 @@
+"""Тесты параллельной синхронизации нескольких календарей"""
+import os
+import time
+import pytest
+from app.models import CalendarEvent, CalendarSyncState
+from app.calendar_routes import update_calendar_cache, sync_calendar_cache
+from app.calendar_sources import parse_sources, get_calendar_sources, backoff_delay
+from tests.test_calendar_fetch import FeedServer, make_ics
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+
+@pytest.fixture
+def feeds(app):
+    """Два источника: default и подгруппа 561401-2"""
+    with FeedServer() as default, FeedServer() as subgroup:
+        subgroup.body = make_ics('Физика (ЛР)', 'Английский язык (ПЗ)')
+        app.config['CALENDAR_ICAL_URL'] = default.url
+        app.config['CALENDAR_SOURCES'] = f'561401-2={subgroup.url}'
+        yield default, subgroup
+
+
+def test_parse_sources():
+    """Тест: источники из строки конфигурации, id календаря превращается в iCal URL"""
+    config = {
+        'GOOGLE_CALENDAR_ID': 'main@group.calendar.google.com',
+        'CALENDAR_SOURCES': '561402=other@group.calendar.google.com, 561401-2=https://example.com/a.ics,broken'
+    }
+
+    sources = get_calendar_sources(config)
+
+    assert parse_sources({'a': 'b'}) == [('a', 'b')]
+    assert [source.name for source in sources] == ['default', '561402', '561401-2']
+    assert 'other%40group.calendar.google.com' in sources[1].url
+    assert sources[2].url == 'https://example.com/a.ics'
+
+
+def test_sources_are_tagged(app, feeds):
+    """Тест: события каждого источника хранятся отдельно, одинаковые UID не конфликтуют"""
+    result = update_calendar_cache()
+
+    assert result.inserted == 3
+    counts = {
+        source: CalendarEvent.query.filter_by(source=source).count()
+        for source in ('default', '561401-2')
+    }
+    assert counts == {'default': 1, '561401-2': 2}
+    # UID feed-event-0 есть в обоих календарях
+    assert CalendarEvent.query.filter_by(event_id='feed-event-0').count() == 2
+
+
+def test_sources_are_fetched_concurrently(app, feeds):
+    """Тест: общее время близко к самому медленному feed, а не к сумме"""
+    for feed in feeds:
+        feed.delay = 0.5
+
+    started = time.perf_counter()
+    update_calendar_cache()
+    elapsed = time.perf_counter() - started
+
+    assert all(len(feed.requests) == 1 for feed in feeds)
+    assert elapsed < 0.9
+
+
+def test_failed_source_does_not_block_others(app, feeds):
+    """Тест: ошибка одного источника учитывается в его состоянии, остальные синхронизируются"""
+    default, subgroup = feeds
+    subgroup.fail = True
+
+    result = update_calendar_cache()
+
+    assert result.inserted == 1
+    state = CalendarSyncState.query.filter_by(source='561401-2').one()
+    assert state.consecutive_failures == 1
+    assert state.last_error
+    assert state.retry_at is None
+
+
+def test_source_backs_off_after_error_budget(app, feeds):
+    """Тест: после исчерпания бюджета ошибок источник пропускается до retry_at"""
+    default, subgroup = feeds
+    app.config['CALENDAR_SOURCE_ERROR_BUDGET'] = 1
+    subgroup.fail = True
+    update_calendar_cache()
+    assert CalendarSyncState.query.filter_by(source='561401-2').one().retry_at is not None
+
+    update_calendar_cache()
+
+    assert len(subgroup.requests) == 1
+    assert len(default.requests) == 2
+
+
+def test_all_sources_failed_raises(app, feeds):
+    """Тест: если не удалось ни одного источника, ошибка пробрасывается (backoff задачи)"""
+    for feed in feeds:
+        feed.fail = True
+
+    with pytest.raises(Exception):
+        sync_calendar_cache()
+
+
+def test_backoff_delay():
+    """Тест: в пределах бюджета повтор сразу, затем экспоненциальная пауза с ограничением"""
+    delays = [backoff_delay(failures, 3, 60, 600) for failures in range(1, 8)]
+
+    assert delays == [0, 0, 60, 120, 240, 480, 600]
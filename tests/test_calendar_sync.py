@@ -0,0 +1,149 @@
+"""Тесты diff-синхронизации кэша календаря"""
+import os
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from app.models import User, CalendarEvent, CalendarEventStaging, File
+from app.calendar_sync import sync_calendar_events, load_staging, swap_staging
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+
+def make_record(event_id, start, title='Занятие'):
+    return {
+        'event_id': event_id,
+        'title': title,
+        'start_time': start,
+        'end_time': start + timedelta(hours=1, minutes=20),
+        'description': '',
+        'location': '101-1'
+    }
+
+
+@pytest.fixture
+def window():
+    start = datetime(2025, 11, 1, 0, 0)
+    return start, start + timedelta(days=60)
+
+
+def test_sync_inserts_new_events(app, window):
+    """Тест: новые события вставляются пакетно"""
+    records = [make_record(f'uid-{i}', window[0] + timedelta(days=i)) for i in range(5)]
+
+    result = sync_calendar_events(records, *window)
+
+    assert result.inserted == 5
+    assert result.updated == 0
+    assert CalendarEvent.query.count() == 5
+
+
+def test_sync_reports_updated_and_unchanged(app, window):
+    """Тест: изменённые события обновляются, остальные считаются неизменными"""
+    records = [make_record(f'uid-{i}', window[0] + timedelta(days=i)) for i in range(3)]
+    sync_calendar_events(records, *window)
+    first_id = CalendarEvent.query.filter_by(event_id='uid-0').first().id
+
+    records[0] = make_record('uid-0', window[0], title='Перенесённое занятие')
+    result = sync_calendar_events(records, *window)
+
+    assert result.as_dict() == {'inserted': 0, 'updated': 1, 'unchanged': 2, 'deleted': 0}
+    db.session.expire_all()
+    event = CalendarEvent.query.filter_by(event_id='uid-0').first()
+    assert event.title == 'Перенесённое занятие'
+    # Первичный ключ сохраняется, чтобы не терять привязку файлов
+    assert event.id == first_id
+
+
+def test_sync_deletes_removed_events_in_window(app, window):
+    """Тест: событие, исчезнувшее из feed, удаляется только внутри окна"""
+    records = [make_record(f'uid-{i}', window[0] + timedelta(days=i)) for i in range(3)]
+    sync_calendar_events(records, *window)
+    outside = CalendarEvent(
+        event_id='old-event',
+        title='Прошедшее занятие',
+        start_time=window[0] - timedelta(days=10),
+        end_time=window[0] - timedelta(days=10) + timedelta(hours=1)
+    )
+    db.session.add(outside)
+    db.session.commit()
+
+    result = sync_calendar_events(records[:2], *window)
+
+    assert result.deleted == 1
+    assert CalendarEvent.query.filter_by(event_id='uid-2').first() is None
+    assert CalendarEvent.query.filter_by(event_id='old-event').first() is not None
+
+
+def test_sync_keeps_events_with_files(app, window):
+    """Тест: событие с прикреплёнными файлами не удаляется"""
+    records = [make_record(f'uid-{i}', window[0] + timedelta(days=i)) for i in range(2)]
+    sync_calendar_events(records, *window)
+
+    user = User(username='testuser', is_active=True)
+    user.set_full_name('Иванов Иван Иванович')
+    user.set_password('testpass')
+    db.session.add(user)
+    db.session.commit()
+    event = CalendarEvent.query.filter_by(event_id='uid-1').first()
+    db.session.add(File(
+        user_id=user.id,
+        calendar_event_id=event.id,
+        filename='f.txt',
+        original_filename='f.txt',
+        file_type='document'
+    ))
+    db.session.commit()
+
+    result = sync_calendar_events(records[:1], *window)
+
+    assert result.deleted == 0
+    assert CalendarEvent.query.filter_by(event_id='uid-1').first() is not None
+
+
+def test_sync_empty_feed_does_not_wipe_cache(app, window):
+    """Тест: пустой feed не очищает кэш"""
+    records = [make_record('uid-0', window[0] + timedelta(days=1))]
+    sync_calendar_events(records, *window)
+
+    result = sync_calendar_events([], *window)
+
+    assert result.deleted == 0
+    assert CalendarEvent.query.count() == 1
+
+
+def test_swap_replaces_cache_and_keeps_ids(app, window):
+    """Тест: замена из staging обновляет строки на месте и удаляет исчезнувшие"""
+    records = [make_record(f'uid-{i}', window[0] + timedelta(days=i)) for i in range(3)]
+    sync_calendar_events(records, *window)
+    ids = {event.event_id: event.id for event in CalendarEvent.query.all()}
+
+    new_records = [
+        make_record('uid-0', window[0], title='Исправленное название'),
+        records[1],
+        make_record('uid-3', window[0] + timedelta(days=3)),
+    ]
+    load_staging(new_records)
+    result = swap_staging()
+    db.session.commit()
+
+    assert result.as_dict() == {'inserted': 1, 'updated': 1, 'unchanged': 1, 'deleted': 1}
+    db.session.expire_all()
+    events = {event.event_id: event for event in CalendarEvent.query.all()}
+    assert set(events) == {'uid-0', 'uid-1', 'uid-3'}
+    assert events['uid-0'].title == 'Исправленное название'
+    assert events['uid-0'].id == ids['uid-0']
+    assert events['uid-1'].id == ids['uid-1']
+    assert CalendarEventStaging.query.count() == 0
+
+
+def test_swap_with_empty_staging_keeps_cache(app, window):
+    """Тест: пустая новая версия не очищает кэш"""
+    sync_calendar_events([make_record('uid-0', window[0])], *window)
+
+    load_staging([])
+    result = swap_staging()
+    db.session.commit()
+
+    assert not result.changed
+    assert CalendarEvent.query.count() == 1
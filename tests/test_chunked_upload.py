@@ -0,0 +1,174 @@
+"""Тесты загрузки файлов по частям"""
+import os
+import io
+import hashlib
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from app.models import User, File, FileBlob, CalendarEvent, UploadSession
+from app.chunked_upload import UploadConflict, append_chunk, cleanup_upload_sessions, partial_path
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+CONTENT = b'%PDF-1.4 recording ' * 8192
+
+
+@pytest.fixture
+def uploads(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def logged_in(app, client, uploads):
+    for username in ('testuser', 'other'):
+        user = User(username=username, is_active=True)
+        user.set_full_name('Иванов Иван Иванович')
+        user.set_password('testpass')
+        db.session.add(user)
+    db.session.add(CalendarEvent(
+        event_id='e1', title='ОАиП (ЛК)',
+        start_time=datetime.utcnow() + timedelta(days=1), end_time=datetime.utcnow() + timedelta(days=1, hours=2)
+    ))
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'testpass'})
+    return client
+
+
+def start(client, length=len(CONTENT), name='lecture.pdf'):
+    return client.post('/upload/sessions', data={
+        'filename': name,
+        'length': length,
+        'calendar_event_id': CalendarEvent.query.one().id
+    })
+
+
+def send(client, url, offset, data):
+    return client.patch(url, data=data, headers={'Upload-Offset': str(offset)})
+
+
+def test_chunked_upload_resumes_and_finalizes(logged_in, uploads):
+    """Тест: части принимаются по смещению, после обрыва загрузка продолжается"""
+    response = start(logged_in)
+    assert response.status_code == 201
+    url = response.headers['Location']
+    half = len(CONTENT) // 2
+
+    assert send(logged_in, url, 0, CONTENT[:half]).headers['Upload-Offset'] == str(half)
+    # Повтор уже принятой части (ответ потерялся) - 409 с принятым смещением
+    conflict = send(logged_in, url, 0, CONTENT[:half])
+    assert conflict.status_code == 409
+    assert conflict.headers['Upload-Offset'] == str(half)
+    assert logged_in.head(url).headers['Upload-Offset'] == str(half)
+
+    # Завершить раньше времени нельзя
+    assert logged_in.post(url + '/finalize').status_code == 409
+    assert send(logged_in, url, half, CONTENT[half:]).status_code == 204
+
+    response = logged_in.post(url + '/finalize')
+    assert response.status_code == 201
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    record = db.session.get(File, response.get_json()['id'])
+    assert (record.sha256, record.file_size, record.original_filename) == (sha256, len(CONTENT), 'lecture.pdf')
+    assert (uploads / record.filename).read_bytes() == CONTENT
+    assert UploadSession.query.count() == 0
+    assert os.listdir(uploads / 'partials') == []
+    assert logged_in.get(f'/upload/files/{record.id}').data == CONTENT
+
+
+def test_chunked_upload_deduplicates_with_regular_upload(logged_in, uploads):
+    """Тест: файл, собранный по частям, ссылается на уже сохранённый блоб"""
+    logged_in.post('/upload/upload', data={
+        'file': (io.BytesIO(CONTENT), 'lecture.pdf'),
+        'calendar_event_id': CalendarEvent.query.one().id
+    })
+    url = start(logged_in).headers['Location']
+    send(logged_in, url, 0, CONTENT)
+    assert logged_in.post(url + '/finalize').status_code == 201
+
+    assert db.session.get(FileBlob, hashlib.sha256(CONTENT).hexdigest()).ref_count == 2
+    assert File.query.count() == 2
+
+
+def test_chunked_upload_limits(app, logged_in):
+    """Тест: размер файла и частей ограничен, тип файла проверяется"""
+    app.config['CHUNKED_UPLOAD_MAX_SIZE'] = 1024
+    assert start(logged_in, length=1025).status_code == 413
+    assert start(logged_in, length=10, name='script.exe').status_code == 400
+
+    url = start(logged_in, length=10).headers['Location']
+    assert send(logged_in, url, 0, b'x' * 11).status_code == 413
+    assert logged_in.head(url).headers['Upload-Offset'] == '0'
+
+
+def test_session_belongs_to_owner(logged_in, client):
+    """Тест: чужая сессия загрузки недоступна"""
+    url = start(logged_in).headers['Location']
+    client.get('/auth/logout')
+    client.post('/auth/login', data={'username': 'other', 'password': 'testpass'})
+
+    assert client.head(url).status_code == 404
+    assert send(client, url, 0, b'x').status_code == 404
+    assert client.delete(url).status_code == 404
+
+
+def test_cleanup_removes_expired_sessions(app, logged_in, uploads):
+    """Тест: просроченные и отменённые загрузки удаляются вместе с частями"""
+    expired_url = start(logged_in).headers['Location']
+    send(logged_in, expired_url, 0, CONTENT[:100])
+    active_url = start(logged_in).headers['Location']
+    cancelled_url = start(logged_in).headers['Location']
+    assert logged_in.delete(cancelled_url).status_code == 204
+
+    expired = db.session.get(UploadSession, expired_url.rsplit('/', 1)[1])
+    expired.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert logged_in.head(expired_url).status_code == 404
+
+    assert cleanup_upload_sessions(app) == {'sessions': 1, 'files': 1}
+    active_id = active_url.rsplit('/', 1)[1]
+    assert [session.id for session in UploadSession.query.all()] == [active_id]
+    assert os.listdir(uploads / 'partials') == [os.path.basename(partial_path(active_id, app))]
+
+
+def test_late_duplicate_chunk_keeps_file_intact(app, logged_in, uploads):
+    """Тест: опоздавшая копия принятой части не обрезает файл, собранный позже"""
+    url = start(logged_in, length=300).headers['Location']
+    session = db.session.get(UploadSession, url.rsplit('/', 1)[1])
+    data = bytes(range(256)) + bytes(44)
+
+    # Запрос с частью A загрузил сессию (смещение 0) и завис; клиент не дождался
+    # ответа, переслал часть (B) и отправил следующую (C)
+    assert send(logged_in, url, 0, data[:100]).status_code == 204
+    assert send(logged_in, url, 100, data[100:200]).status_code == 204
+
+    # Тело A приходит последним и проходит первую проверку по устаревшей сессии
+    set_committed_value(session, 'offset', 0)
+    with pytest.raises(UploadConflict):
+        append_chunk(app, session, 0, io.BytesIO(data[:100]))
+    assert session.offset == 200
+    assert os.path.getsize(partial_path(session.id, app)) == 200
+
+    assert send(logged_in, url, 200, data[200:]).status_code == 204
+    response = logged_in.post(url + '/finalize')
+    assert response.status_code == 201
+    assert response.get_json()['sha256'] == hashlib.sha256(data).hexdigest()
+
+
+def test_finalize_checks_partial_file(app, logged_in, uploads):
+    """Тест: короткий частичный файл не завершается, смещение сводится к его размеру"""
+    url = start(logged_in, length=200).headers['Location']
+    send(logged_in, url, 0, b'a' * 200)
+    with open(partial_path(url.rsplit('/', 1)[1], app), 'r+b') as f:
+        f.truncate(120)
+
+    response = logged_in.post(url + '/finalize')
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 120
+    assert logged_in.head(url).headers['Upload-Offset'] == '120'
+    assert File.query.count() == 0
+
+    assert send(logged_in, url, 120, b'a' * 80).status_code == 204
+    assert logged_in.post(url + '/finalize').status_code == 201
@@ -88,3 +88,32 @@ def test_user_full_name_encryption(app):
         
         db.drop_all()
 
+
+
+def test_decrypt_many(app):
+    """Тест пакетной расшифровки: порядок, пустые и незашифрованные значения"""
+    from app.encryption import decrypt_many
+
+    with app.app_context():
+        names = ['Иванов Иван', 'Петров Пётр']
+        values = [encrypt_data(names[0]), '', 'plain text', encrypt_data(names[1])]
+
+        assert decrypt_many(values) == [names[0], '', 'plain text', names[1]]
+        assert decrypt_many([]) == []
+
+
+def test_cipher_is_cached_until_key_changes(app):
+    """Тест: Fernet строится один раз и пересоздаётся при смене ключа"""
+    from app.encryption import get_cipher
+
+    with app.app_context():
+        cipher = get_cipher()
+        assert get_cipher() is cipher
+
+        encrypted = encrypt_data('Иванов Иван')
+        app.config['ENCRYPTION_KEY'] = Fernet.generate_key().decode('utf-8')
+
+        assert get_cipher() is not cipher
+        assert encrypt_data('Иванов Иван') != encrypted
+        # Старый шифротекст новым ключом не расшифровывается
+        assert decrypt_data(encrypted) == encrypted
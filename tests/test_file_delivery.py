@@ -0,0 +1,93 @@
+"""Тесты отдачи загруженных файлов"""
+import os
+import io
+import hashlib
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from app.models import User, File, CalendarEvent
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+CONTENT = bytes(range(256)) * 64
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+
+
+@pytest.fixture
+def uploaded(app, client, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    for username in ('testuser', 'other'):
+        user = User(username=username, is_active=True)
+        user.set_full_name('Иванов Иван Иванович')
+        user.set_password('testpass')
+        db.session.add(user)
+    db.session.add(CalendarEvent(
+        event_id='e1', title='ОАиП (ЛК)',
+        start_time=datetime.utcnow() + timedelta(days=1), end_time=datetime.utcnow() + timedelta(days=1, hours=2)
+    ))
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'testpass'})
+    client.post('/upload/upload', data={
+        'file': (io.BytesIO(CONTENT), 'lecture.pdf'),
+        'calendar_event_id': CalendarEvent.query.one().id
+    })
+    return f'/upload/files/{File.query.one().id}'
+
+
+def test_direct_download_supports_ranges(client, uploaded):
+    """Тест: докачка по Range, If-Range с устаревшим ETag отдаёт файл целиком"""
+    response = client.get(uploaded)
+    assert response.data == CONTENT
+    assert response.headers['ETag'] == f'"{SHA256}"'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert 'private' in response.headers['Cache-Control']
+
+    partial = client.get(uploaded, headers={'Range': 'bytes=1000-', 'If-Range': f'"{SHA256}"'})
+    assert partial.status_code == 206
+    assert partial.data == CONTENT[1000:]
+    assert partial.headers['Content-Range'] == f'bytes 1000-{len(CONTENT) - 1}/{len(CONTENT)}'
+
+    changed = client.get(uploaded, headers={'Range': 'bytes=1000-', 'If-Range': '"stale"'})
+    assert changed.status_code == 200
+    assert changed.data == CONTENT
+
+    assert client.get(uploaded, headers={'If-None-Match': f'"{SHA256}"'}).status_code == 304
+
+
+def assert_proxy_sets_length(response):
+    """Длину и диапазоны выставляет прокси по самому файлу"""
+    for header in ('Content-Length', 'Content-Range', 'Accept-Ranges'):
+        assert header not in response.headers
+
+
+def test_x_accel_redirect(app, client, uploaded):
+    """Тест: nginx получает внутренний путь, тело не отдаётся"""
+    app.config['FILE_DELIVERY'] = 'x-accel'
+    response = client.get(uploaded, headers={'Range': 'bytes=1000-'})
+    assert response.status_code == 200
+    assert response.data == b''
+    assert response.headers['X-Accel-Redirect'] == f'/protected-uploads/blobs/{SHA256[:2]}/{SHA256[2:4]}/{SHA256}'
+    assert 'X-Sendfile' not in response.headers
+    assert 'lecture.pdf' in response.headers['Content-Disposition']
+    assert_proxy_sets_length(response)
+
+
+def test_x_sendfile(app, client, uploaded, tmp_path):
+    """Тест: Apache/Passenger получают абсолютный путь файла"""
+    app.config['FILE_DELIVERY'] = 'x-sendfile'
+    response = client.get(uploaded)
+    assert response.data == b''
+    assert response.headers['X-Sendfile'] == str(tmp_path / 'blobs' / SHA256[:2] / SHA256[2:4] / SHA256)
+    assert_proxy_sets_length(client.get(uploaded, headers={'Range': 'bytes=1000-'}))
+    assert_proxy_sets_length(response)
+
+
+def test_offload_keeps_permission_check(app, client, uploaded):
+    """Тест: чужой файл не отдаётся и через прокси"""
+    app.config['FILE_DELIVERY'] = 'x-accel'
+    client.get('/auth/logout')
+    client.post('/auth/login', data={'username': 'other', 'password': 'testpass'})
+    response = client.get(uploaded)
+    assert response.status_code == 302
+    assert 'X-Accel-Redirect' not in response.headers
@@ -0,0 +1,81 @@
+"""Тесты потокового разбора iCal"""
+import io
+from datetime import datetime, timedelta
+from app.ical_stream import iter_vevents, unfold_lines, parse_content_line
+
+LOCAL_OFFSET = timedelta(hours=3)
+WINDOW = (datetime(2025, 11, 1), datetime(2025, 12, 31))
+
+
+def parse(text):
+    lines = io.BytesIO(text.replace('\n', '\r\n').encode('utf-8'))
+    return list(iter_vevents(lines, *WINDOW, local_offset=LOCAL_OFFSET))
+
+
+def test_unfold_multibyte_continuation():
+    """Тест: склейка строк, разорванных внутри многобайтового символа"""
+    raw = 'SUMMARY:История Беларуси (ПЗ)'.encode('utf-8')
+    folded = [raw[:12] + b'\r\n', b' ' + raw[12:] + b'\r\n']
+
+    assert list(unfold_lines(folded)) == [raw]
+
+
+def test_parse_content_line_with_quoted_params():
+    """Тест: двоеточие и точка с запятой внутри кавычек параметров"""
+    name, params, value = parse_content_line(b'LOCATION;ALTREP="http://x;y:1":101-1')
+
+    assert name == b'LOCATION'
+    assert params['ALTREP'] == 'http://x;y:1'
+    assert value == b'101-1'
+
+
+def test_events_are_converted_and_filtered_by_window():
+    """Тест: события вне окна отбрасываются, время переводится в UTC+3"""
+    events = parse("""BEGIN:VCALENDAR
+BEGIN:VEVENT
+UID:in-window
+DTSTART:20251105T103500Z
+DTEND:20251105T115500Z
+SUMMARY:Физика (ЛР)
+DESCRIPTION:Преподаватель: Иванов\\nПодгруппа 1\\, 2
+LOCATION:101-1
+BEGIN:VALARM
+DESCRIPTION:Напоминание
+END:VALARM
+END:VEVENT
+BEGIN:VEVENT
+UID:old
+DTSTART:20240105T103500Z
+DTEND:20240105T115500Z
+SUMMARY:Прошлое занятие
+END:VEVENT
+END:VCALENDAR
+""")
+
+    assert len(events) == 1
+    event = events[0]
+    assert event['event_id'] == 'in-window'
+    assert event['title'] == 'Физика (ЛР)'
+    assert event['description'] == 'Преподаватель: Иванов\nПодгруппа 1, 2'
+    assert event['location'] == '101-1'
+    assert event['start_time'] == datetime(2025, 11, 5, 13, 35)
+    assert event['end_time'] == datetime(2025, 11, 5, 14, 55)
+    assert 'rrule' not in event
+
+
+def test_tzid_and_recurring_events():
+    """Тест: TZID переводится через UTC, повторяющееся событие выдаётся вне окна"""
+    events = parse("""BEGIN:VCALENDAR
+BEGIN:VEVENT
+UID:weekly
+DTSTART;TZID=Europe/Minsk:20250901T090000
+DTEND;TZID=Europe/Minsk:20250901T102000
+RRULE:FREQ=WEEKLY;UNTIL=20251225T000000Z
+SUMMARY:История Беларуси (ПЗ)
+END:VEVENT
+END:VCALENDAR
+""")
+
+    assert len(events) == 1
+    assert events[0]['start_time'] == datetime(2025, 9, 1, 9, 0)
+    assert events[0]['rrule'] == 'FREQ=WEEKLY;UNTIL=20251225T000000Z'
@@ -0,0 +1,90 @@
+"""Тесты смены ключа шифрования и перешифрования ФИО"""
+import os
+import pytest
+from cryptography.fernet import Fernet
+from app import db
+from app.models import User, KeyRotationState
+from app.encryption import get_decryption_keys, key_fingerprint
+from app.key_rotation import KeyRotation
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+NAMES = ['Иванов Иван', 'Петров Пётр', 'Сидоров Сидор', 'Козлов Олег', 'Орлова Анна']
+
+
+@pytest.fixture
+def old_key():
+    return Fernet.generate_key().decode('utf-8')
+
+
+@pytest.fixture
+def rotated_app(app, old_key):
+    """Пользователи зашифрованы old_key, затем ключ сменён на новый"""
+    app.config['ENCRYPTION_KEY'] = old_key
+    for number, name in enumerate(NAMES):
+        user = User(username=f'user{number}')
+        user.set_full_name(name)
+        user.set_password('testpass')
+        db.session.add(user)
+    db.session.commit()
+
+    app.config['ENCRYPTION_KEY'] = Fernet.generate_key().decode('utf-8')
+    app.config['ENCRYPTION_OLD_KEYS'] = old_key
+    return app
+
+
+def test_old_keys_are_used_for_decryption(rotated_app, old_key):
+    """Тест: после смены ключа ФИО читаются прежним ключом, новые пишутся текущим"""
+    assert [user.get_full_name() for user in User.query.order_by(User.id)] == NAMES
+
+    user = User.query.first()
+    user.set_full_name('Новое Имя')
+    Fernet(rotated_app.config['ENCRYPTION_KEY']).decrypt(user.full_name_encrypted.encode('utf-8'))
+
+    keys = get_decryption_keys(rotated_app.config)
+    assert keys[0] == rotated_app.config['ENCRYPTION_KEY'].encode('utf-8')
+    assert old_key.encode('utf-8') in keys
+
+
+def test_rotation_resumes_and_uses_only_primary_key(rotated_app):
+    """Тест: прерванный проход продолжается, после него хватает одного нового ключа"""
+    rotation = KeyRotation(rotated_app, chunk_size=2)
+    state = rotation.run(max_chunks=1)
+    assert (state.last_user_id, state.rows_done, state.rows_rotated) == (2, 2, 2)
+    assert state.finished_at is None
+
+    # Новый запуск (например, после перезапуска процесса) начинает с сохранённого места
+    state = KeyRotation(rotated_app, chunk_size=2).run()
+    assert (state.rows_total, state.rows_done, state.rows_rotated, state.rows_failed) == (5, 5, 5, 0)
+    assert state.finished_at is not None
+    assert state.rows_per_second is not None
+    assert KeyRotationState.query.count() == 1
+
+    primary = Fernet(rotated_app.config['ENCRYPTION_KEY'])
+    users = User.query.order_by(User.id).all()
+    assert [primary.decrypt(user.full_name_encrypted.encode('utf-8')).decode('utf-8')
+            for user in users] == NAMES
+
+    rotated_app.config['ENCRYPTION_OLD_KEYS'] = ''
+    assert [user.get_full_name() for user in users] == NAMES
+
+
+def test_rotation_skips_current_and_counts_unreadable(rotated_app, old_key):
+    """Тест: строки с текущим ключом не переписываются, нерасшифровываемые учитываются"""
+    user = User.query.first()
+    user.set_full_name('Уже новым ключом')
+    current_token = user.full_name_encrypted
+    db.session.execute(
+        db.update(User).where(User.id == 2).values(full_name_encrypted='не зашифровано')
+    )
+    db.session.commit()
+
+    state = KeyRotation(rotated_app).run()
+    assert (state.rows_done, state.rows_rotated, state.rows_failed) == (5, 3, 1)
+    assert db.session.get(User, 1).full_name_encrypted == current_token
+    assert state.key_fingerprint == key_fingerprint(rotated_app.config['ENCRYPTION_KEY'].encode('utf-8'))
+
+    # Повторный проход с начала: всё уже перешифровано
+    state = KeyRotation(rotated_app).run(restart=True)
+    assert (state.rows_done, state.rows_rotated, state.rows_failed) == (5, 0, 1)
@@ -0,0 +1,115 @@
+"""Тесты кэша расшифрованных ФИО"""
+import os
+import time
+from cryptography.fernet import Fernet
+from app import db
+from app.models import User
+from app.pii_cache import DecryptedCache, get_pii_cache, decrypt_full_names
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+
+def make_user(app, username, full_name):
+    user = User(username=username, is_active=True)
+    user.set_password('pass')
+    user.set_full_name(full_name)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def enable_cache(app, ttl=300):
+    app.config['ENCRYPTION_KEY'] = Fernet.generate_key().decode('utf-8')
+    app.config['PII_CACHE_ENABLED'] = True
+    app.config['PII_CACHE_TTL_SECONDS'] = ttl
+    return get_pii_cache(app)
+
+
+def test_cache_is_disabled_by_default(app):
+    """Тест: без PII_CACHE_ENABLED кэш не создаётся"""
+    user = make_user(app, 'u1', 'Иванов Иван')
+
+    assert user.get_full_name() == 'Иванов Иван'
+    assert get_pii_cache(app) is None
+    assert 'pii_cache' not in app.extensions
+
+
+def test_repeated_reads_hit_cache(app):
+    """Тест: повторное чтение ФИО берётся из кэша"""
+    cache = enable_cache(app)
+    user = make_user(app, 'u1', 'Иванов Иван')
+
+    assert [user.get_full_name() for _ in range(3)] == ['Иванов Иван'] * 3
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_set_full_name_invalidates(app):
+    """Тест: смена ФИО удаляет расшифрованное значение из кэша"""
+    cache = enable_cache(app)
+    user = make_user(app, 'u1', 'Иванов Иван')
+    user.get_full_name()
+
+    user.set_full_name('Петров Пётр')
+
+    assert len(cache) == 0
+    assert user.get_full_name() == 'Петров Пётр'
+
+
+def test_batch_decrypt_uses_cache(app):
+    """Тест: пакетная расшифровка расшифровывает только промахи"""
+    cache = enable_cache(app)
+    first = make_user(app, 'u1', 'Иванов Иван')
+    second = make_user(app, 'u2', 'Петров Пётр')
+    first.get_full_name()
+
+    names = decrypt_full_names([(user.id, user.full_name_encrypted) for user in (first, second)])
+
+    assert names == ['Иванов Иван', 'Петров Пётр']
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_decrypt_failures_are_not_cached(app):
+    """Тест: шифротекст, который не удалось расшифровать, не попадает в кэш"""
+    cache = enable_cache(app)
+    user = make_user(app, 'u1', 'Иванов Иван')
+    key = app.config['ENCRYPTION_KEY']
+
+    # Ключ на время потерян (неверная настройка, ротация без старого ключа)
+    app.config['ENCRYPTION_KEY'] = Fernet.generate_key().decode('utf-8')
+    assert user.get_full_name() == user.full_name_encrypted
+    assert decrypt_full_names([(user.id, user.full_name_encrypted)]) == [user.full_name_encrypted]
+    assert len(cache) == 0
+
+    app.config['ENCRYPTION_KEY'] = key
+    assert user.get_full_name() == 'Иванов Иван'
+    assert decrypt_full_names([(user.id, user.full_name_encrypted)]) == ['Иванов Иван']
+
+
+def test_lru_and_ttl_bounds():
+    """Тест: вытеснение по размеру и истечение по времени"""
+    cache = DecryptedCache(max_entries=2, ttl=0.05)
+    for user_id in (1, 2, 3):
+        cache.put(cache.make_key(user_id, f'token-{user_id}'), f'name-{user_id}')
+
+    assert len(cache) == 2
+    assert cache.get(cache.make_key(1, 'token-1')) is None
+    assert cache.get(cache.make_key(3, 'token-3')) == 'name-3'
+
+    time.sleep(0.06)
+    assert cache.get(cache.make_key(3, 'token-3')) is None
+    assert cache.stats()['expired'] == 1
+
+
+def test_admin_stats_endpoint(app, client):
+    """Тест: счётчики доступны администратору"""
+    enable_cache(app)
+    admin = make_user(app, 'admin', 'Администратор')
+    admin.is_admin = True
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'pass'})
+
+    data = client.get('/admin/pii_cache').get_json()
+
+    assert data['enabled'] is True
+    assert {'size', 'hits', 'misses', 'expired', 'hit_ratio'} <= set(data)
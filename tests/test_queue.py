@@ -86,3 +86,41 @@ def test_mark_answered(client, user, app):
     data_lower = response.data.lower()
     assert 'отмет'.encode('utf-8') in data_lower or b'mark' in data_lower or response.status_code == 200
 
+
+
+def test_queue_list_query_count_is_constant(client, user, app):
+    """Тест: число запросов /queue/api/list не зависит от длины очереди"""
+    from sqlalchemy import event as sa_event
+
+    client.post('/auth/login', data={
+        'username': 'testuser',
+        'password': 'testpass'
+    })
+
+    def count_queries(students):
+        for number in range(students):
+            student = User(username=f'student{len(User.query.all())}', is_active=True)
+            student.set_full_name(f'Студент {number}')
+            student.set_password('pass')
+            db.session.add(student)
+            db.session.flush()
+            db.session.add(QueueEntry(user_id=student.id, subject='ОАиП'))
+        db.session.commit()
+        # Как в новом запросе: объекты из прошлых запросов не кэшированы в сессии
+        db.session.expire_all()
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        sa_event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = client.get('/queue/api/list?subject=ОАиП')
+        finally:
+            sa_event.remove(db.engine, 'before_cursor_execute', listener)
+        assert response.status_code == 200
+        return len(response.get_json()), len(statements)
+
+    small_size, small_queries = count_queries(2)
+    large_size, large_queries = count_queries(30)
+
+    assert (small_size, large_size) == (2, 32)
+    assert small_queries == large_queries
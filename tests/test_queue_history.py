@@ -201,3 +201,21 @@ def test_get_history_dates(app, history_event):
         assert event_date in dates
         assert len(dates) > 0
 
+
+
+def test_get_history_dates_skips_started_classes(app):
+    """Тест: занятие, которое уже началось, в списке дат не предлагается"""
+    from app.queue_routes import get_history_dates
+    
+    now = datetime.utcnow()
+    with app.app_context():
+        for event_id, start in (('started', now - timedelta(hours=1)), ('upcoming', now + timedelta(days=2))):
+            db.session.add(CalendarEvent(
+                event_id=event_id,
+                title='История Беларуси (ПЗ)',
+                start_time=start,
+                end_time=start + timedelta(hours=2)
+            ))
+        db.session.commit()
+        
+        assert get_history_dates() == [(now + timedelta(days=2)).date()]
@@ -0,0 +1,217 @@
+"""Тесты живых обновлений очереди (SSE)"""
+import os
+import json
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from app.models import User, QueueEntry, QueueEvent, CalendarEvent
+from app.queue_events import QueueChannel, QueueBroadcaster, get_queue_bridge, get_queue_broadcaster
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+
+@pytest.fixture
+def logged_in(app, client):
+    user = User(username='testuser', is_active=True)
+    user.set_full_name('Иванов Иван Иванович')
+    user.set_password('testpass')
+    db.session.add(user)
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'testpass'})
+    app.config['QUEUE_SSE_ENABLED'] = True
+    app.config['QUEUE_STREAM_HEARTBEAT_SECONDS'] = 0.05
+    # Мост в тестах не запускает поток: журнал читается явным poll()
+    get_queue_bridge(app).poll()
+    return client
+
+
+def open_stream(client, query):
+    response = client.get(f'/queue/stream?{query}', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+    return response, chunks
+
+
+def parse_event(chunk):
+    fields = dict(line.split(': ', 1) for line in chunk.decode('utf-8').strip().split('\n'))
+    return fields['event'], json.loads(fields['data'])
+
+
+def test_queue_changes_are_streamed(app, logged_in):
+    """Тест: добавление и ответ приходят подписчику предмета"""
+    response, chunks = open_stream(logged_in, 'subject=ОАиП')
+    bridge = get_queue_bridge(app)
+
+    logged_in.post('/queue/add', data={'subject': 'ОАиП'})
+    assert bridge.poll() == 1
+    kind, entry = parse_event(next(chunks))
+    assert kind == 'joined'
+    assert entry['full_name'] == 'Иванов Иван Иванович'
+    assert entry['id'] == QueueEntry.query.one().id
+
+    logged_in.post(f"/queue/mark_answered/{entry['id']}")
+    bridge.poll()
+    assert parse_event(next(chunks)) == ('answered', {
+        'id': entry['id'], 'user_id': entry['user_id'], 'subject': 'ОАиП', 'event_date': None
+    })
+    assert QueueEvent.query.count() == 2
+    response.close()
+
+
+def test_history_stream_is_filtered_by_date(app, logged_in):
+    """Тест: подписчик даты истории не получает события других дат"""
+    start = datetime.utcnow() + timedelta(days=3)
+    for offset in (0, 1):
+        db.session.add(CalendarEvent(
+            event_id=f'h{offset}', title='История Беларуси (ПЗ)',
+            start_time=start + timedelta(days=offset), end_time=start + timedelta(days=offset, hours=2)
+        ))
+    db.session.commit()
+    first, second = (start.date() + timedelta(days=offset) for offset in (0, 1))
+    response, chunks = open_stream(logged_in, f'subject=История&date={second.isoformat()}')
+
+    logged_in.post('/queue/add', data={'subject': 'История', 'event_date': first.isoformat()})
+    logged_in.post('/queue/add', data={'subject': 'История', 'event_date': second.isoformat()})
+    get_queue_bridge(app).poll()
+
+    kind, entry = parse_event(next(chunks))
+    assert (kind, entry['event_date']) == ('joined', second.isoformat())
+    assert next(chunks) == b': keepalive\n\n'
+    response.close()
+
+
+def test_invalid_stream_parameters(logged_in):
+    """Тест: неверный предмет или дата - 400"""
+    assert logged_in.get('/queue/stream?subject=Физика').status_code == 400
+    assert logged_in.get('/queue/stream?subject=История&date=31.12.2025').status_code == 400
+    assert logged_in.get('/queue/stream?date=2025-12-31').status_code == 400
+
+
+def test_page_stream_carries_both_subjects(app, logged_in):
+    """Тест: поток без предмета получает изменения обеих очередей"""
+    start = datetime.utcnow() + timedelta(days=3)
+    db.session.add(CalendarEvent(
+        event_id='h1', title='История Беларуси (ПЗ)', start_time=start, end_time=start + timedelta(hours=2)
+    ))
+    db.session.commit()
+    response, chunks = open_stream(logged_in, 'after=0')
+
+    logged_in.post('/queue/add', data={'subject': 'ОАиП'})
+    logged_in.post('/queue/add', data={'subject': 'История', 'event_date': start.date().isoformat()})
+    get_queue_bridge(app).poll()
+
+    events = [chunk + b'\n\n' for chunk in next(chunks).split(b'\n\n') if chunk]
+    assert [parse_event(event)[1]['subject'] for event in events] == ['ОАиП', 'История']
+    response.close()
+
+
+def test_sync_workers_poll_instead_of_streaming(app, logged_in):
+    """Тест: без асинхронного воркера поток выключен, страница опрашивает список"""
+    app.config['QUEUE_SSE_ENABLED'] = None
+    assert logged_in.get('/queue/stream').status_code == 404
+    page = logged_in.get('/queue/').data.decode('utf-8')
+    assert '/queue/api/list' in page
+    assert 'connectQueueStream();' not in page
+
+    logged_in.post('/queue/add', data={'subject': 'ОАиП'})
+    entry = logged_in.get('/queue/api/list?subject=ОАиП').get_json()[0]
+    assert entry['user_id'] == User.query.one().id
+
+
+def test_channel_resumes_after_last_event_id():
+    """Тест: переподключение продолжает с Last-Event-ID или требует сброса"""
+    channel = QueueChannel(size=2)
+    for event_id in (10, 11, 12):
+        channel.publish(event_id, f'{event_id}'.encode())
+
+    assert channel.cursor_after(11) == 2
+    assert [event[1] for event in channel.wait(channel.cursor_after(11), 0)] == [12]
+    assert channel.cursor_after(10) == 1
+    # Событие 10 вытеснено из буфера: продолжить после 9 нельзя
+    assert channel.cursor_after(9) is None
+    assert channel.wait(0, 0) is None
+
+
+def test_broadcaster_sends_reset_and_counts_subscribers():
+    """Тест: пропущенные события дают reset, подписчики учитываются"""
+    broadcaster = QueueBroadcaster(buffer_size=1)
+    for event_id in (1, 2):
+        broadcaster.publish([('ОАиП', None)], event_id, b'x')
+
+    stream = broadcaster.stream(('ОАиП', None), last_event_id=0, heartbeat=0)
+    next(stream)
+    assert broadcaster.subscribers == 1
+    assert next(stream).startswith(b'event: reset')
+    assert next(stream) == b': keepalive\n\n'
+    stream.close()
+    assert broadcaster.subscribers == 0
+
+
+def add_event(event_id, entry_id):
+    db.session.add(QueueEvent(
+        id=event_id, subject='ОАиП', kind='left', entry_id=entry_id, user_id=1, created_at=datetime.utcnow()
+    ))
+    db.session.commit()
+
+
+def test_bridge_publishes_rows_committed_out_of_order(app, logged_in):
+    """Тест: строка с меньшим id, закоммиченная позже, всё равно рассылается"""
+    response, chunks = open_stream(logged_in, 'subject=ОАиП')
+    bridge = get_queue_bridge(app)
+    start = bridge.cursor
+
+    # Транзакция с id start + 1 ещё не завершена, а start + 2 уже видна
+    add_event(start + 2, 2)
+    assert bridge.poll() == 1
+    assert parse_event(next(chunks))[1]['id'] == 2
+    assert bridge.gaps.keys() == {start + 1}
+
+    add_event(start + 1, 1)
+    assert bridge.poll() == 1
+    assert parse_event(next(chunks))[1]['id'] == 1
+    assert bridge.gaps == {}
+    assert bridge.poll() == 0
+
+    # Переподключение после опоздавшего события не повторяет уже полученные
+    channel = get_queue_broadcaster(app).channel(('ОАиП', None))
+    assert channel.wait(channel.cursor_after(start + 1), 0) == []
+    response.close()
+
+
+def test_bridge_forgets_gaps_after_timeout(app, logged_in):
+    """Тест: номер, который так и не появился (откат), перестаёт перечитываться"""
+    bridge = get_queue_bridge(app)
+    bridge.gap_timeout = 0
+    add_event(bridge.cursor + 2, 2)
+    bridge.poll()
+    bridge.poll()
+    assert bridge.gaps == {}
+
+
+def test_reconnect_older_than_bridge_start_gets_reset(app, client):
+    """Тест: Last-Event-ID раньше запуска моста (другой воркер, перезапуск) - reset"""
+    user = User(username='testuser', is_active=True)
+    user.set_full_name('Иванов Иван Иванович')
+    user.set_password('testpass')
+    db.session.add(user)
+    db.session.commit()
+    for event_id in (1, 2, 3):
+        add_event(event_id, event_id)
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'testpass'})
+    app.config['QUEUE_SSE_ENABLED'] = True
+    app.config['QUEUE_STREAM_HEARTBEAT_SECONDS'] = 0.05
+
+    # Страница очереди запускает мост до того, как отдаёт свой курсор
+    assert b'?after=3' in client.get('/queue/').data
+    assert get_queue_bridge(app).cursor == 3
+
+    response, chunks = open_stream(client, 'subject=ОАиП&after=1')
+    assert next(chunks).startswith(b'event: reset')
+    response.close()
+
+    response, chunks = open_stream(client, 'subject=ОАиП&after=3')
+    assert next(chunks) == b': keepalive\n\n'
+    response.close()
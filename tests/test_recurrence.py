@@ -0,0 +1,118 @@
+"""Тесты развёртывания повторяющихся событий"""
+import os
+from datetime import datetime, timedelta
+from app import db
+from app.models import CalendarEvent, CalendarSeries
+from app.calendar_routes import parse_ical_events, LOCAL_TIMEZONE_OFFSET
+from app.calendar_sync import expand_recurring, sync_calendar_events
+from app.recurrence import expand_series
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+WINDOW = (datetime(2025, 11, 1), datetime(2025, 12, 31))
+
+WEEKLY = """BEGIN:VEVENT
+UID:weekly-history
+DTSTART;TZID=Europe/Minsk:20250901T090000
+DTEND;TZID=Europe/Minsk:20250901T102000
+RRULE:FREQ=WEEKLY;UNTIL=20251222T235959Z
+EXDATE;TZID=Europe/Minsk:20251110T090000
+SUMMARY:История Беларуси (ПЗ)
+LOCATION:101-1
+END:VEVENT
+BEGIN:VEVENT
+UID:weekly-history
+RECURRENCE-ID;TZID=Europe/Minsk:20251117T090000
+DTSTART;TZID=Europe/Minsk:20251118T120000
+DTEND;TZID=Europe/Minsk:20251118T132000
+SUMMARY:История Беларуси (ПЗ)
+LOCATION:202-2
+END:VEVENT
+BEGIN:VEVENT
+UID:weekly-history
+RECURRENCE-ID;TZID=Europe/Minsk:20251124T090000
+DTSTART;TZID=Europe/Minsk:20251124T090000
+DTEND;TZID=Europe/Minsk:20251124T102000
+STATUS:CANCELLED
+SUMMARY:История Беларуси (ПЗ)
+END:VEVENT
+"""
+
+
+def parse(events):
+    ics = 'BEGIN:VCALENDAR\n' + events + 'END:VCALENDAR\n'
+    return parse_ical_events(ics.replace('\n', '\r\n').encode('utf-8'), *WINDOW)
+
+
+def test_expand_weekly_with_exceptions():
+    """Тест: EXDATE исключает вхождение, RECURRENCE-ID переносит, CANCELLED отменяет"""
+    records = parse(WEEKLY)
+    master = next(r for r in records if 'rrule' in r)
+    overrides = [r for r in records if 'recurrence_id' in r]
+
+    rows = expand_series(master, overrides, *WINDOW, LOCAL_TIMEZONE_OFFSET)
+    starts = {row['occurrence_start']: row for row in rows}
+
+    assert datetime(2025, 11, 3, 9, 0) in starts
+    assert datetime(2025, 11, 10, 9, 0) not in starts
+    assert datetime(2025, 11, 24, 9, 0) not in starts
+    moved = starts[datetime(2025, 11, 17, 9, 0)]
+    assert moved['start_time'] == datetime(2025, 11, 18, 12, 0)
+    assert moved['location'] == '202-2'
+    assert moved['event_id'] == 'weekly-history_20251117T090000'
+    # Ноябрь-декабрь: 8 понедельников до 22.12 минус исключённое и отменённое
+    assert len(rows) == 6
+
+
+def test_expand_keeps_local_time_across_dst():
+    """Тест: вхождения считаются по местному времени серии и после перехода на зимнее время"""
+    records = parse("""BEGIN:VEVENT
+UID:berlin
+DTSTART;TZID=Europe/Berlin:20251020T100000
+DTEND;TZID=Europe/Berlin:20251020T110000
+RRULE:FREQ=WEEKLY;COUNT=4
+SUMMARY:Семинар
+END:VEVENT
+""")
+
+    rows = expand_series(records[0], [], datetime(2025, 10, 1), WINDOW[1], LOCAL_TIMEZONE_OFFSET)
+
+    # Переход на зимнее время 26.10: 10:00 CEST = 11:00 по Минску, 10:00 CET = 12:00
+    assert [row['start_time'].hour for row in rows] == [11, 12, 12, 12]
+
+
+def test_sync_expands_only_new_part_of_window(app):
+    """Тест: неизменённая серия при сдвиге окна разворачивается только в новой части"""
+    records = parse(WEEKLY)
+    rows, kept = expand_recurring(records, *WINDOW, LOCAL_TIMEZONE_OFFSET)
+    result = sync_calendar_events(rows, *WINDOW, kept_series=kept)
+
+    assert result.inserted == 6
+    assert not kept
+    assert CalendarSeries.query.one().expanded_until == WINDOW[1]
+
+    # Окно сдвинулось на неделю: разворачивается только хвост, старые вхождения не удаляются
+    shifted = (WINDOW[0] + timedelta(days=7), WINDOW[1] + timedelta(days=7))
+    rows, kept = expand_recurring(records, *shifted, LOCAL_TIMEZONE_OFFSET)
+    result = sync_calendar_events(rows, *shifted, kept_series=kept)
+
+    assert kept == {'weekly-history'}
+    assert len(rows) <= 1
+    assert result.deleted == 0
+    assert CalendarEvent.query.filter_by(series_uid='weekly-history').count() == 6
+
+
+def test_changed_series_is_reexpanded(app):
+    """Тест: новое исключение в серии удаляет вхождение из кэша"""
+    rows, kept = expand_recurring(parse(WEEKLY), *WINDOW, LOCAL_TIMEZONE_OFFSET)
+    sync_calendar_events(rows, *WINDOW, kept_series=kept)
+
+    changed = WEEKLY.replace('EXDATE;TZID=Europe/Minsk:20251110T090000',
+                             'EXDATE;TZID=Europe/Minsk:20251110T090000,20251201T090000')
+    rows, kept = expand_recurring(parse(changed), *WINDOW, LOCAL_TIMEZONE_OFFSET)
+    result = sync_calendar_events(rows, *WINDOW, kept_series=kept)
+
+    assert not kept
+    assert result.deleted == 1
+    assert db.session.query(CalendarEvent).filter_by(occurrence_start=datetime(2025, 12, 1, 9, 0)).count() == 0
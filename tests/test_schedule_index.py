@@ -0,0 +1,98 @@
+"""Тесты индекса расписания по дням"""
+import os
+import pytest
+from datetime import datetime, date, timedelta
+from sqlalchemy import event as sa_event
+from app import db
+from app.models import CalendarEvent
+from app.schedule_index import ScheduleEvent, ScheduleIndex, get_schedule_index
+from app.calendar_routes import update_calendar_cache, LOCAL_TIMEZONE_OFFSET
+from tests.test_calendar_fetch import feed_server  # noqa: F401 (фикстура)
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+
+def make_event(event_id, start, title='Занятие'):
+    return ScheduleEvent(event_id, f'uid-{event_id}', 'default', title, start, start + timedelta(minutes=80), '', '')
+
+
+@pytest.fixture
+def index():
+    monday = datetime(2025, 11, 3)
+    events = [
+        make_event(3, monday + timedelta(hours=13, minutes=25), 'Физика (ЛР)'),
+        make_event(1, monday + timedelta(hours=9), 'История Беларуси (ПЗ)'),
+        make_event(2, monday + timedelta(hours=10, minutes=35)),
+        make_event(4, monday + timedelta(days=2, hours=9)),
+    ]
+    return ScheduleIndex(events)
+
+
+def test_index_day_and_range_lookups(index):
+    """Тест: события дня и диапазона возвращаются отсортированными"""
+    assert [event.id for event in index.day(date(2025, 11, 3))] == [1, 2, 3]
+    assert index.day(date(2025, 11, 4)) == ()
+    assert index.days() == [date(2025, 11, 3), date(2025, 11, 5)]
+    assert index.days(date(2025, 11, 4)) == [date(2025, 11, 5)]
+    window = index.between(datetime(2025, 11, 3, 10), datetime(2025, 11, 5, 9))
+    assert [event.id for event in window] == [2, 3, 4]
+    assert index.get(3).title == 'Физика (ЛР)'
+
+
+def test_index_groups_by_day(index):
+    """Тест: группировка по дням для бота"""
+    groups = index.group_by_day(datetime(2025, 11, 3), datetime(2025, 11, 6))
+
+    assert list(groups) == [date(2025, 11, 3), date(2025, 11, 5)]
+    assert [event.id for event in groups[date(2025, 11, 3)]] == [1, 2, 3]
+
+
+def test_index_lookups_do_not_query_database(app):
+    """Тест: после построения индекс отвечает без запросов к БД"""
+    start = datetime.utcnow() + LOCAL_TIMEZONE_OFFSET + timedelta(days=1)
+    db.session.add(CalendarEvent(event_id='e1', title='Занятие', start_time=start, end_time=start + timedelta(hours=1)))
+    db.session.commit()
+    get_schedule_index(app)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    sa_event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        for _ in range(10):
+            events = get_schedule_index(app).between(start - timedelta(hours=1), start + timedelta(days=1))
+    finally:
+        sa_event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert [event.event_id for event in events] == ['e1']
+    assert statements == []
+
+
+def test_sync_rebuilds_index(app, feed_server):
+    """Тест: синхронизация сразу перестраивает индекс процесса"""
+    assert len(get_schedule_index(app)) == 0
+
+    update_calendar_cache()
+
+    index = get_schedule_index(app)
+    assert len(index) == 1
+    assert index.generation == (('default', 1),)
+
+
+def test_bot_formats_day_from_index(app):
+    """Тест: бот форматирует день из индекса по сохранённым ID"""
+    from telegram_bot.bot import format_schedule_day
+
+    start = (datetime.utcnow() + LOCAL_TIMEZONE_OFFSET + timedelta(days=1)).replace(hour=9, minute=0)
+    for offset, title in ((timedelta(hours=2), 'Физика (ЛР)'), (timedelta(0), 'История Беларуси (ПЗ)')):
+        db.session.add(CalendarEvent(
+            event_id=title, title=title, start_time=start + offset, end_time=start + offset + timedelta(hours=1)
+        ))
+    db.session.commit()
+    groups = get_schedule_index(app).group_by_day(start - timedelta(hours=1), start + timedelta(days=1))
+    serialized = {day.isoformat(): [event.id for event in events] for day, events in groups.items()}
+
+    message, keyboard, day_info = format_schedule_day(serialized, 0)
+
+    assert day_info == (0, 1)
+    assert [row[0].text for row in keyboard] == ['09:00 - История Беларуси (ПЗ)', '11:00 - Физика (ЛР)']
@@ -0,0 +1,102 @@
+"""Тесты фонового планировщика"""
+import os
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from app.models import User, SchedulerJobState
+from app.scheduler import FileLock, Job, Scheduler
+from app.calendar_routes import fetch_events_from_google
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+
+@pytest.fixture
+def lock_path(tmp_path):
+    return str(tmp_path / 'scheduler.lock')
+
+
+def test_file_lock_elects_single_leader(lock_path):
+    """Тест: файловую блокировку удерживает только один владелец"""
+    first = FileLock(lock_path)
+    second = FileLock(lock_path)
+
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_only_leader_runs_jobs(app, lock_path):
+    """Тест: процесс без блокировки не запускает задачи"""
+    calls = []
+    leader = Scheduler(app, lock=FileLock(lock_path))
+    follower = Scheduler(app, lock=FileLock(lock_path))
+    for scheduler in (leader, follower):
+        scheduler.add_job(Job('calendar_sync', lambda: calls.append(1), interval=3600))
+
+    leader.tick()
+    follower.tick()
+
+    assert leader.is_leader and not follower.is_leader
+    assert len(calls) == 1
+    state = SchedulerJobState.query.filter_by(name='calendar_sync').one()
+    assert state.last_status == 'ok'
+    assert state.next_run_at > datetime.utcnow() + timedelta(minutes=50)
+    leader.stop()
+
+
+def test_failed_job_backs_off(app, lock_path):
+    """Тест: после ошибок пауза растёт экспоненциально, статус сохраняется"""
+    def failing():
+        raise RuntimeError('feed unavailable')
+
+    scheduler = Scheduler(app, lock=FileLock(lock_path))
+    job = scheduler.add_job(Job('calendar_sync', failing, interval=3600, jitter=0, retry_base=60))
+
+    delays = []
+    for _ in range(3):
+        state = scheduler.run_job(job)
+        delays.append((state.next_run_at - state.last_finished_at).total_seconds())
+
+    assert state.last_status == 'error'
+    assert state.last_error == 'feed unavailable'
+    assert state.consecutive_failures == 3
+    assert [round(delay) for delay in delays] == [60, 120, 240]
+
+
+def test_jitter_stays_within_bounds():
+    """Тест: разброс интервала не выходит за заданную долю"""
+    job = Job('calendar_sync', lambda: None, interval=1000, jitter=0.1)
+
+    delays = [job.next_delay() for _ in range(200)]
+
+    assert all(900 <= delay <= 1100 for delay in delays)
+
+
+def test_request_path_does_not_fetch(app, monkeypatch):
+    """Тест: пустой кэш не вызывает загрузку feed в обработке запроса"""
+    def forbidden(*args, **kwargs):
+        raise AssertionError('feed fetched on request path')
+
+    monkeypatch.setattr('app.calendar_routes.sync_calendar_cache', forbidden)
+    monkeypatch.setattr('app.calendar_routes.update_calendar_cache', forbidden)
+
+    assert fetch_events_from_google() == []
+
+
+def test_admin_status_endpoint(app, client):
+    """Тест: администратор видит статус последнего запуска"""
+    admin = User(username='admin', is_active=True, is_admin=True)
+    admin.set_full_name('Администратор Админ Админович')
+    admin.set_password('adminpass')
+    db.session.add(admin)
+    db.session.add(SchedulerJobState(name='calendar_sync', last_status='ok', consecutive_failures=0))
+    db.session.commit()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'adminpass'})
+
+    data = client.get('/admin/scheduler').get_json()
+
+    assert data['jobs'][0]['name'] == 'calendar_sync'
+    assert data['jobs'][0]['last_status'] == 'ok'
@@ -0,0 +1,115 @@
+"""Тесты классификации событий по предмету и типу занятия"""
+import os
+from datetime import datetime, date, timedelta
+from sqlalchemy import event as sqlalchemy_event
+from app import db
+from app.models import CalendarEvent
+from app.subjects import SubjectRules, get_subject_rules, reclassify_events
+from app.calendar_sync import sync_calendar_events
+from app.calendar_routes import LOCAL_TIMEZONE_OFFSET
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+
+def make_record(event_id, title, start):
+    return {
+        'event_id': event_id,
+        'title': title,
+        'start_time': start,
+        'end_time': start + timedelta(minutes=80),
+        'description': '',
+        'location': ''
+    }
+
+
+def test_default_rules_classify_titles():
+    """Тест: предмет и тип занятия по названию без учёта регистра"""
+    rules = SubjectRules()
+
+    assert rules.classify('История Беларуси (ПЗ)') == ('История', 'ПЗ')
+    assert rules.classify('ИстБг (ЛК)') == ('История', 'ЛК')
+    assert rules.classify('ОАиП (ЛР)') == ('ОАиП', 'ЛР')
+    assert rules.classify('Физика (ЛР)') == (None, 'ЛР')
+    assert rules.classify('Кураторский час') == (None, None)
+
+
+def test_rules_from_config(app):
+    """Тест: правила задаются в конфигурации JSON-строкой"""
+    app.config['SUBJECT_RULES'] = '{"Физика": ["физика"]}'
+    app.extensions.pop('subject_rules', None)
+
+    rules = get_subject_rules()
+
+    assert rules.classify('Физика (ЛР)') == ('Физика', 'ЛР')
+    assert rules.classify('История Беларуси (ПЗ)') == (None, 'ПЗ')
+
+
+def test_sync_stores_classification(app):
+    """Тест: синхронизация записывает предмет, тип и дату в колонки"""
+    start = datetime(2025, 11, 3, 9, 0)
+    records = [make_record('e1', 'История Беларуси (ПЗ)', start), make_record('e2', 'Физика (ЛК)', start)]
+
+    sync_calendar_events(records, start - timedelta(days=1), start + timedelta(days=1))
+
+    event = CalendarEvent.query.filter_by(event_id='e1').one()
+    assert (event.subject, event.lesson_type, event.event_date) == ('История', 'ПЗ', date(2025, 11, 3))
+    assert CalendarEvent.query.filter_by(event_id='e2').one().lesson_type == 'ЛК'
+
+
+def test_history_dates_use_covering_index(app):
+    """Тест: даты истории выбираются из индекса без чтения таблицы"""
+    from app.queue_routes import get_history_dates
+
+    today = (datetime.utcnow() + LOCAL_TIMEZONE_OFFSET).replace(hour=9, minute=0, second=0, microsecond=0)
+    records = [
+        make_record('h1', 'История Беларуси (ПЗ)', today + timedelta(days=2)),
+        make_record('h2', 'История Беларуси (ПЗ)', today + timedelta(days=2, hours=2)),
+        make_record('h3', 'История Беларуси (ЛК)', today + timedelta(days=3)),
+        make_record('h4', 'История Беларуси (ПЗ)', today + timedelta(days=9)),
+        make_record('p1', 'Физика (ПЗ)', today + timedelta(days=4)),
+    ]
+    sync_calendar_events(records, today - timedelta(days=1), today + timedelta(days=60))
+
+    # План строится для запроса, который действительно выполняет get_history_dates
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    sqlalchemy_event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        assert get_history_dates() == [(today + timedelta(days=2)).date(), (today + timedelta(days=9)).date()]
+    finally:
+        sqlalchemy_event.remove(db.engine, 'before_cursor_execute', capture)
+
+    [(statement, parameters)] = [item for item in statements if 'calendar_events' in item[0]]
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+    plan = ' '.join(row[-1] for row in rows)
+    assert 'COVERING INDEX idx_calendar_events_subject_type_date' in plan
+
+
+def test_orm_inserts_are_classified(app):
+    """Тест: события, добавленные через ORM, тоже классифицируются"""
+    event = CalendarEvent(
+        event_id='orm', title='ОАиП (ЛР)',
+        start_time=datetime(2025, 11, 5, 13, 25), end_time=datetime(2025, 11, 5, 14, 45)
+    )
+    db.session.add(event)
+    db.session.commit()
+
+    assert (event.subject, event.lesson_type, event.event_date) == ('ОАиП', 'ЛР', date(2025, 11, 5))
+
+
+def test_reclassify_after_rules_change(app):
+    """Тест: пересчёт классификации меняет только затронутые строки"""
+    start = datetime(2025, 11, 3, 9, 0)
+    records = [make_record('e1', 'Физика (ЛР)', start), make_record('e2', 'История Беларуси (ПЗ)', start)]
+    sync_calendar_events(records, start - timedelta(days=1), start + timedelta(days=1))
+
+    rules = SubjectRules({'Физика': ['физика'], 'История': ['история']})
+    assert reclassify_events(rules) == 1
+    db.session.commit()
+
+    assert CalendarEvent.query.filter_by(event_id='e1').one().subject == 'Физика'
+    assert reclassify_events(rules) == 0
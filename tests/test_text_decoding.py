@@ -0,0 +1,80 @@
+"""Тесты декодирования текстовых полей iCal"""
+from datetime import datetime, timedelta
+from app.text_decoding import FeedDecoder, looks_like_mojibake, repair_mojibake, detect_encoding
+from app.calendar_routes import parse_ical_events, LOCAL_TIMEZONE_OFFSET
+
+TITLE = 'История Беларуси (ПЗ)'
+
+
+def test_utf8_text_is_decoded_without_repair():
+    """Тест: корректный UTF-8 (в том числе "Рё", похожее на mojibake) не изменяется"""
+    decoder = FeedDecoder()
+
+    assert decoder(TITLE.encode('utf-8')) == TITLE
+    assert decoder('Рёбра жёсткости'.encode('utf-8')) == 'Рёбра жёсткости'
+    assert decoder(b'101-1') == '101-1'
+    assert decoder.repaired == 0
+
+
+def test_mojibake_is_repaired():
+    """Тест: UTF-8, прочитанный как latin-1, cp1252 или cp1251, восстанавливается"""
+    decoder = FeedDecoder()
+
+    # В cp1252 и cp1251 определены не все байты 0x80-0x9F, поэтому название без "И" и "С"
+    title = 'Физика (ЛР)'
+    for encoding in ('latin-1', 'cp1252', 'cp1251'):
+        broken = title.encode('utf-8').decode(encoding)
+        assert looks_like_mojibake(broken)
+        assert decoder(broken.encode('utf-8')) == title
+    assert decoder.repaired == 3
+
+
+def test_cp1251_document_detected_once():
+    """Тест: документ не в UTF-8 переключает кодировку один раз для всех полей"""
+    decoder = FeedDecoder()
+
+    assert decoder(TITLE.encode('cp1251')) == TITLE
+    assert decoder.encoding == 'cp1251'
+    assert decoder('Физика (ЛР)'.encode('cp1251')) == 'Физика (ЛР)'
+
+
+def test_charset_from_header_and_param():
+    """Тест: charset из Content-Type и параметр CHARSET свойства"""
+    assert detect_encoding('windows-1251') == 'cp1251'
+    assert detect_encoding('unknown-charset') == 'utf-8'
+
+    decoder = FeedDecoder('koi8-r')
+    assert decoder(TITLE.encode('koi8-r')) == TITLE
+    assert decoder(TITLE.encode('cp1251'), {'CHARSET': 'windows-1251'}) == TITLE
+
+
+def test_repair_is_memoized():
+    """Тест: исправление повторяющихся названий берётся из кэша"""
+    broken = 'Физика (ЛР)'.encode('utf-8').decode('latin-1')
+    repair_mojibake(broken)
+    hits = repair_mojibake.cache_info().hits
+
+    assert repair_mojibake(broken) == 'Физика (ЛР)'
+    assert repair_mojibake.cache_info().hits == hits + 1
+
+
+def test_parse_ical_events_uses_feed_charset():
+    """Тест: feed в cp1251 с charset из заголовка разбирается без потерь"""
+    start = datetime.utcnow() + timedelta(days=1)
+    ics = '\r\n'.join([
+        'BEGIN:VCALENDAR',
+        'BEGIN:VEVENT',
+        'UID:cp1251-event',
+        f"DTSTART:{start.strftime('%Y%m%dT%H%M%SZ')}",
+        f"DTEND:{(start + timedelta(hours=1)).strftime('%Y%m%dT%H%M%SZ')}",
+        f"SUMMARY:{TITLE}",
+        'LOCATION:Корпус 1',
+        'END:VEVENT',
+        'END:VCALENDAR',
+    ]).encode('cp1251')
+    now = datetime.utcnow() + LOCAL_TIMEZONE_OFFSET
+
+    records = parse_ical_events(ics, now, now + timedelta(days=60), charset='windows-1251')
+
+    assert records[0]['title'] == TITLE
+    assert records[0]['location'] == 'Корпус 1'
@@ -107,3 +107,36 @@ def test_upload_without_event(client, user):
     data_lower = response.data.lower()
     assert response.status_code != 200 or 'занятие'.encode('utf-8') in data_lower or b'event' in data_lower or 'необходимо'.encode('utf-8') in data_lower
 
+
+
+def test_upload_is_streamed_with_checksum(client, user, calendar_event, app, tmp_path):
+    """Тест: файл записывается в каталог загрузок с размером и SHA-256, без временных файлов"""
+    import hashlib
+    import io
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'testpass'})
+    content = os.urandom(300 * 1024)
+
+    client.post('/upload/upload', data={
+        'file': (io.BytesIO(content), 'lecture.pdf'),
+        'calendar_event_id': CalendarEvent.query.one().id
+    })
+
+    record = File.query.one()
+    assert record.file_size == len(content)
+    assert record.sha256 == hashlib.sha256(content).hexdigest()
+    # Временный файл переименован в хранилище блобов, в корне каталога ничего не осталось
+    assert os.listdir(tmp_path) == ['blobs']
+    assert (tmp_path / record.filename).read_bytes() == content
+
+
+def test_rejected_upload_leaves_no_partial_file(client, user, app, tmp_path):
+    """Тест: файл отклонённой загрузки удаляется при закрытии запроса"""
+    import io
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'testpass'})
+
+    client.post('/upload/upload', data={'file': (io.BytesIO(b'x' * 1024), 'test.txt')})
+
+    assert File.query.count() == 0
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,118 @@
+"""Тесты денормализованных счётчиков пользователя"""
+import os
+import pytest
+from app import db
+from app.models import User, UserStats, QueueEntry, Task, File
+from app.user_stats import get_user_stats, reconcile_user_stats
+
+# Устанавливаем SQLite для тестов
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='testuser', is_active=True)
+    user.set_full_name('Иванов Иван Иванович')
+    user.set_password('testpass')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def logged_in(client, user):
+    client.post('/auth/login', data={'username': 'testuser', 'password': 'testpass'})
+    return client
+
+
+def stats(user_id):
+    # Счётчики меняются в обход объектов сессии: читаем свежие значения
+    db.session.expire_all()
+    return get_user_stats(user_id)
+
+
+def test_new_user_has_zero_counters(user):
+    """Тест: строка счётчиков создаётся вместе с пользователем"""
+    assert db.session.get(UserStats, user.id) is not None
+    assert stats(user.id) == {'open_queue_count': 0, 'open_tasks_count': 0, 'files_count': 0}
+
+
+def test_queue_counter_follows_routes(logged_in, user):
+    """Тест: запись в очередь, выход из очереди и ответ меняют счётчик"""
+    logged_in.post('/queue/add', data={'subject': 'ОАиП'})
+    assert stats(user.id)['open_queue_count'] == 1
+
+    logged_in.post(f'/queue/remove/{QueueEntry.query.one().id}')
+    assert QueueEntry.query.count() == 0
+    assert stats(user.id)['open_queue_count'] == 0
+
+    logged_in.post('/queue/add', data={'subject': 'ОАиП'})
+    logged_in.post(f'/queue/mark_answered/{QueueEntry.query.one().id}')
+    assert stats(user.id)['open_queue_count'] == 0
+
+
+def test_home_page_shows_counters(logged_in, user):
+    """Тест: главная страница показывает счётчики пользователя из user_stats"""
+    logged_in.post('/queue/add', data={'subject': 'ОАиП'})
+    page = logged_in.get('/').data.decode('utf-8')
+    assert 'Ваши записи в очереди: 1' in page
+    assert 'незавершённые задачи: 0' in page
+
+
+def test_task_counter_follows_toggle_and_delete(logged_in, user):
+    """Тест: добавление, переключение и удаление задачи"""
+    for title in ('Лабораторная', 'Реферат'):
+        logged_in.post('/todo/add', data={'title': title, 'due_date': '2026-12-01T10:00'})
+    assert stats(user.id)['open_tasks_count'] == 2
+
+    task_id = Task.query.filter_by(title='Лабораторная').one().id
+    assert logged_in.post(f'/todo/toggle/{task_id}').get_json() == {'completed': True}
+    assert stats(user.id)['open_tasks_count'] == 1
+    logged_in.post(f'/todo/toggle/{task_id}')
+    assert stats(user.id)['open_tasks_count'] == 2
+
+    logged_in.post(f'/todo/delete/{task_id}')
+    assert stats(user.id)['open_tasks_count'] == 1
+
+
+def test_files_counter_and_user_delete(user):
+    """Тест: файлы (веб и бот пишут их через ORM) и удаление пользователя"""
+    for number in range(3):
+        db.session.add(File(user_id=user.id, filename=f'{number}.pdf', original_filename='a.pdf', file_type='document'))
+    db.session.commit()
+    assert stats(user.id)['files_count'] == 3
+
+    db.session.delete(File.query.first())
+    db.session.commit()
+    assert stats(user.id)['files_count'] == 2
+
+    db.session.delete(user)
+    db.session.commit()
+    assert UserStats.query.count() == 0
+
+
+def test_reconcile_fixes_drift(user):
+    """Тест: изменения в обход ORM выравниваются пересчётом"""
+    other = User(username='other', is_active=True)
+    other.set_full_name('Петров Пётр')
+    other.set_password('pass')
+    db.session.add(other)
+    db.session.commit()
+    db.session.add(Task(user_id=user.id, title='Задача'))
+    db.session.commit()
+
+    # Массовые изменения не вызывают события маппера
+    db.session.execute(db.update(Task).values(completed=True))
+    db.session.execute(db.insert(QueueEntry).values(user_id=other.id, subject='ОАиП'))
+    db.session.execute(db.delete(UserStats).where(UserStats.user_id == other.id))
+    db.session.execute(db.insert(UserStats).values(user_id=999, open_queue_count=1, open_tasks_count=0, files_count=0))
+    db.session.commit()
+
+    assert reconcile_user_stats(dry_run=True) == {'fixed': 1, 'created': 1, 'deleted': 1}
+    assert stats(user.id)['open_tasks_count'] == 1
+
+    assert reconcile_user_stats() == {'fixed': 1, 'created': 1, 'deleted': 1}
+    assert stats(user.id)['open_tasks_count'] == 0
+    assert stats(other.id)['open_queue_count'] == 1
+    assert db.session.get(UserStats, 999) is None
+    assert reconcile_user_stats() == {'fixed': 0, 'created': 0, 'deleted': 0}